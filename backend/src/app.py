@@ -6,6 +6,9 @@ import logging
 from logging.handlers import RotatingFileHandler
 from dotenv import load_dotenv
 from .services.telegraf_service import TelegrafService
+from .services.couchdb_service import CouchDBService
+from .services.machine_mirror_service import MachineMirrorService
+from .services.machine_configuration_service import MachineConfigurationService
 from .routes import configure_routes
 
 
@@ -44,11 +47,65 @@ app.config.from_mapping(
     SECRET_KEY=os.getenv('DATABASE_SECRET_KEY', 'default_secret_key'),
     DATABASE_URL=os.getenv('DATABASE_URL', 'http://localhost:5984'),
     DATABASE_NAME=os.getenv('DATABASE_NAME', 'datalink'),
-    TELEGRAF_CONFIG_FOLDER='/etc/telegraf/telegraf.d/'
+    DATABASE_POOL_SIZE=int(os.getenv('DATABASE_POOL_SIZE', '10')),
+    DATABASE_CONNECT_TIMEOUT=float(os.getenv('DATABASE_CONNECT_TIMEOUT', '3.05')),
+    DATABASE_READ_TIMEOUT=float(os.getenv('DATABASE_READ_TIMEOUT', '30')),
+    DATABASE_RETRIES=int(os.getenv('DATABASE_RETRIES', '2')),
+    DATABASE_CACHE_SIZE=int(os.getenv('DATABASE_CACHE_SIZE', '256')),
+    DATABASE_CIRCUIT_THRESHOLD=int(os.getenv('DATABASE_CIRCUIT_THRESHOLD', '3')),
+    DATABASE_CIRCUIT_RESET=float(os.getenv('DATABASE_CIRCUIT_RESET', '30')),
+    BULK_BATCH_SIZE=int(os.getenv('BULK_BATCH_SIZE', '200')),
+    TELEGRAF_CONFIG_FOLDER='/etc/telegraf/telegraf.d/',
+    TELEGRAF_PACK=os.getenv('TELEGRAF_PACK', ''),
+    TELEGRAF_WORKERS=int(os.getenv('TELEGRAF_WORKERS', '0')),
+    CHANGES_FEED_ENABLED=os.getenv('CHANGES_FEED_ENABLED', 'true').lower() == 'true',
+    CHANGES_FEED_RERENDER=os.getenv('CHANGES_FEED_RERENDER', 'false').lower() == 'true',
+    CHANGES_FEED_CHECKPOINT=os.getenv('CHANGES_FEED_CHECKPOINT', '/etc/telegraf/changes-checkpoint.json')
 )
 
+# Mirror all machine documents in memory by following the CouchDB changes feed
+machine_mirror = None
+if app.config['CHANGES_FEED_ENABLED']:
+    machine_mirror = MachineMirrorService(
+        CouchDBService(
+            app.config['DATABASE_URL'],
+            app.config['DATABASE_USER'],
+            app.config['SECRET_KEY'],
+            app.config['DATABASE_NAME'],
+            pool_size=1,
+            timeout=(app.config['DATABASE_CONNECT_TIMEOUT'], app.config['DATABASE_READ_TIMEOUT']),
+            cache_size=0
+        ),
+        app.config['CHANGES_FEED_CHECKPOINT']
+    )
+
+    if app.config['CHANGES_FEED_RERENDER']:
+        def rerender_configured_machine(doc_id, doc):
+            """Re-render the Telegraf config of a configured machine whenever its document changes."""
+            if doc is None or doc_id.startswith('_design/'):
+                return
+            pack = app.config['TELEGRAF_PACK'] or None
+            if app.config['TELEGRAF_WORKERS']:
+                # The machine's config lives in the worker it is assigned to, if any
+                pack = TelegrafService(
+                    app.config['TELEGRAF_CONFIG_FOLDER'],
+                    machine_name=doc_id,
+                    couchdb_service=None,
+                    workers=app.config['TELEGRAF_WORKERS']
+                ).pack
+            MachineConfigurationService(
+                app.config['TELEGRAF_CONFIG_FOLDER'],
+                machine_name=doc_id,
+                couchdb_service=None,
+                pack=pack
+            ).refresh_configuration_file(doc)
+
+        machine_mirror.add_listener(rerender_configured_machine)
+
+    machine_mirror.start()
+
 # Register application routes
-configure_routes(app)
+configure_routes(app, machine_mirror)
 
 # Initialize Telegraf services and start them if any configuration files are available
 
@@ -1,5 +1,69 @@
+import re
 from dataclasses import dataclass, field
-from typing import List
+from typing import Optional
+
+from .s7_tag_address import S7Address, compile_tag_addresses, format_address_errors
+
+# Telegraf interval per tag rate class, in polling order. Tags without a class
+# and "normal" tags poll at machineData.requestInterval.
+RATE_CLASS_INTERVALS = {
+    "fast": "100ms",
+    "normal": None,
+    "slow": "10s",
+    "static": "60s"
+}
+DEFAULT_RATE_CLASS = "normal"
+
+# Optional machineData integers: JSON key, MachineData attribute, smallest allowed value
+OPTIONAL_MACHINE_DATA = (
+    ("readGap", "read_gap", 0),
+    ("metricBatchSize", "metric_batch_size", 1),
+    ("metricBufferLimit", "metric_buffer_limit", 1),
+    ("outageTolerance", "outage_tolerance", 0)
+)
+# Optional plcTagData filters, rendered into the machine's deadband processor: JSON key, PLCTagData attribute
+TAG_FILTERS = (
+    ("deadband", "deadband"),
+    ("deadbandPercent", "deadband_percent"),
+    ("maxSilence", "max_silence")
+)
+# Tag types a deadband applies to. Bits, characters, strings and dates are only compared for change.
+NUMERIC_TAG_TYPES = ("B", "W", "DW", "I", "DI", "R")
+# Statistics an aggregation publishes per window. "last" is rendered as aggregators.final,
+# the others as aggregators.basicstats.
+AGGREGATION_STATS = ("count", "min", "max", "mean", "stdev", "sum", "last")
+DEFAULT_AGGREGATION_STATS = ["min", "max", "mean", "last"]
+# Telegraf serializers the MQTT output may use: JSON, MessagePack, or InfluxDB line protocol
+MQTT_DATA_FORMATS = ("json", "msgpack", "influx")
+# MQTT messages per poll cycle: one per tag (or read range), one per machine, or one per machine and DB
+MQTT_MESSAGE_MODES = ("metric", "cycle", "db")
+DEFAULT_MQTT_MESSAGE_MODE = "metric"
+DURATION_PATTERN = re.compile(r"^(\d+(?:\.\d+)?)(ns|us|ms|s|m|h)$")
+DURATION_UNITS = {"ns": 1e-9, "us": 1e-6, "ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+
+def parse_duration(duration):
+    """Seconds of a Telegraf duration like "100ms", "1s" or "5m". Raises ValueError if invalid."""
+    match = DURATION_PATTERN.match(duration) if isinstance(duration, str) else None
+    if match is None:
+        raise ValueError(f"Invalid duration: {duration}")
+    return float(match[1]) * DURATION_UNITS[match[2]]
+
+
+def group_by_rate_class(tags):
+    """Group plcTagData entries by rate class in polling order, skipping empty classes.
+
+    Without tags the default class is returned, so a configuration still gets an input.
+    """
+    groups = {rate_class: [] for rate_class in RATE_CLASS_INTERVALS}
+    for tag in tags:
+        groups[tag.get("rateClass") or DEFAULT_RATE_CLASS].append(tag)
+    return [(rate_class, class_tags) for rate_class, class_tags in groups.items() if class_tags] or [(DEFAULT_RATE_CLASS, [])]
+
+
+def aggregations_by_rate_class(configuration):
+    """{rateClass: aggregation} of a configuration's aggregations."""
+    return {aggregation["rateClass"]: aggregation for aggregation in configuration.get("aggregations", [])}
 
 @dataclass
 class Agent:
@@ -8,6 +72,7 @@ class Agent:
     log_timezone: str
     quiet: bool
     round_interval: bool
+    debug: bool = False
 
 @dataclass
 class MachineData:
@@ -20,6 +85,10 @@ class MachineData:
     plc_slot: int
     request_interval: int
     request_s7comm_timeout: str
+    read_gap: Optional[int] = None
+    metric_batch_size: Optional[int] = None
+    metric_buffer_limit: Optional[int] = None
+    outage_tolerance: Optional[int] = None
 
 @dataclass
 class MQTTData:
@@ -29,17 +98,33 @@ class MQTTData:
     mqtt_layout: str
     mqtt_port: int
     mqtt_topic: str
+    mqtt_message_mode: str = DEFAULT_MQTT_MESSAGE_MODE
 
 @dataclass
 class PLCTagData:
     tag_address: str
     tag_name: str
+    rate_class: Optional[str] = None
+    deadband: Optional[float] = None
+    deadband_percent: Optional[float] = None
+    max_silence: Optional[float] = None
+    # Compiled form of tag_address, filled by from_dict
+    address: Optional[S7Address] = field(default=None, compare=False, repr=False)
+
+@dataclass
+class Aggregation:
+    rate_class: str
+    period: str
+    stats: list[str]
+    drop_original: bool = True
+
 @dataclass
 class PlcDatalinkRFC1006Model:
     agent: Agent
     machine_data: MachineData
     mqtt_data: MQTTData
-    plc_tag_data: List[PLCTagData] = field(default_factory=list)
+    plc_tag_data: list[PLCTagData] = field(default_factory=list)
+    aggregations: list[Aggregation] = field(default_factory=list)
 
     @staticmethod
     def from_dict(data: dict) -> "PlcDatalinkRFC1006Model":
@@ -74,7 +159,8 @@ class PlcDatalinkRFC1006Model:
                 hostname=agent_data["hostname"],
                 log_timezone=agent_data["logTimezone"],
                 quiet=agent_data["quiet"],
-                round_interval=agent_data["roundInterval"]
+                round_interval=agent_data["roundInterval"],
+                debug=agent_data.get("debug", False)
             )
 
             machine_data_obj = MachineData(
@@ -86,8 +172,16 @@ class PlcDatalinkRFC1006Model:
                 plc_rack=machine_data["plcRack"],
                 plc_slot=machine_data["plcSlot"],
                 request_interval=machine_data["requestInterval"],
-                request_s7comm_timeout=machine_data["requestS7commTimeout"]
+                request_s7comm_timeout=machine_data["requestS7commTimeout"],
+                **{attribute: machine_data.get(key) for key, attribute, _ in OPTIONAL_MACHINE_DATA}
             )
+            parse_duration(agent.flush_interval)
+            if not isinstance(agent.debug, bool):
+                raise ValueError("debug must be a boolean")
+            for key, attribute, minimum in OPTIONAL_MACHINE_DATA:
+                value = getattr(machine_data_obj, attribute)
+                if value is not None and (isinstance(value, bool) or not isinstance(value, int) or value < minimum):
+                    raise ValueError(f"{key} must be an integer of at least {minimum}")
 
             mqtt_data_obj = MQTTData(
                 mqtt_data_format=mqtt_data["mqttDataFormat"],
@@ -95,32 +189,108 @@ class PlcDatalinkRFC1006Model:
                 mqtt_json_timestamp_units=mqtt_data["mqttJsonTimestampUnits"],
                 mqtt_layout=mqtt_data["mqttLayout"],
                 mqtt_port=mqtt_data["mqttPort"],
-                mqtt_topic=mqtt_data["mqttTopic"]
+                mqtt_topic=mqtt_data["mqttTopic"],
+                mqtt_message_mode=mqtt_data.get("mqttMessageMode", DEFAULT_MQTT_MESSAGE_MODE)
             )
+            if mqtt_data_obj.mqtt_data_format not in MQTT_DATA_FORMATS:
+                raise ValueError(f"Unknown mqttDataFormat {mqtt_data_obj.mqtt_data_format}, expected one of {', '.join(MQTT_DATA_FORMATS)}")
+            if mqtt_data_obj.mqtt_message_mode not in MQTT_MESSAGE_MODES:
+                raise ValueError(f"Unknown mqttMessageMode {mqtt_data_obj.mqtt_message_mode}, expected one of {', '.join(MQTT_MESSAGE_MODES)}")
 
+            tags = data.get("plcTagData", [])
+            addresses, address_errors = compile_tag_addresses([tag["tagAddress"] for tag in tags])
+            if address_errors:
+                raise ValueError(format_address_errors(address_errors))
+            rate_classes = [tag.get("rateClass") or DEFAULT_RATE_CLASS for tag in tags]
+            unknown_classes = sorted({str(rate_class) for rate_class in rate_classes if not (isinstance(rate_class, str) and rate_class in RATE_CLASS_INTERVALS)})
+            if unknown_classes:
+                raise ValueError(f"Unknown rateClass {', '.join(unknown_classes)}, expected one of {', '.join(RATE_CLASS_INTERVALS)}")
+            filter_keys = {key for key, _ in TAG_FILTERS}
+            for tag, address in zip(tags, addresses):
+                if filter_keys.isdisjoint(tag):
+                    continue
+                for key, _ in TAG_FILTERS:
+                    value = tag.get(key)
+                    if value is not None and (isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0):
+                        raise ValueError(f"{key} of tag {tag['tagName']} must be a non-negative number")
+                if tag.get("maxSilence") == 0:
+                    raise ValueError(f"maxSilence of tag {tag['tagName']} must be positive")
+                if tag.get("deadband") is not None and tag.get("deadbandPercent") is not None:
+                    raise ValueError(f"Tag {tag['tagName']} sets both deadband and deadbandPercent")
+                if (tag.get("deadband") is not None or tag.get("deadbandPercent") is not None) and address.type not in NUMERIC_TAG_TYPES:
+                    raise ValueError(f"Tag {tag['tagName']} of type {address.type} cannot have a deadband, only numeric tags can")
             plc_tag_data = [
-                PLCTagData(tag_address=tag["tagAddress"], tag_name=tag["tagName"])
-                for tag in data.get("plcTagData", [])
+                PLCTagData(
+                    tag_address=tag["tagAddress"],
+                    tag_name=tag["tagName"],
+                    rate_class=tag.get("rateClass") or None,
+                    deadband=tag.get("deadband"),
+                    deadband_percent=tag.get("deadbandPercent"),
+                    max_silence=tag.get("maxSilence"),
+                    address=address
+                )
+                for tag, address in zip(tags, addresses)
             ]
 
+            aggregations = PlcDatalinkRFC1006Model._aggregations_from_list(data.get("aggregations", []), machine_data_obj, plc_tag_data)
+
             return PlcDatalinkRFC1006Model(
                 agent=agent,
                 machine_data=machine_data_obj,
                 mqtt_data=mqtt_data_obj,
-                plc_tag_data=plc_tag_data
+                plc_tag_data=plc_tag_data,
+                aggregations=aggregations
             )
         except KeyError as e:
             raise ValueError(f"Missing required key: {str(e)}")
 
+    @staticmethod
+    def _aggregations_from_list(data, machine_data, plc_tag_data) -> list[Aggregation]:
+        """Validate the aggregations, at most one per rate class, each over a window no shorter than the class interval."""
+        if not isinstance(data, list) or not all(isinstance(entry, dict) for entry in data):
+            raise ValueError("aggregations must be a list of objects")
+        aggregations = []
+        for entry in data:
+            aggregation = Aggregation(
+                rate_class=entry["rateClass"],
+                period=entry["period"],
+                stats=entry.get("stats", list(DEFAULT_AGGREGATION_STATS)),
+                drop_original=entry.get("dropOriginal", True)
+            )
+            if not isinstance(aggregation.rate_class, str) or aggregation.rate_class not in RATE_CLASS_INTERVALS:
+                raise ValueError(f"Unknown rateClass {aggregation.rate_class} in aggregations, expected one of {', '.join(RATE_CLASS_INTERVALS)}")
+            if any(other.rate_class == aggregation.rate_class for other in aggregations):
+                raise ValueError(f"Rate class {aggregation.rate_class} is aggregated more than once")
+            interval = RATE_CLASS_INTERVALS[aggregation.rate_class]
+            interval = machine_data.request_interval if interval is None else parse_duration(interval)
+            if parse_duration(aggregation.period) < interval:
+                raise ValueError(f"Aggregation period {aggregation.period} of rate class {aggregation.rate_class} is shorter than its interval")
+            if not isinstance(aggregation.stats, list) or not aggregation.stats or len(set(aggregation.stats)) != len(aggregation.stats) \
+                    or any(stat not in AGGREGATION_STATS for stat in aggregation.stats):
+                raise ValueError(f"stats of the {aggregation.rate_class} aggregation must list distinct statistics of {', '.join(AGGREGATION_STATS)}")
+            if not isinstance(aggregation.drop_original, bool):
+                raise ValueError("dropOriginal must be a boolean")
+            aggregations.append(aggregation)
+        aggregated = {aggregation.rate_class for aggregation in aggregations}
+        for tag in plc_tag_data if aggregated else []:
+            if (tag.rate_class or DEFAULT_RATE_CLASS) in aggregated and (tag.deadband is not None or tag.deadband_percent is not None or tag.max_silence is not None):
+                raise ValueError(f"Tag {tag.tag_name} cannot have a deadband or maxSilence, its rate class is aggregated")
+        return aggregations
+
+    def tag_addresses(self) -> list[S7Address]:
+        """Compiled tag addresses in plcTagData order."""
+        return [tag.address for tag in self.plc_tag_data]
+
     def to_json_dict(self) -> dict:
         """Convert PlcDatalinkRFC1006Model to a JSON dictionary for CouchDB storage."""
-        return {
+        json_dict = {
             "agent": {
                 "flushInterval": self.agent.flush_interval,
                 "hostname": self.agent.hostname,
                 "logTimezone": self.agent.log_timezone,
                 "quiet": self.agent.quiet,
-                "roundInterval": self.agent.round_interval
+                "roundInterval": self.agent.round_interval,
+                **({"debug": True} if self.agent.debug else {})
             },
             "machineData": {
                 "machineName": self.machine_data.machine_name,
@@ -139,10 +309,24 @@ class PlcDatalinkRFC1006Model:
                 "mqttJsonTimestampUnits": self.mqtt_data.mqtt_json_timestamp_units,
                 "mqttLayout": self.mqtt_data.mqtt_layout,
                 "mqttPort": self.mqtt_data.mqtt_port,
-                "mqttTopic": self.mqtt_data.mqtt_topic
+                "mqttTopic": self.mqtt_data.mqtt_topic,
+                **({"mqttMessageMode": self.mqtt_data.mqtt_message_mode} if self.mqtt_data.mqtt_message_mode != DEFAULT_MQTT_MESSAGE_MODE else {})
             },
             "plcTagData": [
-                {"tagAddress": tag.tag_address, "tagName": tag.tag_name}
+                {"tagAddress": tag.tag_address, "tagName": tag.tag_name, **({"rateClass": tag.rate_class} if tag.rate_class else {})}
                 for tag in self.plc_tag_data
             ]
         }
+        for key, attribute, _ in OPTIONAL_MACHINE_DATA:
+            if getattr(self.machine_data, attribute) is not None:
+                json_dict["machineData"][key] = getattr(self.machine_data, attribute)
+        if self.aggregations:
+            json_dict["aggregations"] = [
+                {"rateClass": aggregation.rate_class, "period": aggregation.period, "stats": aggregation.stats, "dropOriginal": aggregation.drop_original}
+                for aggregation in self.aggregations
+            ]
+        for tag, tag_dict in zip(self.plc_tag_data, json_dict["plcTagData"]):
+            for key, attribute in TAG_FILTERS:
+                if getattr(tag, attribute) is not None:
+                    tag_dict[key] = getattr(tag, attribute)
+        return json_dict
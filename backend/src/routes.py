@@ -1,10 +1,13 @@
 import logging, json
-from flask import request, jsonify, send_from_directory
+from flask import Response, request, jsonify, send_from_directory, stream_with_context
 from flask_swagger_ui import get_swaggerui_blueprint
-from requests.exceptions import HTTPError
+from requests.exceptions import HTTPError, RequestException, Timeout, ConnectionError as DatabaseConnectionError
+from .services.agent_sizing import size_agent_buffers
+from .services.circuit_breaker import CircuitBreaker
 from .services.couchdb_service import CouchDBService
 from .services.telegraf_service import TelegrafService
 from .services.machine_configuration_service import MachineConfigurationService
+from .services.s7_read_planner import DEFAULT_PDU_LENGTH, DEFAULT_ROUND_TRIP_MS, estimate_cycle
 from .plc_datalink_rfc1006_model import PlcDatalinkRFC1006Model
 
 
@@ -12,18 +15,34 @@ from .plc_datalink_rfc1006_model import PlcDatalinkRFC1006Model
 # Logger instance defined in `init.py`
 logger = logging.getLogger('application_logger')
 
+DESIGN_DOC_PREFIX = '_design/'
+
 SWAGGER_URL = '/swagger'
 API_URL = '/static/openapi/plc_datalink_rfc1006_api.yml'
 
-def configure_routes(app):
+def _create_circuit_breaker(app):
+    """Circuit breaker for the routes' CouchDB client; a threshold of 0 disables it."""
+    failure_threshold = app.config.get('DATABASE_CIRCUIT_THRESHOLD', 3)
+    if failure_threshold <= 0:
+        return None
+    return CircuitBreaker(failure_threshold, app.config.get('DATABASE_CIRCUIT_RESET', 30.0))
+
+def configure_routes(app, machine_mirror=None):
     # Initialize CouchDBService once and reuse across routes
     couchdb_service = CouchDBService(
         app.config['DATABASE_URL'],
         app.config['DATABASE_USER'],
         app.config['SECRET_KEY'],
-        app.config['DATABASE_NAME']        
+        app.config['DATABASE_NAME'],
+        pool_size=app.config.get('DATABASE_POOL_SIZE', 10),
+        timeout=(app.config.get('DATABASE_CONNECT_TIMEOUT', 3.05), app.config.get('DATABASE_READ_TIMEOUT', 30)),
+        retries=app.config.get('DATABASE_RETRIES', 2),
+        cache_size=app.config.get('DATABASE_CACHE_SIZE', 256),
+        circuit_breaker=_create_circuit_breaker(app)
     )
 
+    bulk_batch_size = app.config.get('BULK_BATCH_SIZE', 200)
+
     # Initialize swaggerui_blueprint
     swaggerui_blueprint = get_swaggerui_blueprint(
         SWAGGER_URL,
@@ -41,15 +60,35 @@ def configure_routes(app):
         
     @app.route('/config/read/all', methods=['GET'])
     def read_all_config():
-        """Endpoint to read all available configurations."""
+        """Endpoint to read all available configurations, optionally one page at a time or streamed from CouchDB."""
+        startkey = request.args.get('startkey')
+        limit = request.args.get('limit', type=int)
+        if limit is not None and limit <= 0:
+            return jsonify({"error": "limit must be a positive integer"}), 400
         try:
-            configurations = couchdb_service.get_all_docs()
-            return jsonify(configurations), 200
+            if request.args.get('stream', 'false').lower() == 'true':
+                chunks = couchdb_service.stream_all_docs(startkey, limit)
+                return Response(stream_with_context(chunks), mimetype='application/json'), 200
+            snapshot_age = None
+            if machine_mirror and machine_mirror.is_ready():
+                configurations = machine_mirror.all_docs(startkey, limit)
+            else:
+                configurations, snapshot_age = _read_with_snapshot(
+                    lambda: couchdb_service.get_all_docs(startkey, limit),
+                    lambda: machine_mirror.all_docs(startkey, limit)
+                )
+            # Design documents hold the views, they are not machine configurations
+            configurations['rows'] = [row for row in configurations.get('rows', []) if not row['id'].startswith(DESIGN_DOC_PREFIX)]
+            if snapshot_age is not None:
+                configurations.update(stale=True, snapshotAge=int(snapshot_age))
+            return _mark_stale(jsonify(configurations), snapshot_age), 200
         except HTTPError as e:
             if e.response.status_code == 404:
                 return jsonify({"error": f"Configurations not available"}), 404
             else:
                 return jsonify({"error": str(e)}), e.response.status_code
+        except (DatabaseConnectionError, Timeout) as e:
+            return jsonify({"error": f"Configuration database unavailable: {str(e)}"}), 503
         except Exception as e:
             logger.error(f"Error reading all configurations: {str(e)}")
             return jsonify({"error": str(e)}), 500
@@ -62,17 +101,117 @@ def configure_routes(app):
             return jsonify({"error": "Machine name is required"}), 400
 
         try:
-            configuration = couchdb_service.get_doc(machine_name)
-            return jsonify(configuration), 200
+            configuration, snapshot_age = _read_configuration(machine_name)
+            response = jsonify(configuration)
+            if configuration.get('_rev'):
+                response.set_etag(configuration['_rev'])
+            return _mark_stale(response, snapshot_age), 200
         except HTTPError as e:
             if e.response.status_code == 404:
                 return jsonify({"error": f"Machine {machine_name} does not exist."}), 404
             else:
                 return jsonify({"error": str(e)}), e.response.status_code
+        except (DatabaseConnectionError, Timeout) as e:
+            return jsonify({"error": f"Configuration database unavailable: {str(e)}"}), 503
         except Exception as e:
             logger.error(f"Error reading configuration for {machine_name}: {str(e)}")
             return jsonify({"error": str(e)}), 500
 
+    @app.route('/config/summary', methods=['GET'])
+    def read_config_summary():
+        """Endpoint to list a compact summary of every machine from the machines/summary view."""
+        try:
+            result = couchdb_service.get_view('machines', 'summary', include_docs='false')
+            summaries = [row['value'] for row in result.get('rows', [])]
+            return jsonify({"message": "Machine summaries", "machines": summaries}), 200
+        except HTTPError as e:
+            if e.response.status_code == 404:
+                return jsonify({"error": "Machine summary view not available"}), 404
+            else:
+                return jsonify({"error": str(e)}), e.response.status_code
+        except Exception as e:
+            logger.error(f"Error reading machine summaries: {str(e)}")
+            return jsonify({"error": str(e)}), 500
+
+    @app.route('/config/query/plc', methods=['GET'])
+    def query_config_by_plc_ip():
+        """Endpoint to list the machines reading from one PLC, via the machines/by_plc_ip view."""
+        plc_ip = request.args.get('plc_ip')
+        if not plc_ip:
+            return jsonify({"error": "PLC IP is required"}), 400
+        return _query_machine_view('by_plc_ip', f"Machines on PLC {plc_ip}", key=json.dumps(plc_ip))
+
+    @app.route('/config/query/broker', methods=['GET'])
+    def query_config_by_mqtt_broker():
+        """Endpoint to list the machines publishing to one MQTT broker, via the machines/by_mqtt_broker view."""
+        mqtt_ip = request.args.get('mqtt_ip')
+        if not mqtt_ip:
+            return jsonify({"error": "MQTT IP is required"}), 400
+        mqtt_port = request.args.get('mqtt_port', type=int)
+        if mqtt_port is not None:
+            return _query_machine_view('by_mqtt_broker', f"Machines publishing to {mqtt_ip}:{mqtt_port}",
+                                       key=json.dumps([mqtt_ip, mqtt_port]))
+        # Every port of the broker: [mqtt_ip] sorts before and [mqtt_ip, {}] after all [mqtt_ip, port] keys
+        return _query_machine_view('by_mqtt_broker', f"Machines publishing to {mqtt_ip}",
+                                   startkey=json.dumps([mqtt_ip]), endkey=json.dumps([mqtt_ip, {}]))
+
+    @app.route('/config/query/tag', methods=['GET'])
+    def query_config_by_tag_address():
+        """Endpoint to list the tags reading one PLC address across all machines, via the machines/by_tag_address view."""
+        tag_address = request.args.get('tag_address')
+        if not tag_address:
+            return jsonify({"error": "Tag address is required"}), 400
+        return _query_machine_view('by_tag_address', f"Tags reading {tag_address}", key=json.dumps(tag_address.upper()))
+
+    @app.route('/config/cache/stats', methods=['GET'])
+    def read_cache_stats():
+        """Endpoint to read the hit/miss counters of the machine-document cache."""
+        return jsonify({
+            "message": "Document cache statistics",
+            "cache": couchdb_service.cache_stats(),
+            "circuit": couchdb_service.circuit_stats()
+            }), 200
+
+    @app.route('/config/estimate', methods=['GET', 'POST'])
+    def estimate_poll_cycle():
+        """Endpoint to estimate the S7 read cost of one poll cycle for a stored (machine_name) or proposed (body) configuration."""
+        pdu_length = request.args.get('pdu_length', DEFAULT_PDU_LENGTH, type=int)
+        round_trip_ms = request.args.get('round_trip_ms', DEFAULT_ROUND_TRIP_MS, type=float)
+        machine_name = request.args.get('machine_name')
+        try:
+            snapshot_age = None
+            if request.method == 'POST':
+                configuration = _read_bulk_body()
+                if not isinstance(configuration, dict) or not configuration:
+                    return jsonify({"error": "Configuration data must be a valid JSON object"}), 400
+            elif machine_name:
+                configuration, snapshot_age = _read_configuration(machine_name)
+            else:
+                return jsonify({"error": "Machine name is required"}), 400
+
+            try:
+                document = PlcDatalinkRFC1006Model.from_dict(configuration).to_json_dict()
+                estimate = estimate_cycle(document, pdu_length, round_trip_ms)
+                sizing = size_agent_buffers(document)
+            except (ValueError, AttributeError, TypeError) as e:
+                return jsonify({"error": str(e)}), 400
+            response = jsonify({
+                "message": f"Poll cycle estimate for {document['machineData']['machineName']}",
+                "estimate": estimate.to_json_dict(),
+                "buffer": sizing.to_json_dict()
+                })
+            return _mark_stale(response, snapshot_age), 200
+        except HTTPError as e:
+            if e.response.status_code == 404:
+                return jsonify({"error": f"Machine {machine_name} does not exist."}), 404
+            else:
+                return jsonify({"error": str(e)}), e.response.status_code
+        except (DatabaseConnectionError, Timeout) as e:
+            return jsonify({"error": f"Configuration database unavailable: {str(e)}"}), 503
+        except Exception as e:
+            logger.error(f"Error estimating the poll cycle: {str(e)}")
+            return jsonify({"error": str(e)}), 500
+
     @app.route('/config/create', methods=['POST'])
     def store_config():
         """Create a configuration for a specific machine."""
@@ -91,6 +230,7 @@ def configure_routes(app):
 
             try:
                 machine_configuration_model = couchdb_service.create_doc(configuration_model)
+                _expect_mirror_revision(machine_configuration_model)
                 return jsonify(machine_configuration_model), 200
             except HTTPError as e:
                 if e.response.status_code == 409:
@@ -116,11 +256,29 @@ def configure_routes(app):
         if not machine_name:
             return jsonify({"error": "Machine name is required"}), 400
 
+        body_rev = machine_configuration_data.get('_rev')
+        header_rev = _parse_if_match(request.headers.get('If-Match'))
+        if body_rev and header_rev and body_rev != header_rev:
+            return jsonify({"error": "_rev and If-Match header refer to different revisions"}), 400
+
         try:
-            existing_doc = couchdb_service.get_doc(machine_name)
-            machine_configuration_data['_rev'] = existing_doc['_rev']
-            update_response = couchdb_service.update_doc(machine_name, machine_configuration_data)
-            return jsonify(update_response), 200
+            configuration_model = PlcDatalinkRFC1006Model.from_dict(machine_configuration_data).to_json_dict()
+        except ValueError as e:
+            logger.error(f"Error converting to model: {str(e)}")
+            return jsonify({"error": str(e)}), 400
+
+        try:
+            # A client-supplied revision makes the update a single conditional PUT
+            rev = body_rev or header_rev
+            if not rev:
+                rev = couchdb_service.get_doc(machine_name)['_rev']
+            configuration_model['_rev'] = rev
+            update_response = couchdb_service.update_doc(machine_name, configuration_model)
+            _expect_mirror_revision(update_response)
+            response = jsonify(update_response)
+            if update_response.get('rev'):
+                response.set_etag(update_response['rev'])
+            return response, 200
         except HTTPError as e:
             if e.response.status_code == 404:
                 return jsonify({"error": f"Configuration for {machine_name} does not exist, cannot update."}), 404
@@ -160,7 +318,8 @@ def configure_routes(app):
 
             existing_doc = couchdb_service.get_doc(machine_name)
             rev = existing_doc['_rev']
-            couchdb_service.delete_doc(machine_name, rev)
+            delete_response = couchdb_service.delete_doc(machine_name, rev)
+            _expect_mirror_revision(delete_response)
             machine_config_service.remove_log_file()
 
             return jsonify({"message": f"Configuration for {machine_name} has been successfully removed."}), 200
@@ -174,6 +333,133 @@ def configure_routes(app):
             logger.error(f"Error removing configuration for {machine_name}: {str(e)}")
             return jsonify({"error": str(e)}), 500
        
+    @app.route('/config/bulk/create', methods=['POST'])
+    def bulk_store_config():
+        """Create many machine configurations with _bulk_docs, reporting the result per document."""
+        try:
+            configurations = _read_bulk_body()
+            if not isinstance(configurations, list) or not configurations:
+                return jsonify({"error": "A non-empty list of configurations is required"}), 400
+
+            documents, validation_errors = _validate_bulk_configurations(configurations)
+            if validation_errors:
+                return jsonify({"error": "Invalid configurations, nothing was written.", "results": validation_errors}), 400
+
+            for document in documents:
+                document['_id'] = document['machineData']['machineName']
+            results = couchdb_service.bulk_docs(documents, bulk_batch_size)
+            return _bulk_response("created", results)
+        except HTTPError as e:
+            return jsonify({"error": str(e)}), e.response.status_code
+        except Exception as e:
+            logger.error(f"Error creating configurations in bulk: {str(e)}")
+            return jsonify({"error": str(e)}), 500
+
+    @app.route('/config/bulk/update', methods=['PUT'])
+    def bulk_update_config():
+        """Update many existing machine configurations with _bulk_docs, reporting the result per document."""
+        try:
+            configurations = _read_bulk_body()
+            if not isinstance(configurations, list) or not configurations:
+                return jsonify({"error": "A non-empty list of configurations is required"}), 400
+
+            documents, validation_errors = _validate_bulk_configurations(configurations)
+            if validation_errors:
+                return jsonify({"error": "Invalid configurations, nothing was written.", "results": validation_errors}), 400
+
+            machine_names = [document['machineData']['machineName'] for document in documents]
+            client_revs = [configuration.get('_rev') for configuration in configurations]
+            missing_revs = [name for name, rev in zip(machine_names, client_revs) if not rev]
+            current_revs = couchdb_service.get_revisions(missing_revs) if missing_revs else {}
+
+            results = [None] * len(documents)
+            writes, write_indexes = [], []
+            for index, (document, machine_name, rev) in enumerate(zip(documents, machine_names, client_revs)):
+                rev = rev or current_revs.get(machine_name)
+                if not rev:
+                    results[index] = {"id": machine_name, "error": "not_found", "reason": "Configuration does not exist, cannot update."}
+                    continue
+                document['_id'] = machine_name
+                document['_rev'] = rev
+                writes.append(document)
+                write_indexes.append(index)
+
+            for index, result in zip(write_indexes, couchdb_service.bulk_docs(writes, bulk_batch_size) if writes else []):
+                results[index] = result
+            return _bulk_response("updated", results)
+        except HTTPError as e:
+            return jsonify({"error": str(e)}), e.response.status_code
+        except Exception as e:
+            logger.error(f"Error updating configurations in bulk: {str(e)}")
+            return jsonify({"error": str(e)}), 500
+
+    @app.route('/config/bulk/remove', methods=['POST'])
+    def bulk_remove_config():
+        """Remove many machine configurations with _bulk_docs. Running machines are skipped."""
+        try:
+            machine_names = _read_bulk_machine_names()
+            if not machine_names:
+                return jsonify({"error": "A non-empty list of machineNames is required"}), 400
+
+            telegraf_service = TelegrafService(
+                app.config['TELEGRAF_CONFIG_FOLDER'],
+                machine_name=None,
+                couchdb_service=None
+            )
+            active_machines = {service['machine_name'] for service in telegraf_service.get_active_telegraf_services()}
+            current_revs = couchdb_service.get_revisions(machine_names)
+
+            results = [None] * len(machine_names)
+            deletions, deletion_indexes = [], []
+            for index, machine_name in enumerate(machine_names):
+                if machine_name in active_machines:
+                    results[index] = {"id": machine_name, "error": "conflict", "reason": "Machine is currently running."}
+                elif not current_revs.get(machine_name):
+                    results[index] = {"id": machine_name, "error": "not_found", "reason": "Configuration does not exist, cannot remove."}
+                else:
+                    deletions.append({"_id": machine_name, "_rev": current_revs[machine_name], "_deleted": True})
+                    deletion_indexes.append(index)
+
+            for index, result in zip(deletion_indexes, couchdb_service.bulk_docs(deletions, bulk_batch_size) if deletions else []):
+                results[index] = result
+                if result.get('ok'):
+                    MachineConfigurationService(
+                        app.config['TELEGRAF_CONFIG_FOLDER'],
+                        machine_name=result['id'],
+                        couchdb_service=None
+                    ).remove_log_file()
+            return _bulk_response("removed", results)
+        except HTTPError as e:
+            return jsonify({"error": str(e)}), e.response.status_code
+        except Exception as e:
+            logger.error(f"Error removing configurations in bulk: {str(e)}")
+            return jsonify({"error": str(e)}), 500
+
+    @app.route('/config/bulk/read', methods=['POST'])
+    def bulk_read_config():
+        """Export machine configurations with _bulk_get. Without machineNames every configuration is exported."""
+        try:
+            machine_names = _read_bulk_machine_names()
+            if machine_names:
+                docs = couchdb_service.bulk_get(machine_names, bulk_batch_size)
+                configurations, errors = [], []
+                for machine_name in machine_names:
+                    doc = docs.get(machine_name, {"error": "not_found", "reason": "missing"})
+                    if 'error' in doc:
+                        errors.append({"id": machine_name, **doc})
+                    else:
+                        configurations.append(doc)
+            else:
+                all_docs = machine_mirror.all_docs() if machine_mirror and machine_mirror.is_ready() else couchdb_service.get_all_docs()
+                configurations = [row['doc'] for row in all_docs.get('rows', []) if not row['id'].startswith(DESIGN_DOC_PREFIX)]
+                errors = []
+            return jsonify({"message": f"{len(configurations)} configurations exported", "configurations": configurations, "errors": errors}), 200
+        except HTTPError as e:
+            return jsonify({"error": str(e)}), e.response.status_code
+        except Exception as e:
+            logger.error(f"Error exporting configurations in bulk: {str(e)}")
+            return jsonify({"error": str(e)}), 500
+
     @app.route('/machine/start', methods=['GET'])
     def start_machine_configuration():
         """Start the Telegraf service for a specific machine."""
@@ -332,38 +618,157 @@ def configure_routes(app):
                 return {"error": f"Missing required key: {key}"}, 400
         return json_data, None
 
+    def _parse_if_match(header_value):
+        """Helper to extract the revision from an If-Match header like '"2-abc"'"""
+        if not header_value or header_value.strip() == '*':
+            return None
+        return header_value.strip().removeprefix('W/').strip('"') or None
+
+    def _read_bulk_body():
+        """Helper to read a bulk request body, also accepting the JSON-encoded string sent by the frontend"""
+        data = request.get_json(silent=True)
+        if isinstance(data, str):
+            data = json.loads(data)
+        return data
+
+    def _read_bulk_machine_names():
+        """Helper to read machine names from a {"machineNames": [...]} body or a plain list"""
+        data = _read_bulk_body()
+        if isinstance(data, dict):
+            data = data.get('machineNames')
+        return [name for name in data if isinstance(name, str) and name] if isinstance(data, list) else []
+
+    def _validate_bulk_configurations(configurations):
+        """Helper to validate every configuration in one pass. Returns the model documents and the per-document errors."""
+        documents, errors, seen = [], [], set()
+        for index, configuration in enumerate(configurations):
+            try:
+                document = PlcDatalinkRFC1006Model.from_dict(configuration).to_json_dict()
+            except (ValueError, AttributeError, TypeError) as e:
+                machine_data = configuration.get('machineData') if isinstance(configuration, dict) else None
+                machine_name = machine_data.get('machineName') if isinstance(machine_data, dict) else None
+                errors.append({"index": index, "id": machine_name, "error": "invalid", "reason": str(e)})
+                continue
+            machine_name = document['machineData']['machineName']
+            if machine_name in seen:
+                errors.append({"index": index, "id": machine_name, "error": "invalid", "reason": "Duplicate machineName in request."})
+            seen.add(machine_name)
+            documents.append(document)
+        return documents, errors
+
+    def _bulk_response(action, results):
+        """Helper to summarise per-document bulk results"""
+        succeeded = 0
+        for result in results:
+            if result.get('ok'):
+                succeeded += 1
+                _expect_mirror_revision(result)
+        return jsonify({
+            "message": f"{succeeded} of {len(results)} configurations {action}",
+            "results": results
+            }), 200
+
+    def _query_machine_view(view, message, **params):
+        """Helper to answer a fleet query from a machines/* view without transferring full documents"""
+        try:
+            result = couchdb_service.get_view('machines', view, include_docs='false', **params)
+            return jsonify({"message": message, "machines": [row['value'] for row in result.get('rows', [])]}), 200
+        except HTTPError as e:
+            if e.response.status_code == 404:
+                return jsonify({"error": f"Machine query view {view} not available"}), 404
+            else:
+                return jsonify({"error": str(e)}), e.response.status_code
+        except Exception as e:
+            logger.error(f"Error querying machines/{view}: {str(e)}")
+            return jsonify({"error": str(e)}), 500
+
+    def _read_configuration(machine_name):
+        """Helper to read one configuration from the mirror, CouchDB or the snapshot. Returns it with the snapshot age."""
+        if machine_mirror and machine_mirror.is_ready(machine_name):
+            configuration = machine_mirror.get_doc(machine_name)
+            if configuration is not None:
+                return configuration, None
+        return _read_with_snapshot(
+            lambda: couchdb_service.get_doc(machine_name),
+            lambda: machine_mirror.get_doc(machine_name)
+        )
+
+    def _read_with_snapshot(read, read_snapshot):
+        """Helper to run a CouchDB read and answer it from the mirror snapshot while CouchDB is unavailable.
+
+        Returns the result and the snapshot age in seconds, or None when the result is live.
+        """
+        try:
+            return read(), None
+        except RequestException as e:
+            unavailable = isinstance(e, (DatabaseConnectionError, Timeout)) or (
+                isinstance(e, HTTPError) and e.response is not None and e.response.status_code >= 500)
+            if not (unavailable and machine_mirror and machine_mirror.has_snapshot()):
+                raise
+            result = read_snapshot()
+            if result is None:
+                raise
+            logger.warning(f"CouchDB unavailable, answering from the machine snapshot: {e}")
+            return result, machine_mirror.snapshot_age()
+
+    def _mark_stale(response, snapshot_age):
+        """Helper to flag a response served from the snapshot with the standard Age and Warning headers"""
+        if snapshot_age is not None:
+            response.headers['Age'] = str(int(snapshot_age))
+            response.headers['Warning'] = '110 - "Response is Stale"'
+        return response
+
+    def _expect_mirror_revision(write_response):
+        """Make mirror reads of a just-written document wait until the changes feed has delivered it."""
+        if machine_mirror and write_response.get('id') and write_response.get('rev'):
+            machine_mirror.expect_revision(write_response['id'], write_response['rev'])
+
     def _handle_telegraf_service(action, machine_name):
         """Helper to handle start or stop Telegraf service actions"""
         telegraf_service = TelegrafService(
             app.config['TELEGRAF_CONFIG_FOLDER'],
             machine_name,
-            couchdb_service
+            couchdb_service,
+            pack=app.config.get('TELEGRAF_PACK') or None,
+            workers=app.config.get('TELEGRAF_WORKERS', 0)
         )
         try:
             try:
-                existing_doc = couchdb_service.get_doc(machine_name)
+                existing_doc, snapshot_age = _read_with_snapshot(
+                    lambda: couchdb_service.get_doc(machine_name),
+                    lambda: machine_mirror.get_doc(machine_name)
+                )
             except HTTPError as e:
                 if e.response.status_code == 404:
                     return jsonify({"error": f"Configuration for {machine_name} does not exist, cannot {action}."}), 404
                 else:
                     return jsonify({"error": f"Configuration invalid for {machine_name} {str(e)}"}), e.response.status_code
+            except (DatabaseConnectionError, Timeout) as e:
+                return jsonify({"error": f"Configuration database unavailable: {str(e)}"}), 503
 
             active_services = telegraf_service.get_active_telegraf_services()
             active_service = next((s for s in active_services if s['machine_name'] == machine_name), None)
 
             if action == "start":
-                if active_service:
-                    logger.info(f"restarting active Telegraf service for {machine_name}.")
-                    telegraf_service.stop_telegraf_service()
-
-                telegraf_service.start_telegraf_service()
-                return jsonify({"message": "Telegraf service started successfully"}), 200
+                # start_telegraf_service reloads or replaces a running process itself, and only if the configuration changed
+                outcome = telegraf_service.start_telegraf_service(existing_doc)
+                if outcome == "unchanged":
+                    message = {"message": f"Telegraf service for {machine_name} already running with an identical configuration"}
+                elif outcome == "reloaded":
+                    message = {"message": "Telegraf service reloaded its configuration successfully"}
+                else:
+                    message = {"message": "Telegraf service started successfully"}
+                if snapshot_age is not None:
+                    message.update(stale=True, snapshotAge=int(snapshot_age))
+                return _mark_stale(jsonify(message), snapshot_age), 200
             elif action == "stop":
                 if not active_service:
                     return jsonify({"message": f"No active Telegraf service found for {machine_name}."}), 200
                 telegraf_service.stop_telegraf_service()
                 return jsonify({"message": "Telegraf service stopped successfully"}), 200
 
+        except ValueError as e:
+            return jsonify({"error": f"Configuration invalid for {machine_name}: {str(e)}"}), 400
         except Exception as e:
             logger.error(f"Error during Telegraf service {action} for {machine_name}: {str(e)}")
             return jsonify({"error": str(e)}), 500
\ No newline at end of file
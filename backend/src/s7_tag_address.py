@@ -0,0 +1,80 @@
+import re
+from functools import lru_cache
+from typing import NamedTuple, Optional
+
+# <area><number>.<type><start>[.extra], see "PLC Address specification" in README.md. The areas
+# and types are the ones Telegraf's s7comm input accepts: process inputs (PE) and outputs (PA),
+# merkers (MK), data blocks (DB), counters (C) and timers (T). The number only selects a DB.
+TAG_ADDRESS_PATTERN = re.compile(
+    r'^(?P<area>PE|PA|MK|DB|C|T)(?P<db>\d+)\.(?P<type>DW|DI|DT|X|B|C|W|I|R|S|T)(?P<start>\d+)(?:\.(?P<extra>\d+))?$'
+)
+
+# Bytes read for each tag type. Strings (S) add a two-byte header to their length.
+TYPE_SIZES = {'X': 1, 'B': 1, 'C': 1, 'W': 2, 'DW': 4, 'I': 2, 'DI': 4, 'R': 4, 'DT': 8, 'T': 2}
+
+# Invalid addresses listed in a validation error before the rest is summarized
+MAX_REPORTED_ERRORS = 10
+
+
+class S7Address(NamedTuple):
+    """Compiled tag address. bit is set for X, length (characters) for S."""
+
+    area: str
+    db: int
+    type: str
+    start: int
+    size: int
+    bit: Optional[int] = None
+    length: Optional[int] = None
+
+    @property
+    def end(self):
+        return self.start + self.size
+
+
+@lru_cache(maxsize=65536)
+def parse_tag_address(address):
+    """Compile an RFC1006 tag address like DB1.R28, DB1.X36.0, DB1.S38.20 or MK0.W4. Raises ValueError if invalid.
+
+    Results are cached, most fleets read the same addresses on many machines.
+    """
+    match = TAG_ADDRESS_PATTERN.match(address) if isinstance(address, str) else None
+    if match is None:
+        raise ValueError(f'Invalid tag address: {address}')
+    tag_type, extra = match['type'], match['extra']
+    start = int(match['start'])
+    if tag_type == 'X':
+        if extra is None or int(extra) > 7:
+            raise ValueError(f'Bit address needs a bit number from 0 to 7: {address}')
+        return S7Address(match['area'], int(match['db']), tag_type, start, 1, bit=int(extra))
+    if tag_type == 'S':
+        if extra is None or not 0 < int(extra) < 255:
+            raise ValueError(f'String address needs a length from 1 to 254: {address}')
+        return S7Address(match['area'], int(match['db']), tag_type, start, int(extra) + 2, length=int(extra))
+    if extra is not None:
+        raise ValueError(f'Unexpected suffix for type {tag_type}: {address}')
+    return S7Address(match['area'], int(match['db']), tag_type, start, TYPE_SIZES[tag_type])
+
+
+def compile_tag_addresses(addresses):
+    """Compile many tag addresses in one pass.
+
+    Returns the compiled addresses (None where invalid) and one
+    {"index", "tagAddress", "error"} entry per invalid address.
+    """
+    compiled, errors = [], []
+    for index, address in enumerate(addresses):
+        try:
+            compiled.append(parse_tag_address(address))
+        except (ValueError, TypeError) as e:
+            compiled.append(None)
+            errors.append({'index': index, 'tagAddress': address, 'error': str(e)})
+    return compiled, errors
+
+
+def format_address_errors(errors):
+    """One-line summary of compile_tag_addresses errors for a ValueError or an API response."""
+    listed = '; '.join(error['error'] for error in errors[:MAX_REPORTED_ERRORS])
+    if len(errors) > MAX_REPORTED_ERRORS:
+        listed += f'; and {len(errors) - MAX_REPORTED_ERRORS} more'
+    return f'{len(errors)} invalid tag address{"es" if len(errors) != 1 else ""}: {listed}'
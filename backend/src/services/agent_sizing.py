@@ -0,0 +1,115 @@
+import math
+from dataclasses import dataclass, field
+from typing import Optional
+
+from ..plc_datalink_rfc1006_model import (
+    DEFAULT_MQTT_MESSAGE_MODE,
+    RATE_CLASS_INTERVALS,
+    aggregations_by_rate_class,
+    group_by_rate_class,
+    parse_duration,
+)
+from ..s7_tag_address import parse_tag_address
+from .s7_read_planner import plan_reads
+
+# Telegraf agent limits rendered before they were sized, kept as the floor
+DEFAULT_METRIC_BATCH_SIZE = 100
+DEFAULT_METRIC_BUFFER_LIMIT = 1000
+# Seconds of broker outage the buffer should bridge unless machineData.outageTolerance says otherwise
+DEFAULT_OUTAGE_TOLERANCE = 60
+# Upper bound for a computed buffer, roughly 500 MB of Telegraf memory at ~500 bytes per metric
+MAX_METRIC_BUFFER_LIMIT = 1000000
+
+
+@dataclass
+class AgentSizing:
+    metrics_per_second: float
+    metric_batch_size: int
+    metric_buffer_limit: int
+    outage_tolerance: int
+    tolerated_outage: Optional[float]
+    warnings: list[str] = field(default_factory=list)
+
+    @property
+    def drop_risk(self):
+        return self.tolerated_outage is not None and self.tolerated_outage < self.outage_tolerance
+
+    def to_json_dict(self):
+        return {
+            'metricsPerSecond': round(self.metrics_per_second, 3),
+            'metricBatchSize': self.metric_batch_size,
+            'metricBufferLimit': self.metric_buffer_limit,
+            'outageTolerance': self.outage_tolerance,
+            'toleratedOutage': None if self.tolerated_outage is None else round(self.tolerated_outage, 1),
+            'dropRisk': self.drop_risk,
+            'warnings': self.warnings,
+        }
+
+
+def size_agent_buffers(configuration):
+    """Size Telegraf's metric_batch_size and metric_buffer_limit for a configuration.
+
+    Every metric block yields one metric per gather, so a machine produces one
+    metric per tag (or per read range with readGap) and interval of its rate
+    class. With mqttMessageMode cycle or db the metrics of one cycle are merged
+    into one per machine or memory area (DB). An aggregated class instead yields one metric
+    per series, aggregator and window, plus its samples unless they are
+    dropped. A batch holds one flush interval of metrics, the buffer holds the
+    flush interval plus the outage tolerance. Neither goes below the former fixed limits, and
+    machineData.metricBatchSize/metricBufferLimit win.
+    """
+    machine_data = configuration['machineData']
+    flush_interval = parse_duration(configuration['agent']['flushInterval'])
+    outage_tolerance = machine_data.get('outageTolerance')
+    if outage_tolerance is None:
+        outage_tolerance = DEFAULT_OUTAGE_TOLERANCE
+
+    aggregations = aggregations_by_rate_class(configuration)
+    message_mode = configuration['mqttData'].get('mqttMessageMode', DEFAULT_MQTT_MESSAGE_MODE)
+    metrics_per_second = 0.0
+    for rate_class, tags in group_by_rate_class(configuration['plcTagData']):
+        interval = RATE_CLASS_INTERVALS[rate_class]
+        interval = machine_data['requestInterval'] if interval is None else parse_duration(interval)
+        metrics = len(tags)
+        if machine_data.get('readGap') is not None:
+            metrics = len(plan_reads(tags, machine_data['pduSize'], machine_data['readGap']).ranges)
+        series = metrics
+        if message_mode == 'cycle':
+            series = min(metrics, 1)
+        elif message_mode == 'db':
+            addresses = [parse_tag_address(tag['tagAddress']) for tag in tags]
+            series = len({(address.area, address.db) for address in addresses})
+        aggregation = aggregations.get(rate_class)
+        if aggregation is None:
+            metrics_per_second += series / interval
+            continue
+        # basicstats emits one metric per series and window for all its statistics, final another one for "last"
+        aggregators = int(aggregation['stats'] != ['last']) + int('last' in aggregation['stats'])
+        metrics_per_second += series * aggregators / parse_duration(aggregation['period'])
+        if not aggregation['dropOriginal']:
+            metrics_per_second += metrics / interval
+
+    batch_size = machine_data.get('metricBatchSize') or max(
+        DEFAULT_METRIC_BATCH_SIZE, math.ceil(metrics_per_second * flush_interval)
+    )
+    buffer_limit = machine_data.get('metricBufferLimit') or min(
+        MAX_METRIC_BUFFER_LIMIT,
+        max(
+            DEFAULT_METRIC_BUFFER_LIMIT,
+            2 * batch_size,
+            math.ceil(metrics_per_second * (flush_interval + outage_tolerance)),
+        ),
+    )
+
+    tolerated_outage = buffer_limit / metrics_per_second - flush_interval if metrics_per_second else None
+    sizing = AgentSizing(metrics_per_second, batch_size, buffer_limit, outage_tolerance, tolerated_outage)
+    if sizing.drop_risk:
+        sizing.warnings.append(
+            f'metric_buffer_limit of {buffer_limit} holds {max(tolerated_outage, 0):.1f}s of metrics at {metrics_per_second:.1f} metrics/s, '
+            f'a broker outage longer than that drops metrics (outageTolerance {outage_tolerance}s)'
+        )
+    if buffer_limit < batch_size:
+        sizing.warnings.append(
+            f'metric_buffer_limit of {buffer_limit} is smaller than metric_batch_size of {batch_size}'
+        )
+    return sizing
@@ -0,0 +1,77 @@
+import logging
+import threading
+import time
+
+import requests
+
+# Logger instance defined in `init.py`
+logger = logging.getLogger('application_logger')
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """Raised instead of contacting CouchDB while the circuit is open."""
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker in front of the CouchDB client.
+
+    After failure_threshold failed calls in a row the circuit opens and calls
+    fail immediately with CircuitOpenError instead of waiting for a timeout.
+    Once reset_timeout seconds have passed a single probe call is let through:
+    its success closes the circuit again, its failure re-opens it.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+    def __init__(self, failure_threshold=3, reset_timeout=30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = None
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state
+
+    def allow_request(self):
+        """Return True when a call may go to CouchDB now."""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+                self._state = self.HALF_OPEN
+            if self._state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self._state != self.CLOSED:
+                logger.info('CouchDB reachable again, closing circuit')
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probe_in_flight = False
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    logger.error(
+                        f'CouchDB failed {self._failures} times in a row, opening circuit for {self.reset_timeout}s'
+                    )
+                self._state = self.OPEN
+                self._opened_at = self._clock()
+
+    def stats(self):
+        with self._lock:
+            return {'state': self._state, 'consecutive_failures': self._failures}
@@ -1,23 +1,159 @@
+import json
+import random
+import time
 import requests
 import logging
+from requests.adapters import HTTPAdapter
+from .circuit_breaker import CircuitOpenError
+from .document_cache import DocumentCache
 
 # Logger instance defined in `init.py`
 logger = logging.getLogger('application_logger')
 
+# Design document ids sort between these two keys in the raw id order of _all_docs
+DESIGN_DOC_START = "_design/"
+DESIGN_DOC_END = "_design0"
+ROWS_START = b'"rows":['
+# Bytes held back from a streamed _all_docs body so its closing ]} is never passed on
+ROWS_TAIL = 64
+
 
 class CouchDBService:
-    def __init__(self, base_url, username, password,database_name):
+    # Only methods that are safe to replay against CouchDB. A retried PUT/DELETE
+    # whose first attempt already reached the server would fail with a 409
+    # because the document revision moved on, so those are never retried.
+    RETRY_METHODS = frozenset({"GET", "HEAD"})
+    RETRY_STATUS_CODES = frozenset({502, 503, 504})
+
+    def __init__(self, base_url, username, password, database_name,
+                 pool_size=10, timeout=(3.05, 30), retries=2, backoff_factor=0.2, cache_size=256,
+                 circuit_breaker=None):
         self.base_url = base_url
         self.auth = (username, password)
-        self.database_name=database_name
+        self.database_name = database_name
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.session = self._create_session(pool_size)
+        self.cache = DocumentCache(cache_size)
+        self.circuit_breaker = circuit_breaker
 
-    def get_all_docs(self):
+    def get_all_docs(self, startkey=None, limit=None):
+        """ Read all documents. With a limit, one page starting at startkey is returned with the id of the next page's first row as 'next'. """
         url = f"{self.base_url}/{self.database_name}/_all_docs?include_docs=true"
-        return self._make_request("GET", url)
+        if not limit:
+            return self._make_request("GET", url, params=self._all_docs_params(startkey))
+        # Fetch one extra row: it tells whether there is a next page and where it starts
+        result = self._make_request("GET", url, params=self._all_docs_params(startkey, limit + 1))
+        rows = result.get("rows", [])
+        result["next"] = rows[limit]["id"] if len(rows) > limit else None
+        result["rows"] = rows[:limit]
+        return result
+
+    def stream_all_docs(self, startkey=None, limit=None, chunk_size=64 * 1024):
+        """ Stream the rows of _all_docs as a {"rows": [...]} body in chunks without decoding them. HTTP errors are raised before the first chunk.
+
+        Doc ids starting with "_" are reserved, so in the raw id order of _all_docs the design documents sit between
+        DESIGN_DOC_START and DESIGN_DOC_END. The rows are read as the two key ranges around them and spliced together.
+        """
+        url = f"{self.base_url}/{self.database_name}/_all_docs"
+        responses = []
+        try:
+            for params in self._machine_ranges(url, startkey, limit):
+                responses.append(self._send("GET", url, params={"include_docs": "true", **params}, stream=True))
+        except Exception:
+            for response in responses:
+                response.close()
+            raise
+
+        def generate():
+            try:
+                yield b'{"rows":['
+                separator = b""
+                for response in responses:
+                    started = False
+                    for part in self._iter_rows(response.iter_content(chunk_size=chunk_size)):
+                        if not started:
+                            part = part.lstrip()
+                            if not part:
+                                continue
+                            yield separator
+                            started = True
+                        yield part
+                    if started:
+                        separator = b","
+                yield b"]}"
+            finally:
+                for response in responses:
+                    response.close()
+        return generate()
+
+    def _machine_ranges(self, url, startkey, limit):
+        """ _all_docs parameters of the key ranges before and after the design documents, starting at startkey. With a
+        limit, the first range's ids are counted without documents so both ranges together return at most limit rows. """
+        ranges = []
+        if startkey is None or startkey < DESIGN_DOC_START:
+            ranges.append({**self._all_docs_params(startkey, limit), "endkey": json.dumps(DESIGN_DOC_START)})
+            if limit:
+                limit -= len(self._make_request("GET", url, params=ranges[0]).get("rows", []))
+                if limit <= 0:
+                    return ranges
+        ranges.append(self._all_docs_params(max(startkey or "", DESIGN_DOC_END), limit))
+        return ranges
+
+    @staticmethod
+    def _iter_rows(chunks):
+        """ Yield the raw contents of the rows array of an _all_docs body. Only the envelope around it is looked at: the
+        head up to "rows":[ and a short tail holding the closing ]}, so memory stays at about one chunk. """
+        chunks = iter(chunks)
+        head = b""
+        for chunk in chunks:
+            head += chunk
+            start = head.find(ROWS_START)
+            if start != -1:
+                break
+        else:
+            return
+        pending = head[start + len(ROWS_START):]
+        for chunk in chunks:
+            pending += chunk
+            if len(pending) > ROWS_TAIL:
+                yield pending[:-ROWS_TAIL]
+                pending = pending[-ROWS_TAIL:]
+        yield pending[:pending.rfind(b"]")]
+
+    def get_view(self, design_doc, view, **params):
+        """ Query a map view. Keyword arguments are passed as query parameters; key-like ones must already be JSON-encoded. """
+        url = f"{self.base_url}/{self.database_name}/_design/{design_doc}/_view/{view}"
+        return self._make_request("GET", url, params=params)
+
+    def get_changes(self, since="0", feed="normal", timeout_ms=60000, limit=None):
+        """ Read the _changes feed with documents included. For longpoll the read timeout is stretched past the server-side wait. """
+        url = f"{self.base_url}/{self.database_name}/_changes"
+        params = {"since": since, "feed": feed, "include_docs": "true", "timeout": timeout_ms}
+        if limit:
+            params["limit"] = limit
+        read_timeout = timeout_ms / 1000 + self.timeout[1] if feed == "longpoll" else self.timeout[1]
+        return self._make_request("GET", url, params=params, timeout=(self.timeout[0], read_timeout))
 
     def get_doc(self, doc_id):
+        """ Read-through cached GET. A cached document is revalidated with If-None-Match, so an unchanged one costs a 304 without body. """
         url = f"{self.base_url}/{self.database_name}/{doc_id}"
-        return self._make_request("GET", url)
+        etag = self.cache.get_etag(doc_id)
+        headers = {"If-None-Match": etag} if etag else None
+        try:
+            response = self._send("GET", url, headers=headers)
+        except requests.exceptions.HTTPError:
+            self.cache.invalidate(doc_id)
+            raise
+        if response.status_code == 304:
+            doc = self.cache.hit(doc_id)
+            if doc is not None:
+                return doc
+            # Evicted between revalidation and lookup, fetch unconditionally
+            response = self._send("GET", url)
+        self.cache.store(doc_id, response.headers.get("ETag"), response.content)
+        return response.json()
 
     def create_doc(self, data):
         """ Create or update a document using PUT with an explicit _id derived from machineName. """
@@ -26,23 +162,133 @@ class CouchDBService:
         data['_id'] = machine_name
         # Construct the URL to include the _id for a PUT request
         url = f"{self.base_url}/{self.database_name}/{machine_name}"
+        self.cache.invalidate(machine_name)
         return self._make_request("PUT", url, json=data)
 
     def update_doc(self, doc_id, data):
         # Must include '_rev' in data for update to work
         url = f"{self.base_url}/{self.database_name}/{doc_id}"
+        self.cache.invalidate(doc_id)
         return self._make_request("PUT", url, json=data)
 
     def delete_doc(self, doc_id, rev):
         url = f"{self.base_url}/{self.database_name}/{doc_id}?rev={rev}"
+        self.cache.invalidate(doc_id)
         return self._make_request("DELETE", url)
 
+    def bulk_docs(self, docs, batch_size=200):
+        """ Write documents through _bulk_docs in batches of batch_size. Returns one result per document, in input order. """
+        url = f"{self.base_url}/{self.database_name}/_bulk_docs"
+        results = []
+        for start in range(0, len(docs), batch_size):
+            batch = docs[start:start + batch_size]
+            for doc in batch:
+                self.cache.invalidate(doc.get('_id'))
+            results.extend(self._make_request("POST", url, json={"docs": batch}))
+        return results
+
+    def bulk_get(self, doc_ids, batch_size=200):
+        """ Read documents through _bulk_get in batches. Returns a dict of doc id to document, or to the CouchDB error. """
+        url = f"{self.base_url}/{self.database_name}/_bulk_get"
+        docs = {}
+        for start in range(0, len(doc_ids), batch_size):
+            batch = doc_ids[start:start + batch_size]
+            response = self._make_request("POST", url, json={"docs": [{"id": doc_id} for doc_id in batch]})
+            for result in response.get("results", []):
+                entry = result["docs"][0]
+                docs[result["id"]] = entry.get("ok") or {"error": entry["error"].get("error"), "reason": entry["error"].get("reason")}
+        return docs
+
+    def get_revisions(self, doc_ids):
+        """ Look up the current _rev of each document via _all_docs without fetching the bodies. Missing and deleted documents map to None. """
+        url = f"{self.base_url}/{self.database_name}/_all_docs"
+        response = self._make_request("POST", url, json={"keys": doc_ids})
+        return {
+            row["key"]: None if "error" in row or row["value"].get("deleted") else row["value"]["rev"]
+            for row in response.get("rows", [])
+        }
+
+    def cache_stats(self):
+        """Return hit/miss counters of the document cache."""
+        return self.cache.stats()
+
+    def circuit_stats(self):
+        """Return the circuit breaker state, or None when no breaker is configured."""
+        return self.circuit_breaker.stats() if self.circuit_breaker else None
+
+    def close(self):
+        """Release all pooled connections."""
+        self.session.close()
+
+    def _create_session(self, pool_size):
+        """Create a keep-alive session whose connection pool is shared by every request."""
+        session = requests.Session()
+        # Authentication is attached once to the session instead of every request
+        session.auth = self.auth
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def _all_docs_params(self, startkey=None, limit=None):
+        params = {}
+        if startkey is not None:
+            # CouchDB expects JSON-encoded keys
+            params["startkey"] = json.dumps(startkey)
+        if limit:
+            params["limit"] = limit
+        return params
+
     def _make_request(self, method, url, **kwargs):
-        try:
-            # Include authentication in every request
-            response = requests.request(method, url, auth=self.auth, **kwargs)
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Request failed: {e}")
-            raise
+        return self._send(method, url, **kwargs).json()
+
+    def _send(self, method, url, **kwargs):
+        """Send a request with retries and return the raw response, raising HTTPError on 4xx/5xx.
+
+        With a circuit breaker, the outcome after retries counts as one success or
+        failure, and an open circuit raises CircuitOpenError without sending anything.
+        """
+        if self.circuit_breaker and not self.circuit_breaker.allow_request():
+            raise CircuitOpenError(f"CouchDB circuit is open, not sending {method} {url}")
+        kwargs.setdefault("timeout", self.timeout)
+        attempt = 0
+        while True:
+            try:
+                response = self.session.request(method, url, **kwargs)
+                if response.status_code in self.RETRY_STATUS_CODES and self._can_retry(method, attempt):
+                    attempt += 1
+                    self._sleep_before_retry(method, url, attempt, f"HTTP {response.status_code}")
+                    continue
+                # 4xx answers come from a healthy server, only 5xx count against the circuit
+                self._record_outcome(response.status_code < 500)
+                response.raise_for_status()
+                return response
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                if not self._can_retry(method, attempt):
+                    logger.error(f"Request failed: {e}")
+                    self._record_outcome(False)
+                    raise
+                attempt += 1
+                self._sleep_before_retry(method, url, attempt, e)
+            except requests.exceptions.RequestException as e:
+                logger.error(f"Request failed: {e}")
+                # HTTP errors were already recorded from their status code
+                if not isinstance(e, requests.exceptions.HTTPError):
+                    self._record_outcome(False)
+                raise
+
+    def _record_outcome(self, succeeded):
+        if self.circuit_breaker:
+            if succeeded:
+                self.circuit_breaker.record_success()
+            else:
+                self.circuit_breaker.record_failure()
+
+    def _can_retry(self, method, attempt):
+        return method.upper() in self.RETRY_METHODS and attempt < self.retries
+
+    def _sleep_before_retry(self, method, url, attempt, reason):
+        """Exponential backoff with full jitter, so concurrent callers do not retry in lockstep."""
+        delay = random.uniform(0, self.backoff_factor * (2 ** (attempt - 1)))
+        logger.warning(f"Retrying {method} {url} in {delay:.2f}s (attempt {attempt}/{self.retries}): {reason}")
+        time.sleep(delay)
@@ -0,0 +1,48 @@
+# Metric tag marking the metrics of deadband filtered tags with their machine name. The dedup
+# processor skips them, the machine's Starlark filter takes them and the MQTT output drops the tag.
+DEADBAND_TAG = 'datalink_deadband'
+# dedup_interval of the dedup processor in seconds. Filtered tags without maxSilence, and
+# unfiltered fields read in the same range as a filtered one, are repeated at least this often.
+DEDUP_INTERVAL = 86400
+
+# Body of the Starlark filter, following the BANDS table of the machine. A field is published
+# when it moved by more than its band since it was last published, or when it was last
+# published max silence ago. Values that are not numbers are published on any change.
+DEADBAND_FILTER_FUNCTIONS = """
+def apply(metric):
+    for name, value in metric.fields.items():
+        threshold, percent, max_silence = BANDS.get(name, DEFAULT_BAND)
+        last = state.get(name)
+        if last != None and metric.time - last[1] < max_silence and not moved(value, last[0], threshold, percent):
+            metric.fields.pop(name)
+        else:
+            state[name] = (value, metric.time)
+    if len(metric.fields) == 0:
+        return None
+    return metric
+
+def moved(value, last, threshold, percent):
+    if type(value) not in ("int", "float") or type(last) not in ("int", "float"):
+        return value != last
+    if percent:
+        threshold = threshold * last / 100
+        if threshold < 0:
+            threshold = -threshold
+    delta = value - last
+    return delta > threshold or -delta > threshold
+"""
+
+
+def deadband_bands(tags):
+    """{tagName: (threshold, percent, max silence in seconds)} of the plcTagData entries with a deadband or maxSilence.
+
+    Without a deadband a tag is published on any change, without maxSilence it
+    is repeated after DEDUP_INTERVAL like every other tag.
+    """
+    bands = {}
+    for tag in tags:
+        if 'deadband' in tag or 'deadbandPercent' in tag or 'maxSilence' in tag:
+            percent = 'deadbandPercent' in tag
+            threshold = tag['deadbandPercent'] if percent else tag.get('deadband', 0)
+            bands[tag['tagName']] = (threshold, percent, tag.get('maxSilence', DEDUP_INTERVAL))
+    return bands
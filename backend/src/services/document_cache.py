@@ -0,0 +1,74 @@
+import json
+import logging
+import threading
+from collections import OrderedDict
+
+# Logger instance defined in `init.py`
+logger = logging.getLogger('application_logger')
+
+
+class DocumentCache:
+    """Size-bounded LRU cache of CouchDB documents keyed by doc id.
+
+    Entries keep the raw JSON body together with the ETag CouchDB sent for it.
+    The body is decoded on every hit, so callers always get a private copy
+    they can mutate without corrupting the cache.
+    """
+
+    def __init__(self, max_size=256):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_etag(self, doc_id):
+        """Return the stored ETag for doc_id, or None when the document is not cached."""
+        with self._lock:
+            entry = self._entries.get(doc_id)
+            return entry[0] if entry else None
+
+    def hit(self, doc_id):
+        """Record a successful revalidation and return a fresh copy of the cached document."""
+        with self._lock:
+            entry = self._entries.get(doc_id)
+            if entry is None:
+                return None
+            self._entries.move_to_end(doc_id)
+            self.hits += 1
+            body = entry[1]
+        return json.loads(body)
+
+    def store(self, doc_id, etag, body):
+        """Store a freshly fetched document body and count the fetch as a miss."""
+        with self._lock:
+            self.misses += 1
+            if not etag or self.max_size <= 0:
+                return
+            self._entries[doc_id] = (etag, body)
+            self._entries.move_to_end(doc_id)
+            while len(self._entries) > self.max_size:
+                evicted_id, _ = self._entries.popitem(last=False)
+                self.evictions += 1
+                logger.debug(f'Evicted {evicted_id} from document cache')
+
+    def invalidate(self, doc_id):
+        with self._lock:
+            self._entries.pop(doc_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+            }
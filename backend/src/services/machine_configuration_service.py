@@ -1,42 +1,149 @@
-import os, logging, subprocess
-
-from flask import jsonify
+import hashlib
+import logging
+import os
+import re
+import subprocess
+import tempfile
+import threading
 from pathlib import Path
-from ..plc_datalink_rfc1006_model import PlcDatalinkRFC1006Model
 
+from ..plc_datalink_rfc1006_model import (
+    DEFAULT_MQTT_MESSAGE_MODE,
+    DEFAULT_RATE_CLASS,
+    RATE_CLASS_INTERVALS,
+    PlcDatalinkRFC1006Model,
+    aggregations_by_rate_class,
+    group_by_rate_class,
+)
+from ..s7_tag_address import parse_tag_address
+from .agent_sizing import DEFAULT_METRIC_BATCH_SIZE, DEFAULT_METRIC_BUFFER_LIMIT, size_agent_buffers
+from .deadband_filter import DEADBAND_FILTER_FUNCTIONS, DEADBAND_TAG, DEDUP_INTERVAL, deadband_bands
+from .s7_read_planner import plan_reads
+from .worker_pool import tag_reads_per_second
 
 # Logger instance defined in `init.py`
 logger = logging.getLogger('application_logger')
 
+# Metric blocks are emitted once per tag or read range, so their templates are compiled
+# to bound str.format methods once instead of being assembled line by line per render.
+# Each block starts with the blank line that separates it from the previous section.
+S7COMM_METRIC_BLOCK = (
+    "\n"
+    "  [[inputs.s7comm.metric]]\n"
+    "    fields = [{{ name=\"{name}\", address=\"{address}\" }}]\n"
+    "    [inputs.s7comm.metric.tags]\n"
+    "      machine = \"{name}\"\n"
+)
+S7COMM_RANGE_BLOCK = (
+    "\n"
+    "  # {label}\n"
+    "  [[inputs.s7comm.metric]]\n"
+    "    fields = [\n"
+    "{fields}"
+    "    ]\n"
+    "    [inputs.s7comm.metric.tags]\n"
+    "      machine = \"{machine}\"\n"
+)
+# Metrics of deadband filtered tags are additionally marked for the machine's Starlark filter
+S7COMM_DEADBAND_TAG_LINE = f"      {DEADBAND_TAG} = \"{{machine}}\"\n"
+S7COMM_METRIC_TEMPLATE = S7COMM_METRIC_BLOCK.format
+S7COMM_FILTERED_METRIC_TEMPLATE = (S7COMM_METRIC_BLOCK + S7COMM_DEADBAND_TAG_LINE).format
+S7COMM_RANGE_TEMPLATE = S7COMM_RANGE_BLOCK.format
+S7COMM_FILTERED_RANGE_TEMPLATE = (S7COMM_RANGE_BLOCK + S7COMM_DEADBAND_TAG_LINE).format
+S7COMM_RANGE_FIELD_TEMPLATE = "      {{ name=\"{name}\", address=\"{address}\" }},\n".format
+
+# Plugin tag routing the metrics of a packed machine to its own MQTT output. The output drops
+# it again, so packed and unpacked machines publish the same payload.
+PACK_MACHINE_TAG = "datalink_machine"
+# Input tag selecting the metrics of an aggregated rate class, "<machine>.<rateClass>", for its aggregators.
+# The MQTT output drops it like the pack and deadband tags.
+AGGREGATION_TAG = "datalink_aggregation"
+# Metric tag naming the MQTT message a metric is merged into with mqttMessageMode cycle or db:
+# "<machine>", or "<machine>.<area><n>" like "<machine>.DB7". The MQTT output drops it.
+MESSAGE_TAG = "datalink_message"
+S7COMM_MESSAGE_TAG_LINE = f"      {MESSAGE_TAG} = \"{{group}}\"\n".format
+# Gives the metrics of one message common tags once dedup and the deadband filter are done with them
+MESSAGE_MERGE_SOURCE = f"""
+def apply(metric):
+    metric.tags["machine"] = metric.tags["{MESSAGE_TAG}"]
+    metric.tags.pop("{DEADBAND_TAG}", None)
+    return metric
+"""
+# First line of a rendered pack member, recording its weight for the worker pool
+PACK_MEMBER_HEADER = "# pack member {machine}: {weight:.3f} tag reads/s\n".format
+PACK_MEMBER_PATTERN = re.compile(r"^# pack member (?P<machine>\S+): (?P<weight>\d+(?:\.\d+)?) tag reads/s$")
+
 
 class MachineConfigurationService:
-    def __init__(self, telegraf_config_folder, machine_name, couchdb_service):
+    # Bump whenever the rendered output changes for the same document, so files
+    # fingerprinted by an older renderer are re-rendered and compared.
+    RENDERER_VERSION = 3
+    FINGERPRINT_PREFIX = "# plc-datalink-rfc1006 fingerprint:"
+    # One lock per rendered file: a request and the changes-feed listener may render the same file at once
+    _WRITE_LOCKS = {}
+    _WRITE_LOCKS_GUARD = threading.Lock()
+
+    def __init__(self, telegraf_config_folder, machine_name, couchdb_service, pack=None):
         self.telegraf_config_folder = telegraf_config_folder
         self.machine_name = machine_name
         self.couchdb_service = couchdb_service
+        # Name of the Telegraf config all started machines are packed into, None for one config per machine
+        self.pack = pack
+
+    def write_configuration_to_file(self, machine_configuration=None):
+        """Write the given configuration, or the one retrieved from DB, to file.
 
-    def write_configuration_to_file(self):
-        """Retrieve configuration from DB and write to file."""
+        Returns False without touching the file when it already holds the same
+        rendered output, so callers can leave a running Telegraf alone. An existing
+        file is replaced atomically, which a running Telegraf picks up through
+        --watch-config instead of being torn down with its supervisor entry.
+        """
         config_file_path = os.path.join(self.telegraf_config_folder, f"{self.machine_name}.conf")
-        if os.path.exists(config_file_path):
-            logger.warning(f"Configuration file already exists: {config_file_path}, reconfiguring...")
-            self.remove_configuration_file()
+        if machine_configuration is None:
+            machine_configuration = self._get_machine_configuration()
+        if self.pack:
+            return self._write_pack_member(machine_configuration)
+        existed = os.path.exists(config_file_path)
         try:
-            with open(config_file_path, 'w') as file:
-                self._write_configuration_content(file)
+            if not self._write_if_changed(config_file_path, machine_configuration):
+                logger.info(f"Configuration file unchanged: {config_file_path}")
+                return False
         except OSError as e:
             logger.error(f"Failed to open and write configuration file: {config_file_path}, Error: {e}")
+            return True
+        if existed:
+            logger.warning(f"Configuration file already exists: {config_file_path}, reconfigured")
+        return True
 
-    def remove_log_file(self):
-        """Remove log file."""
-        log_file_path = Path(self.telegraf_config_folder) / f"{self.machine_name}.log"
+    def refresh_configuration_file(self, machine_configuration):
+        """Re-render an existing configuration file in place from the given document, relying on Telegraf's --watch-config."""
+        config_file_path = os.path.join(self.telegraf_config_folder, f"{self.machine_name}.conf")
+        if self.pack:
+            if not os.path.exists(self._get_pack_member_path()):
+                return False
+            return self._write_pack_member(machine_configuration)
+        if not os.path.exists(config_file_path):
+            return False
         try:
-            log_file_path.unlink()
-            logger.warning(f"File removed: {log_file_path}")
-        except FileNotFoundError:
-            logger.info(f"File not found: {log_file_path}")
+            if not self._write_if_changed(config_file_path, machine_configuration):
+                return False
+            logger.info(f"Configuration file refreshed: {config_file_path}")
+            return True
         except OSError as e:
-            logger.error(f"Error removing files {log_file_path}: {e}")
+            logger.error(f"Failed to refresh configuration file: {config_file_path}, Error: {e}")
+            return False
+
+    def remove_log_file(self):
+        """Remove log file and stats file."""
+        for suffix in ("log", "stats"):
+            log_file_path = Path(self.telegraf_config_folder) / f"{self.machine_name}.{suffix}"
+            try:
+                log_file_path.unlink()
+                logger.warning(f"File removed: {log_file_path}")
+            except FileNotFoundError:
+                logger.info(f"File not found: {log_file_path}")
+            except OSError as e:
+                logger.error(f"Error removing files {log_file_path}: {e}")
 
     def remove_configuration_file(self):
         """Remove configuration file."""
@@ -54,6 +161,82 @@ class MachineConfigurationService:
         except OSError as e:
             logger.error(f"Error removing files {config_file_path}: {e}")
 
+    def remove_pack_member(self):
+        """Remove the machine from the pack and rewrite the pack configuration. Returns the number of machines left in the pack."""
+        try:
+            os.unlink(self._get_pack_member_path())
+            logger.warning(f"Machine {self.machine_name} removed from Telegraf pack {self.pack}")
+        except FileNotFoundError:
+            logger.info(f"Machine {self.machine_name} is not part of Telegraf pack {self.pack}")
+        members = self.get_pack_members()
+        if members:
+            self._write_pack_configuration(members)
+        return len(members)
+
+    def move_pack_member(self, target_pack):
+        """Move the machine's rendered member file into another pack and rewrite both packs. The member is not re-rendered."""
+        target = MachineConfigurationService(self.telegraf_config_folder, self.machine_name, self.couchdb_service, pack=target_pack)
+        os.makedirs(target._get_pack_folder(), exist_ok=True)
+        os.replace(self._get_pack_member_path(), target._get_pack_member_path())
+        logger.warning(f"Machine {self.machine_name} moved from Telegraf pack {self.pack} to {target_pack}")
+        target._write_pack_configuration(target.get_pack_members())
+        members = self.get_pack_members()
+        if members:
+            self._write_pack_configuration(members)
+        return len(members)
+
+    def get_pack_member_weights(self):
+        """{machine: tag reads per second} of the machines in the pack, read from their member files."""
+        weights = {}
+        for member in self.get_pack_members():
+            weights[member] = 0.0
+            try:
+                with open(os.path.join(self._get_pack_folder(), f"{member}.conf")) as file:
+                    for line in (file.readline(), file.readline()):
+                        match = PACK_MEMBER_PATTERN.match(line.rstrip("\n"))
+                        if match:
+                            weights[member] = float(match["weight"])
+            except OSError as e:
+                logger.error(f"Failed to read pack member {member} of {self.pack}: {e}")
+        return weights
+
+    def get_pack_members(self):
+        """Names of the machines in the pack, in the order they are rendered."""
+        try:
+            return sorted(file[:-5] for file in os.listdir(self._get_pack_folder()) if file.endswith('.conf'))
+        except FileNotFoundError:
+            return []
+
+    def _write_pack_member(self, machine_configuration):
+        """Render the machine into its member file of the pack, then reassemble the pack configuration.
+
+        Returns whether the pack configuration changed. Member files keep the
+        rendered machines, so a pack is reassembled without reading CouchDB.
+        """
+        if self.machine_name == self.pack:
+            raise ValueError(f"Machine name {self.pack} is reserved for the Telegraf pack")
+        os.makedirs(self._get_pack_folder(), exist_ok=True)
+        try:
+            self._write_if_changed(self._get_pack_member_path(), machine_configuration, self._iter_pack_member)
+            return self._write_pack_configuration(self.get_pack_members())
+        except OSError as e:
+            logger.error(f"Failed to write Telegraf pack {self.pack} for {self.machine_name}, Error: {e}")
+            return True
+
+    def _write_pack_configuration(self, members):
+        """Assemble the pack configuration from the member files. Returns whether it changed."""
+        pack_file_path = os.path.join(self.telegraf_config_folder, f"{self.pack}.conf")
+        changed = self._write_if_changed(pack_file_path, {}, lambda _: self._iter_pack_configuration(members))
+        if changed:
+            logger.info(f"Telegraf pack {self.pack} written with {len(members)} machines: {pack_file_path}")
+        return changed
+
+    def _get_pack_folder(self):
+        return os.path.join(self.telegraf_config_folder, f"{self.pack}.d")
+
+    def _get_pack_member_path(self):
+        return os.path.join(self._get_pack_folder(), f"{self.machine_name}.conf")
+
     def _get_machine_configuration(self):
         """Retrieve the configuration for a specific machine from CouchDB."""
         try:
@@ -62,34 +245,153 @@ class MachineConfigurationService:
             logger.error(f"An error occurred while retrieving configuration for {self.machine_name}: {e}")
             raise
     
-    def _write_configuration_content(self, file):
-        """Write all sections of the configuration file."""
-        try:
+    def _write_if_changed(self, config_file_path, machine_configuration, iter_content=None):
+        """Render the document into the fingerprinted file. Returns False when the file already holds this rendering.
+
+        A file fingerprinted with the same _rev and renderer version is trusted without
+        rendering. Otherwise the rendering is streamed into a temp file and hashed on
+        the way; the fingerprint line is written last, over a placeholder of the same
+        length. Only a changed rendering is renamed into place, so a watcher never
+        reads a half-written file. Writers of the same file are serialized and each
+        gets a temp file of its own. iter_content renders the document, by default
+        as a machine configuration of its own.
+        """
+        iter_content = iter_content or self._iter_configuration
+        with self._write_lock(config_file_path):
+            fingerprint = self._read_fingerprint(config_file_path)
+            rev = machine_configuration.get('_rev')
+            if fingerprint and rev and fingerprint.get('rev') == rev and fingerprint.get('renderer') == str(self.RENDERER_VERSION):
+                return False
+            header = f"{self.FINGERPRINT_PREFIX} rev={rev or '-'} renderer={self.RENDERER_VERSION} sha256="
+            digest = hashlib.sha256()
+            # Unique per writer and not *.conf: neither Telegraf nor get_configured_machines may pick up the temp file
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(config_file_path), prefix=f".{os.path.basename(config_file_path)}.", suffix=".tmp")
             try:
-                machineConfiguration = PlcDatalinkRFC1006Model.from_dict(self._get_machine_configuration()).to_json_dict()
-            except ValueError as e:
-                logger.error(f"Error creating configuration model: {str(e)}")
-                return jsonify({"error": str(e)}), 400
-            
-            logger.info(f"Writing configuration content to file. {machineConfiguration}")
-
-            sections = [
-                self._format_agent_configuration(machineConfiguration),
-                self._format_s7comm_configuration(machineConfiguration),
-                self._format_s7comm_metric(machineConfiguration),
-                self._format_dedup_processor(machineConfiguration),
-                self._format_mqtt_configuration(machineConfiguration)                
-            ]
-            file.write("\n".join(sections))
-            file.flush()
-        except Exception as e:
-            logger.error(f"Failed to write configuration content for {machineConfiguration}: {e}")
-            raise
+                with os.fdopen(fd, 'w') as file:
+                    # mkstemp creates the file owner-only, Telegraf must still be able to read the configuration
+                    os.fchmod(file.fileno(), 0o644)
+                    file.write(f"{header}{'0' * digest.digest_size * 2}\n")
+                    for chunk in iter_content(machine_configuration):
+                        digest.update(chunk.encode())
+                        file.write(chunk)
+                    changed = not (fingerprint and fingerprint.get('sha256') == digest.hexdigest())
+                    if changed:
+                        file.seek(0)
+                        file.write(f"{header}{digest.hexdigest()}\n")
+                        file.flush()
+                        os.fsync(file.fileno())
+                if changed:
+                    os.replace(tmp_path, config_file_path)
+                else:
+                    os.unlink(tmp_path)
+                return changed
+            except (OSError, ValueError):
+                if os.path.exists(tmp_path):
+                    os.unlink(tmp_path)
+                raise
+
+    @classmethod
+    def _write_lock(cls, config_file_path):
+        with cls._WRITE_LOCKS_GUARD:
+            return cls._WRITE_LOCKS.setdefault(os.path.abspath(config_file_path), threading.Lock())
+
+    def _read_fingerprint(self, config_file_path):
+        """Read the fingerprint line of a configuration file; None if missing or the body no longer matches it."""
+        try:
+            with open(config_file_path) as file:
+                header = file.readline()
+                body = file.read()
+        except OSError:
+            return None
+        if not header.startswith(self.FINGERPRINT_PREFIX):
+            return None
+        fingerprint = dict(
+            field.split("=", 1) for field in header[len(self.FINGERPRINT_PREFIX):].split() if "=" in field
+        )
+        # A hand-edited file is re-rendered
+        if fingerprint.get('sha256') != hashlib.sha256(body.encode()).hexdigest():
+            return None
+        return fingerprint
+
+    def _render_configuration(self, machine_configuration):
+        """Render all sections of the configuration file from the document."""
+        return "".join(self._iter_configuration(machine_configuration))
+
+    def _iter_configuration(self, machine_configuration):
+        """Yield the configuration file in chunks: one per section, and one per metric block.
+
+        Sections are separated by a blank line. The document is validated before the
+        first chunk, so an invalid one raises ValueError before anything is written.
+        """
+        machineConfiguration = PlcDatalinkRFC1006Model.from_dict(machine_configuration).to_json_dict()
+        logger.info(f"Rendering configuration for {machineConfiguration['machineData']['machineName']}: {len(machineConfiguration['plcTagData'])} tags")
+        yield self._format_agent_configuration(machineConfiguration)
+        # One s7comm input per rate class, each polling its tags at the class interval
+        for rate_class, tags in group_by_rate_class(machineConfiguration['plcTagData']):
+            class_configuration = {**machineConfiguration, 'plcTagData': tags}
+            yield "\n"
+            yield self._format_s7comm_configuration(class_configuration, rate_class)
+            yield from self._iter_s7comm_metric(class_configuration)
+        for format_section in (
+            self._format_internal_configuration,
+            self._format_deadband_processor,
+            self._format_dedup_processor,
+            self._format_aggregators,
+            self._format_message_merge,
+            self._format_mqtt_configuration,
+            self._format_stats_output
+        ):
+            section = format_section(machineConfiguration)
+            if section:
+                yield "\n"
+                yield section
+
+    def _iter_pack_member(self, machine_configuration):
+        """Yield the sections of one machine in a pack: its s7comm inputs, its MQTT output and its stats output.
+
+        The agent section is shared by the pack, so every input polls at an explicit
+        interval and the output carries the machine's flush interval and limits.
+        """
+        machineConfiguration = PlcDatalinkRFC1006Model.from_dict(machine_configuration).to_json_dict()
+        logger.info(f"Rendering pack member {machineConfiguration['machineData']['machineName']}: {len(machineConfiguration['plcTagData'])} tags")
+        yield PACK_MEMBER_HEADER(machine=machineConfiguration['machineData']['machineName'], weight=tag_reads_per_second(machineConfiguration))
+        for index, (rate_class, tags) in enumerate(group_by_rate_class(machineConfiguration['plcTagData'])):
+            class_configuration = {**machineConfiguration, 'plcTagData': tags}
+            if index:
+                yield "\n"
+            yield self._format_s7comm_configuration(class_configuration, rate_class, packed=True)
+            yield from self._iter_s7comm_metric(class_configuration)
+        for format_section in (self._format_deadband_processor, self._format_aggregators, self._format_message_merge):
+            section = format_section(machineConfiguration)
+            if section:
+                yield "\n"
+                yield section
+        for format_section in (self._format_mqtt_configuration, self._format_stats_output):
+            yield "\n"
+            yield format_section(machineConfiguration, packed=True)
+
+    def _iter_pack_configuration(self, members):
+        """Yield the pack configuration: the shared agent, self-monitoring and dedup sections, then every member file."""
+        yield self._format_pack_agent_configuration()
+        for format_section in (self._format_internal_configuration, self._format_dedup_processor):
+            yield "\n"
+            yield format_section(None)
+        for member in members:
+            yield "\n"
+            with open(os.path.join(self._get_pack_folder(), f"{member}.conf")) as file:
+                header = file.readline()
+                # The member's fingerprint only guards its own file
+                if not header.startswith(self.FINGERPRINT_PREFIX):
+                    yield header
+                yield file.read()
 
     def _format_agent_configuration(self, config):
-        """Format the agent section."""
+        """Format the agent section, with batch and buffer limits sized for the machine's metric rate."""
         agent = config['agent']
         machineData = config['machineData']
+        sizing = size_agent_buffers(config)
+        for warning in sizing.warnings:
+            logger.warning(f"{machineData['machineName']}: {warning}")
         lines = [
             "# agent Configuration",
             "[agent]",
@@ -97,11 +399,11 @@ class MachineConfigurationService:
             f"  round_interval = {self._format_bool(agent['roundInterval'])}",
             f"  hostname = {self._format_string(agent['hostname'])}",
             f"  flush_interval = {self._format_string(agent['flushInterval'])}",
-            f"  metric_batch_size = 100",
-            f"  metric_buffer_limit = 1000",
+            f"  metric_batch_size = {sizing.metric_batch_size}",
+            f"  metric_buffer_limit = {sizing.metric_buffer_limit}",
             f"  log_with_timezone = {self._format_string(agent['logTimezone'])}",
             f"  quiet = {self._format_bool(agent['quiet'])}",
-            f"  debug = true",
+            f"  debug = {self._format_bool(agent.get('debug', False))}",
             f"  logtarget = {self._format_string('file')}",
             f"  logfile = \"{self.telegraf_config_folder}/{machineData['machineName']}.log\"",
             f"  logfile_rotation_max_size = {self._format_string('25MB')}",
@@ -110,46 +412,249 @@ class MachineConfigurationService:
             ]
         return "\n".join(lines)
 
-    def _format_s7comm_configuration(self, config):
-        """Format the S7comm input plugin section."""
+    def _format_pack_agent_configuration(self):
+        """Format the agent section shared by all machines of the pack. Its interval only paces the self-monitoring."""
+        lines = [
+            f"# agent Configuration of pack {self.pack}",
+            "[agent]",
+            f"  interval = {self._format_string('1s')}",
+            "  round_interval = true",
+            f"  hostname = {self._format_string('PLC Datalink RFC1006')}",
+            f"  flush_interval = {self._format_string('1s')}",
+            f"  metric_batch_size = {DEFAULT_METRIC_BATCH_SIZE}",
+            f"  metric_buffer_limit = {DEFAULT_METRIC_BUFFER_LIMIT}",
+            f"  log_with_timezone = {self._format_string('local')}",
+            "  quiet = false",
+            "  debug = false",
+            f"  logtarget = {self._format_string('file')}",
+            f"  logfile = \"{self.telegraf_config_folder}/{self.pack}.log\"",
+            f"  logfile_rotation_max_size = {self._format_string('25MB')}",
+            "  logfile_rotation_max_archives = 1",
+            ""
+            ]
+        return "\n".join(lines)
+
+    def _format_s7comm_configuration(self, config, rate_class=DEFAULT_RATE_CLASS, packed=False):
+        """Format the S7comm input plugin section, with its own interval for rate classes other than the default.
+
+        Packed, the input is aliased and tagged with the machine name and always sets its interval.
+        """
         machineData = config['machineData']
         server = self._format_server(machineData['plcIp'], machineData.get('plcPort'))
+        interval = RATE_CLASS_INTERVALS[rate_class]
+        header = "# inputs.s7comm Configuration" + (f" ({rate_class})" if interval else "")
+        input_tags = []
+        if packed:
+            header += f" of {machineData['machineName']}"
+            interval = interval or f"{machineData['requestInterval']}s"
+            input_tags.append((PACK_MACHINE_TAG, machineData['machineName']))
+        if rate_class in aggregations_by_rate_class(config):
+            input_tags.append((AGGREGATION_TAG, f"{machineData['machineName']}.{rate_class}"))
         lines = [
-            "# inputs.s7comm Configuration",
+            header,
             "[[inputs.s7comm]]",
+            *([f"  alias = {self._format_string(machineData['machineName'])}"] if packed else []),
+            *([f"  interval = {self._format_string(interval)}"] if interval else []),
             f"  server = {self._format_string(server)}",
             f"  rack = {machineData['plcRack']}",
             f"  slot = {machineData['plcSlot']}",
             f"  timeout = {self._format_string(machineData['requestS7commTimeout'])}",
             f"  pdu_size = {machineData['pduSize']}",
             f"  debug_connection = false",
+            *(["  [inputs.s7comm.tags]"] if input_tags else []),
+            *(f"    {key} = {self._format_string(value)}" for key, value in input_tags),
             f""
         ]
         return "\n".join(lines)
     
-    def _format_s7comm_metric(self, config):
-        """Format individual S7comm metrics."""
-        lines = []
+    def _iter_s7comm_metric(self, config):
+        """Yield individual S7comm metrics, or one metric per planned read range when readGap is set."""
+        machineData = config['machineData']
+        if machineData.get('readGap') is not None:
+            plan = plan_reads(config['plcTagData'], machineData['pduSize'], machineData['readGap'])
+            logger.info(f"Read plan for {machineData['machineName']}: {plan.report()}")
+            yield from self._iter_s7comm_ranges(config, plan)
+            return
+        machine_name = machineData['machineName']
+        prefix = f"{machine_name}."
+        bands = deadband_bands(config['plcTagData'])
+        message_group = self._get_message_group(config)
         for metric in config['plcTagData']:
-            lines.append("  [[inputs.s7comm.metric]]")
-            lines.append(f"    fields = [{{ name=\"{config['machineData']['machineName']}.{metric['tagName']}\", address=\"{metric['tagAddress']}\" }}]")
-            lines.append("    [inputs.s7comm.metric.tags]")
-            lines.append(f"      machine = \"{config['machineData']['machineName']}.{metric['tagName']}\"")
-            lines.append(f"")
+            template = S7COMM_FILTERED_METRIC_TEMPLATE if metric['tagName'] in bands else S7COMM_METRIC_TEMPLATE
+            block = template(name=prefix + metric['tagName'], address=metric['tagAddress'], machine=machine_name)
+            if message_group:
+                block += S7COMM_MESSAGE_TAG_LINE(group=message_group(parse_tag_address(metric['tagAddress'])))
+            yield block
+
+    def _iter_s7comm_ranges(self, config, plan):
+        """Yield one [[inputs.s7comm.metric]] block per read range, with its tags as fields in address order.
+
+        A range with a deadband filtered tag is filtered as a whole, its other fields on any change.
+        """
+        machine_name = config['machineData']['machineName']
+        bands = deadband_bands(config['plcTagData'])
+        message_group = self._get_message_group(config)
+        for read_range in plan.ranges:
+            fields = "".join(
+                S7COMM_RANGE_FIELD_TEMPLATE(name=f"{machine_name}.{metric['tagName']}", address=metric['tagAddress'])
+                for metric in read_range.tags
+            )
+            filtered = any(metric['tagName'] in bands for metric in read_range.tags)
+            template = S7COMM_FILTERED_RANGE_TEMPLATE if filtered else S7COMM_RANGE_TEMPLATE
+            block = template(label=read_range.label, fields=fields, machine=machine_name)
+            if message_group:
+                block += S7COMM_MESSAGE_TAG_LINE(group=message_group(read_range))
+            yield block
+
+    def _format_deadband_processor(self, config):
+        """Format the Starlark processor filtering the machine's deadband tags, or "" if it has none.
+
+        Every filtered field maps to (threshold, percent, max silence in ns). The
+        filter keeps the last published value and time of each field in its state.
+        """
+        machine_name = config['machineData']['machineName']
+        bands = deadband_bands(config['plcTagData'])
+        if not bands:
+            return ""
+        lines = [
+            f"# Deadband filter of {machine_name}",
+            "[[processors.starlark]]",
+            "  source = '''",
+            f"DEFAULT_BAND = (0, False, {DEDUP_INTERVAL * 10**9})",
+            "BANDS = {",
+            *(
+                f"    \"{machine_name}.{tag_name}\": ({threshold!r}, {percent}, {round(max_silence * 10**9)}),"
+                for tag_name, (threshold, percent, max_silence) in bands.items()
+            ),
+            "}",
+            DEADBAND_FILTER_FUNCTIONS + "'''",
+            "  [processors.starlark.tagpass]",
+            f"    {DEADBAND_TAG} = [{self._format_string(machine_name)}]",
+            ""
+        ]
         return "\n".join(lines)
 
     def _format_dedup_processor(self, config):
-        """Format the dedup processor section."""
+        """Format the dedup processor section. It leaves the metrics of deadband filtered tags, if any, to their Starlark filter,
+        and the samples and aggregates of aggregated rate classes to their aggregators and the output.
+
+        The dedup processor of a pack (config None) is shared by all machines and always skips them.
+        """
+        # Messages are merged after dedup, which sees every tag as its own series like without merging
+        skipped = [DEADBAND_TAG, AGGREGATION_TAG] if config is None else [tag for tag in self._get_routing_tags(config) if tag != MESSAGE_TAG]
         lines = [
             "# Filter metrics with repeating field values",
             "[[processors.dedup]]",
-            f"  dedup_interval = \"86400s\"",
+            "  namedrop = [\"internal_*\"]",
+            f"  dedup_interval = \"{DEDUP_INTERVAL}s\"",
+            *(["  [processors.dedup.tagdrop]"] if skipped else []),
+            *(f"    {tag} = [\"*\"]" for tag in skipped),
             f""
         ]
         return "\n".join(lines)
     
-    def _format_mqtt_configuration(self, config):
-        """Format the MQTT output plugin section."""
+    def _format_aggregators(self, config):
+        """Format the aggregators of every aggregated rate class in use, or "" if there are none.
+
+        basicstats publishes all statistics but "last" once per window, final the
+        last sample of the window. Both take only the class's metrics.
+        """
+        machine_name = config['machineData']['machineName']
+        lines = []
+        for rate_class, aggregation in self._get_aggregations(config):
+            selector = self._format_list([f"{machine_name}.{rate_class}"])
+            stats = [stat for stat in aggregation['stats'] if stat != "last"]
+            if lines:
+                lines.append("")
+            lines.append(f"# Aggregation of the {rate_class} tags of {machine_name} over {aggregation['period']}")
+            if stats:
+                lines += [
+                    "[[aggregators.basicstats]]",
+                    f"  period = {self._format_string(aggregation['period'])}",
+                    f"  drop_original = {self._format_bool(aggregation['dropOriginal'])}",
+                    f"  stats = {self._format_list(stats)}",
+                    "  [aggregators.basicstats.tagpass]",
+                    f"    {AGGREGATION_TAG} = {selector}",
+                ]
+            if "last" in aggregation['stats']:
+                lines += [
+                    *([""] if stats else []),
+                    "[[aggregators.final]]",
+                    f"  period = {self._format_string(aggregation['period'])}",
+                    f"  drop_original = {self._format_bool(aggregation['dropOriginal'])}",
+                    f"  output_strategy = {self._format_string('periodic')}",
+                    "  [aggregators.final.tagpass]",
+                    f"    {AGGREGATION_TAG} = {selector}",
+                ]
+        return "\n".join(lines + [""]) if lines else ""
+
+    def _get_aggregations(self, config):
+        """(rate class, aggregation) of the aggregated rate classes that have tags, in polling order."""
+        aggregations = aggregations_by_rate_class(config)
+        return [
+            (rate_class, aggregations[rate_class])
+            for rate_class, tags in group_by_rate_class(config['plcTagData']) if tags and rate_class in aggregations
+        ]
+
+    def _format_message_merge(self, config):
+        """Format the message merge of mqttMessageMode cycle or db, or "" for one message per metric.
+
+        A Starlark processor gives the metrics of one message the same tags, the
+        merge aggregator then folds the metrics of one message and timestamp into
+        one metric. Metrics of aggregated rate classes are left to their aggregators.
+        """
+        message_groups = self._get_message_groups(config)
+        if not message_groups:
+            return ""
+        machine_name = config['machineData']['machineName']
+        mode = config['mqttData']['mqttMessageMode']
+        selector = [f"    {MESSAGE_TAG} = {self._format_list(message_groups)}"]
+        lines = [
+            f"# One MQTT message per poll cycle {'and DB ' if mode == 'db' else ''}of {machine_name}",
+            "[[processors.starlark]]",
+            "  source = '''" + MESSAGE_MERGE_SOURCE + "'''",
+            "  [processors.starlark.tagpass]",
+            *selector,
+            "",
+            "[[aggregators.merge]]",
+            f"  period = {self._format_string(config['agent']['flushInterval'])}",
+            # A poll cycle read across the end of a period still joins its message
+            f"  grace = {self._format_string(config['machineData']['requestS7commTimeout'])}",
+            "  drop_original = true",
+            "  [aggregators.merge.tagpass]",
+            *selector,
+            *(["  [aggregators.merge.tagdrop]", f"    {AGGREGATION_TAG} = [\"*\"]"] if self._get_aggregations(config) else []),
+            ""
+        ]
+        return "\n".join(lines)
+
+    def _get_message_group(self, config):
+        """Function naming the message of a metric from its address or read range (area and number), or None for one message per metric."""
+        machine_name = config['machineData']['machineName']
+        mode = config['mqttData'].get('mqttMessageMode', DEFAULT_MQTT_MESSAGE_MODE)
+        if mode == "cycle":
+            return lambda address: machine_name
+        if mode == "db":
+            return lambda address: f"{machine_name}.{address.area}{address.db}"
+        return None
+
+    def _get_message_groups(self, config):
+        """Sorted names of the machine's messages per poll cycle, empty for one message per metric."""
+        message_group = self._get_message_group(config)
+        if message_group is None:
+            return []
+        return sorted({message_group(parse_tag_address(tag['tagAddress'])) for tag in config['plcTagData']})
+
+    def _get_routing_tags(self, config):
+        """Tags marking the machine's metrics for its deadband filter, aggregators and message merge, dropped by the MQTT output."""
+        return [
+            *([DEADBAND_TAG] if deadband_bands(config['plcTagData']) else []),
+            *([AGGREGATION_TAG] if self._get_aggregations(config) else []),
+            *([MESSAGE_TAG] if self._get_message_group(config) else []),
+        ]
+
+    def _format_mqtt_configuration(self, config, packed=False):
+        """Format the MQTT output plugin section. Packed, it only takes the machine's metrics and carries the machine's flush interval and limits."""
         mqtt = config['mqttData']
         mqtt_server = f"tcp://{mqtt['mqttIp']}:{mqtt['mqttPort']}"
         lines = [
@@ -159,8 +664,60 @@ class MachineConfigurationService:
             f"  topic = {self._format_string(mqtt['mqttTopic'])}",
             f"  data_format = {self._format_string(mqtt['mqttDataFormat'])}",
             f"  layout = {self._format_string(mqtt['mqttLayout'])}",
-            f"  json_timestamp_units = {self._format_string(mqtt['mqttJsonTimestampUnits'])}",
-            f""
+            # MessagePack and line protocol carry nanosecond timestamps of their own
+            *([f"  json_timestamp_units = {self._format_string(mqtt['mqttJsonTimestampUnits'])}"] if mqtt['mqttDataFormat'] == "json" else []),
+            "  namedrop = [\"internal_*\"]",
+            *([f"  tagexclude = {self._format_list(self._get_routing_tags(config))}"] if not packed and self._get_routing_tags(config) else []),
+            *(self._format_pack_output_routing(config) if packed else []),
+            ""
+        ]
+        return "\n".join(lines)
+
+    def _format_pack_output_routing(self, config):
+        """Lines of a packed machine's MQTT output: agent settings moved to the output, then the machine tag filter."""
+        machine_name = config['machineData']['machineName']
+        sizing = size_agent_buffers(config)
+        for warning in sizing.warnings:
+            logger.warning(f"{machine_name}: {warning}")
+        return [
+            f"  flush_interval = {self._format_string(config['agent']['flushInterval'])}",
+            f"  metric_batch_size = {sizing.metric_batch_size}",
+            f"  metric_buffer_limit = {sizing.metric_buffer_limit}",
+            f"  tagexclude = {self._format_list([PACK_MACHINE_TAG, *self._get_routing_tags(config)])}",
+            "  [outputs.mqtt.tagpass]",
+            f"    {PACK_MACHINE_TAG} = [{self._format_string(machine_name)}]",
+        ]
+
+    def _format_internal_configuration(self, config):
+        """Format the internal input plugin section, reporting gather counts and errors of the s7comm inputs."""
+        lines = [
+            "# Telegraf self-monitoring of the s7comm inputs",
+            "[[inputs.internal]]",
+            "  collect_memstats = false",
+            "  namepass = [\"internal_gather\"]",
+            "  [inputs.internal.tagpass]",
+            "    input = [\"s7comm\"]",
+            ""
+        ]
+        return "\n".join(lines)
+
+    def _format_stats_output(self, config, packed=False):
+        """Format the file output plugin section writing the self-monitoring metrics to the stats file the backend reads the machine state from.
+
+        Packed, it only takes the samples of the inputs aliased with the machine name.
+        """
+        machineData = config['machineData']
+        lines = [
+            "# Machine state, read by TelegrafService.get_current_telegraf_state",
+            "[[outputs.file]]",
+            f"  files = [\"{self.telegraf_config_folder}/{machineData['machineName']}.stats\"]",
+            "  namepass = [\"internal_gather\"]",
+            f"  data_format = {self._format_string('json')}",
+            f"  json_timestamp_units = {self._format_string('1ms')}",
+            f"  rotation_max_size = {self._format_string('1MB')}",
+            "  rotation_max_archives = 1",
+            *(["  [outputs.file.tagpass]", f"    alias = [{self._format_string(machineData['machineName'])}]"] if packed else []),
+            ""
         ]
         return "\n".join(lines)
 
@@ -170,6 +727,9 @@ class MachineConfigurationService:
     
     def _format_bool(self, value):
         return str(value).lower()
+
+    def _format_list(self, values):
+        return f"[{', '.join(self._format_string(value) for value in values)}]"
         
     def _format_server(self, ip, port=None):
         return f"{ip}:{port}" if port else ip
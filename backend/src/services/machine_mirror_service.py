@@ -0,0 +1,231 @@
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+
+import requests
+
+# Logger instance defined in `init.py`
+logger = logging.getLogger('application_logger')
+
+
+class MachineMirrorService:
+    """In-memory mirror of every document in the datalink database, kept current by following `_changes`.
+
+    The feed is read with `feed=normal` until the mirror has caught up and with
+    `feed=longpoll` afterwards. The mirror and its `last_seq` are checkpointed to
+    a JSON file, so a restart resumes from there instead of re-downloading the
+    whole database. The checkpoint doubles as the on-disk snapshot that reads
+    fall back to while CouchDB is unavailable; `snapshot_age()` tells how long
+    ago the mirror was last confirmed in sync. Documents handed out are shared
+    with the mirror and must be treated as read-only.
+    """
+
+    def __init__(
+        self,
+        couchdb_service,
+        checkpoint_path,
+        poll_timeout_ms=60000,
+        batch_size=500,
+        checkpoint_interval=5.0,
+        retry_interval=5.0,
+    ):
+        self.couchdb_service = couchdb_service
+        self.checkpoint_path = Path(checkpoint_path)
+        self.poll_timeout_ms = poll_timeout_ms
+        self.batch_size = batch_size
+        self.checkpoint_interval = checkpoint_interval
+        self.retry_interval = retry_interval
+
+        self.last_seq = '0'
+        self.synced_at = None
+        self._docs = {}
+        self._applied_revs = {}
+        self._expected_revs = {}
+        self._listeners = []
+        self._synced = False
+        self._feed_ok = True
+        self._bootstrapping = True
+        self._last_checkpoint = 0.0
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def add_listener(self, callback):
+        """Register callback(doc_id, doc) for live changes; doc is None when the document was deleted."""
+        self._listeners.append(callback)
+
+    def start(self):
+        """Load the last checkpoint and start following the feed in a daemon thread."""
+        self.load_checkpoint()
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._follow, name='machine-mirror', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+        self.save_checkpoint()
+
+    def is_ready(self, doc_id=None):
+        """True when the mirror is caught up, still following the feed and no write made through the API is missing from it."""
+        with self._lock:
+            if not self._synced or not self._feed_ok:
+                return False
+            if doc_id is not None:
+                return doc_id not in self._expected_revs
+            return not self._expected_revs
+
+    def get_doc(self, doc_id):
+        """Return the mirrored document, or None if the mirror does not hold it."""
+        with self._lock:
+            return self._docs.get(doc_id)
+
+    def all_docs(self, startkey=None, limit=None):
+        """Return the mirror in the shape of CouchDB `_all_docs?include_docs=true`, paginated like CouchDBService.get_all_docs."""
+        with self._lock:
+            doc_ids = sorted(self._docs)
+            docs = dict(self._docs)
+        offset = bisect.bisect_left(doc_ids, startkey) if startkey is not None else 0
+        page_ids = doc_ids[offset : offset + limit] if limit else doc_ids[offset:]
+        rows = [
+            {'id': doc_id, 'key': doc_id, 'value': {'rev': docs[doc_id]['_rev']}, 'doc': docs[doc_id]}
+            for doc_id in page_ids
+        ]
+        result = {'total_rows': len(doc_ids), 'offset': offset, 'rows': rows}
+        if limit:
+            next_index = offset + limit
+            result['next'] = doc_ids[next_index] if next_index < len(doc_ids) else None
+        return result
+
+    def has_snapshot(self):
+        """True when the mirror holds a complete, if possibly stale, copy of the database."""
+        with self._lock:
+            return self.synced_at is not None
+
+    def snapshot_age(self):
+        """Seconds since the mirror was last confirmed in sync with CouchDB, or None without a snapshot."""
+        with self._lock:
+            return None if self.synced_at is None else max(0.0, time.time() - self.synced_at)
+
+    def expect_revision(self, doc_id, rev):
+        """Hold back mirror reads of doc_id until the feed has delivered rev, so API callers read their own writes."""
+        with self._lock:
+            if not self._is_applied(doc_id, rev):
+                self._expected_revs[doc_id] = rev
+
+    def load_checkpoint(self):
+        """Restore mirror and last_seq from the checkpoint file, if there is a usable one."""
+        try:
+            with open(self.checkpoint_path) as file:
+                checkpoint = json.load(file)
+            with self._lock:
+                self._docs = checkpoint['docs']
+                self._applied_revs = {doc_id: doc['_rev'] for doc_id, doc in self._docs.items()}
+                self.last_seq = checkpoint['last_seq']
+                # None for a checkpoint taken mid-download; checkpoints written before
+                # synced_at existed fall back to the file time
+                self.synced_at = (
+                    checkpoint['synced_at'] if 'synced_at' in checkpoint else os.path.getmtime(self.checkpoint_path)
+                )
+                self._bootstrapping = False
+            logger.info(f'Resuming machine mirror from checkpoint with {len(self._docs)} documents')
+            return True
+        except FileNotFoundError:
+            logger.info(f'No machine mirror checkpoint at {self.checkpoint_path}, starting from scratch')
+        except (OSError, ValueError, KeyError) as e:
+            logger.error(f'Ignoring unreadable machine mirror checkpoint {self.checkpoint_path}: {e}')
+        return False
+
+    def save_checkpoint(self):
+        """Atomically write mirror and last_seq to the checkpoint file."""
+        with self._lock:
+            checkpoint = {'last_seq': self.last_seq, 'synced_at': self.synced_at, 'docs': dict(self._docs)}
+        tmp_path = self.checkpoint_path.with_name(self.checkpoint_path.name + '.tmp')
+        try:
+            self.checkpoint_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(tmp_path, 'w') as file:
+                json.dump(checkpoint, file, separators=(',', ':'))
+            os.replace(tmp_path, self.checkpoint_path)
+            self._last_checkpoint = time.monotonic()
+        except OSError as e:
+            logger.error(f'Failed to write machine mirror checkpoint {self.checkpoint_path}: {e}')
+
+    def poll_once(self):
+        """Fetch and apply one batch from the changes feed. Returns the number of changes applied."""
+        feed = 'longpoll' if self._synced else 'normal'
+        result = self.couchdb_service.get_changes(
+            since=self.last_seq, feed=feed, timeout_ms=self.poll_timeout_ms, limit=self.batch_size
+        )
+        changes = result.get('results', [])
+        notify = not self._bootstrapping
+        for change in changes:
+            self._apply_change(change, notify)
+
+        with self._lock:
+            self.last_seq = result.get('last_seq', self.last_seq)
+            if len(changes) < self.batch_size:
+                if not self._synced:
+                    logger.info(f'Machine mirror caught up with {len(self._docs)} documents')
+                self._synced = True
+                self._bootstrapping = False
+            if self._synced:
+                self.synced_at = time.time()
+            self._feed_ok = True
+
+        if changes and time.monotonic() - self._last_checkpoint >= self.checkpoint_interval:
+            self.save_checkpoint()
+        return len(changes)
+
+    def _follow(self):
+        while not self._stop_event.is_set():
+            try:
+                self.poll_once()
+            except requests.exceptions.RequestException as e:
+                logger.error(f'Machine mirror lost the changes feed, retrying in {self.retry_interval}s: {e}')
+                self._feed_ok = False
+                self._stop_event.wait(self.retry_interval)
+            except Exception as e:
+                logger.error(f'Unexpected error in machine mirror: {e}')
+                self._feed_ok = False
+                self._stop_event.wait(self.retry_interval)
+
+    def _apply_change(self, change, notify):
+        doc_id = change['id']
+        doc = change.get('doc')
+        deleted = change.get('deleted', False)
+        rev = doc['_rev'] if doc else change['changes'][0]['rev']
+        with self._lock:
+            if deleted:
+                self._docs.pop(doc_id, None)
+            else:
+                self._docs[doc_id] = doc
+            self._applied_revs[doc_id] = rev
+            expected = self._expected_revs.get(doc_id)
+            if expected and self._is_applied(doc_id, expected):
+                del self._expected_revs[doc_id]
+
+        if notify:
+            for listener in self._listeners:
+                try:
+                    listener(doc_id, None if deleted else doc)
+                except Exception as e:
+                    logger.error(f'Machine mirror listener failed for {doc_id}: {e}')
+
+    def _is_applied(self, doc_id, rev):
+        """A revision counts as applied once the mirror holds it or any later generation."""
+        applied = self._applied_revs.get(doc_id)
+        if applied is None:
+            return False
+        return applied == rev or self._generation(applied) > self._generation(rev)
+
+    @staticmethod
+    def _generation(rev):
+        try:
+            return int(rev.split('-', 1)[0])
+        except (AttributeError, ValueError):
+            return 0
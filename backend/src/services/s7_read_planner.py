@@ -0,0 +1,225 @@
+from dataclasses import dataclass, field
+
+from ..plc_datalink_rfc1006_model import RATE_CLASS_INTERVALS, group_by_rate_class, parse_duration
+from ..s7_tag_address import parse_tag_address
+
+# S7 read-var framing: header and parameter bytes per PDU, then per item.
+REQUEST_HEADER = 12
+REQUEST_ITEM = 12
+RESPONSE_HEADER = 14
+RESPONSE_ITEM = 4
+MAX_ITEMS_PER_PDU = 20
+# Smallest PDU length an S7 CPU negotiates (S7-300/1200). Larger CPUs offer 480 or 960.
+DEFAULT_PDU_LENGTH = 240
+# Per packet: Ethernet, IPv4 and TCP headers, then TPKT and COTP in front of the S7 PDU.
+FRAME_OVERHEAD = 58
+ISO_ON_TCP_HEADER = 7
+DEFAULT_ROUND_TRIP_MS = 1.0
+DEFAULT_LINK_MBITS = 100
+
+
+@dataclass
+class ReadRange:
+    area: str
+    db: int
+    start: int
+    end: int
+    tags: list[dict] = field(default_factory=list)
+
+    @property
+    def size(self):
+        return self.end - self.start
+
+    @property
+    def label(self):
+        return f'{self.area}{self.db}.B{self.start}-{self.end - 1}'
+
+
+@dataclass
+class ReadPlan:
+    ranges: list[ReadRange]
+    items: int
+    pdus: int
+
+    def report(self):
+        """Summarize one poll cycle of the rendered plan: metric blocks (ranges), bytes covered, read items and PDUs."""
+        return {
+            'ranges': len(self.ranges),
+            'bytes': sum(read_range.size for read_range in self.ranges),
+            'items': self.items,
+            'pdus': self.pdus,
+        }
+
+
+@dataclass
+class CycleEstimate:
+    tags: int
+    requests: int
+    request_bytes: int
+    response_bytes: int
+    wire_bytes: int
+    pdu_length: int
+    pdu_utilisation: float
+    cycle_time_ms: float
+    request_interval_ms: float
+    requests_per_second: float = 0.0
+    inputs: list[dict] = field(default_factory=list)
+    warnings: list[str] = field(default_factory=list)
+
+    def to_json_dict(self):
+        return {
+            'tags': self.tags,
+            'requests': self.requests,
+            'requestBytes': self.request_bytes,
+            'responseBytes': self.response_bytes,
+            'wireBytes': self.wire_bytes,
+            'pduLength': self.pdu_length,
+            'pduUtilisation': round(self.pdu_utilisation, 3),
+            'cycleTimeMs': round(self.cycle_time_ms, 3),
+            'requestIntervalMs': self.request_interval_ms,
+            'requestsPerSecond': round(self.requests_per_second, 3),
+            'inputs': self.inputs,
+            'warnings': self.warnings,
+        }
+
+
+def plan_reads(tags, batch_size, max_gap=0, pdu_length=DEFAULT_PDU_LENGTH):
+    """Coalesce plcTagData entries into contiguous byte ranges per DB.
+
+    Tags of the same area and DB are sorted by offset and merged while the hole
+    to the next tag is at most max_gap bytes and the range still fits into the
+    data part of one response PDU. A range is rendered as one
+    [[inputs.s7comm.metric]] block, but the s7comm input still reads every
+    field as its own item and batches items by count, so the plan counts one
+    item per tag and packs them into PDUs of at most batch_size items in the
+    order the renderer emits them. Ranges do not reduce items or PDUs.
+    """
+    if max_gap < 0:
+        raise ValueError('max_gap must not be negative')
+    addresses = [parse_tag_address(tag['tagAddress']) for tag in tags]
+    max_range = pdu_length - RESPONSE_HEADER - RESPONSE_ITEM
+    ranges = []
+    for address, tag in sorted(
+        zip(addresses, tags), key=lambda pair: (pair[0].area, pair[0].db, pair[0].start, pair[0].end)
+    ):
+        current = ranges[-1] if ranges else None
+        if (
+            current is not None
+            and (current.area, current.db) == (address.area, address.db)
+            and address.start - current.end <= max_gap
+            and max(current.end, address.end) - current.start <= max_range
+        ):
+            current.end = max(current.end, address.end)
+            current.tags.append(tag)
+        else:
+            ranges.append(ReadRange(address.area, address.db, address.start, address.end, [tag]))
+    max_items = max(1, min(batch_size, MAX_ITEMS_PER_PDU))
+    # The renderer emits the fields range by range, in address order
+    item_sizes = [parse_tag_address(tag['tagAddress']).size for read_range in ranges for tag in read_range.tags]
+    return ReadPlan(ranges=ranges, items=len(item_sizes), pdus=count_pdus(item_sizes, max_items, pdu_length))
+
+
+def count_pdus(item_sizes, max_items, pdu_length=DEFAULT_PDU_LENGTH):
+    """Number of read requests needed to fetch items of the given byte sizes, filled in order."""
+    return len(_pack_requests(item_sizes, max_items, pdu_length))
+
+
+def estimate_cycle(
+    configuration, pdu_length=DEFAULT_PDU_LENGTH, round_trip_ms=DEFAULT_ROUND_TRIP_MS, link_mbits=DEFAULT_LINK_MBITS
+):
+    """Estimate the S7 traffic and the shortest possible duration of one poll cycle of a configuration.
+
+    Every rate class is rendered as its own s7comm input, so it is estimated as
+    its own cycle at its own interval; the totals add one cycle of each input.
+    Tags are read one item each, in the order the renderer emits them, with at
+    most pduSize items per request. The cycle time is a lower bound: one PLC
+    round trip per request plus the transfer time of both directions.
+    """
+    if pdu_length < DEFAULT_PDU_LENGTH:
+        raise ValueError(f'pdu_length must be at least {DEFAULT_PDU_LENGTH}')
+    if round_trip_ms < 0 or link_mbits <= 0:
+        raise ValueError('round_trip_ms must not be negative and link_mbits must be positive')
+    machine_data = configuration['machineData']
+    max_items = max(1, min(machine_data['pduSize'], MAX_ITEMS_PER_PDU))
+    request_interval_ms = machine_data['requestInterval'] * 1000
+    estimate = CycleEstimate(0, 0, 0, 0, 0, pdu_length, 0.0, 0.0, request_interval_ms)
+
+    for rate_class, tags in group_by_rate_class(configuration['plcTagData']):
+        if machine_data.get('readGap') is not None:
+            tags = [
+                tag
+                for read_range in plan_reads(tags, machine_data['pduSize'], machine_data['readGap'], pdu_length).ranges
+                for tag in read_range.tags
+            ]
+        addresses = [parse_tag_address(tag['tagAddress']) for tag in tags]
+        requests = _pack_requests([address.size for address in addresses], max_items, pdu_length)
+        request_bytes = sum(request for _, request, _ in requests)
+        response_bytes = sum(response for _, _, response in requests)
+        wire_bytes = request_bytes + response_bytes + 2 * len(requests) * (FRAME_OVERHEAD + ISO_ON_TCP_HEADER)
+        cycle_time_ms = len(requests) * round_trip_ms + wire_bytes * 8 / (link_mbits * 1000)
+        interval_ms = _interval_ms(RATE_CLASS_INTERVALS[rate_class], request_interval_ms)
+
+        estimate.tags += len(addresses)
+        estimate.requests += len(requests)
+        estimate.request_bytes += request_bytes
+        estimate.response_bytes += response_bytes
+        estimate.wire_bytes += wire_bytes
+        estimate.cycle_time_ms += cycle_time_ms
+        estimate.requests_per_second += len(requests) * 1000 / interval_ms
+        estimate.inputs.append(
+            {
+                'rateClass': rate_class,
+                'intervalMs': interval_ms,
+                'tags': len(addresses),
+                'requests': len(requests),
+                'wireBytes': wire_bytes,
+                'cycleTimeMs': round(cycle_time_ms, 3),
+            }
+        )
+        if interval_ms < cycle_time_ms:
+            interval = RATE_CLASS_INTERVALS[rate_class] or f'{machine_data["requestInterval"]}s'
+            estimate.warnings.append(
+                f'Interval of {interval} ({rate_class}) is shorter than the estimated read time of {cycle_time_ms:.1f} ms'
+            )
+        max_item = pdu_length - RESPONSE_HEADER - RESPONSE_ITEM
+        for tag, address in zip(tags, addresses):
+            if address.size > max_item:
+                estimate.warnings.append(
+                    f'Tag {tag["tagName"]} ({address.size} bytes) does not fit into one {pdu_length} byte PDU'
+                )
+
+    if estimate.requests:
+        estimate.pdu_utilisation = estimate.response_bytes / (estimate.requests * pdu_length)
+    if machine_data['pduSize'] > MAX_ITEMS_PER_PDU:
+        estimate.warnings.append(
+            f'pduSize {machine_data["pduSize"]} exceeds the {MAX_ITEMS_PER_PDU} items an S7 CPU accepts per request'
+        )
+    return estimate
+
+
+def _interval_ms(interval, default_ms):
+    """Milliseconds of a Telegraf interval like "100ms" or "60s"; None means the default."""
+    return default_ms if interval is None else parse_duration(interval) * 1000
+
+
+def _pack_requests(item_sizes, max_items, pdu_length):
+    """Fill read requests in order. Returns (items, request bytes, response bytes) per request."""
+    requests = []
+    items = request = response = 0
+    for size in item_sizes:
+        # Every item is counted padded to an even length; S7 leaves the last one unpadded,
+        # so an odd-sized last item is overcounted by one byte
+        item_response = RESPONSE_ITEM + size + size % 2
+        if items and (
+            items >= max_items or request + REQUEST_ITEM > pdu_length or response + item_response > pdu_length
+        ):
+            requests.append((items, request, response))
+            items = 0
+        if items == 0:
+            request, response = REQUEST_HEADER, RESPONSE_HEADER
+        items += 1
+        request += REQUEST_ITEM
+        response += item_response
+    if items:
+        requests.append((items, request, response))
+    return requests
@@ -1,15 +1,43 @@
-import os, time, logging, subprocess, signal, re, threading
+import json
+import logging
+import os
+import re
+import signal
+import subprocess
+import threading
+import time
+from datetime import datetime
 from pathlib import Path
+
 from .machine_configuration_service import MachineConfigurationService
+from .worker_pool import choose_worker, find_worker, plan_rebalance, worker_names
 
 logger = logging.getLogger('application_logger')
 
 
 class TelegrafService:
-    def __init__(self, telegraf_config_folder, machine_name, couchdb_service):
+    # Seconds to wait for Telegraf to log a config reload, first for --watch-config, then after SIGHUP
+    RELOAD_TIMEOUT = 5.0
+    RELOAD_POLL_INTERVAL = 0.1
+    # Samples read from the end of the stats file, and the age (at least, or three sample periods)
+    # after which the newest one counts as Telegraf no longer running
+    STATS_LINES = 20
+    STATS_STALE_AFTER = 30.0
+    # Program entries written by dynamic_startup_telegraf.sh, one per Telegraf config
+    SUPERVISOR_CONF_FOLDER = Path("/etc/supervisor/conf.d")
+    QUIET_PATTERN = re.compile(r"^\s*quiet = true$", re.MULTILINE)
+
+    def __init__(self, telegraf_config_folder, machine_name, couchdb_service, pack=None, workers=0):
         self.telegraf_config_folder = Path(telegraf_config_folder)
         self.machine_name = machine_name
         self.couchdb_service = couchdb_service
+        # With a pool of workers, machines are packed into the worker they are assigned to, or the least loaded one on start
+        self.workers = worker_names(workers)
+        if self.workers:
+            pack = find_worker(self._get_worker_loads(), machine_name)
+        # With a pack, the machine runs inside the pack's Telegraf process, whose config and log carry the pack name
+        self.pack = pack
+        self.process_name = pack or machine_name
 
         self.patterns = {
             "init_plugins": re.compile(r"\[agent\] Initializing plugins"),
@@ -23,45 +51,175 @@ class TelegrafService:
             "agent_stopping": re.compile(r"I! \[agent\] Stopping running outputs"),
             "agent_stopped": re.compile(r"D! \[agent\] Stopped Successfully")
         }
+        self.reload_patterns = {
+            "reloading": re.compile(r"I! Reloading Telegraf config"),
+            # The agent config line is logged at info level, the output connection only with debug
+            "reloaded": re.compile(r"\[agent\] (Successfully connected to outputs\.mqtt|Config: Interval)"),
+            "failed": re.compile(r"E! .*(Error running agent|error loading config)", re.IGNORECASE)
+        }
 
-    def start_telegraf_service(self):
-        """Start a new Telegraf service for the given machine."""
-        
+    def start_telegraf_service(self, machine_configuration=None):
+        """Start or reload the Telegraf service for the given machine, rendering the given document or the one in CouchDB.
+
+        Returns "unchanged" when Telegraf already runs this exact configuration,
+        "reloaded" when the running process picked up the new file in place
+        (--watch-config, or SIGHUP as fallback) and "started" when supervisor
+        (re)spawned the process, as it does for an unchanged file that no
+        process runs. Raises RuntimeError when supervisor did not take it. In a worker pool a new machine goes to the least loaded
+        worker, after which at most one machine moves between workers.
+        """
+        if self.workers:
+            self.pack = self.process_name = choose_worker(self._get_worker_loads(), self.machine_name)
         machine_conf_path = self._get_machine_conf_path()
         logger.info(f"Starting Telegraf service: {machine_conf_path}")
 
         machine_config_service = MachineConfigurationService(
             str(self.telegraf_config_folder),
             self.machine_name,
-            self.couchdb_service
+            self.couchdb_service,
+            pack=self.pack
         )
-        machine_config_service.write_configuration_to_file()
-
+        if self.pack:
+            self._stop_unpacked_process()
         process_id = self._get_one_telegraf_process_id(machine_conf_path)
+        log_offset = self._get_log_size()
+        changed = machine_config_service.write_configuration_to_file(machine_configuration)
+
+        if process_id and not changed:
+            logger.info(f"Configuration unchanged, Telegraf keeps running with PID: {process_id}")
+            outcome = "unchanged"
+        else:
+            outcome = self._apply_changed_configuration(process_id, log_offset)
+        if self.workers:
+            self._rebalance_workers()
+        return outcome
+
+    def _apply_changed_configuration(self, process_id, log_offset):
+        """Have a running process reload its rewritten configuration, respawning it if that fails or none runs."""
+        machine_conf_path = self._get_machine_conf_path()
         if process_id:
+            if self._reload_telegraf_process(process_id, log_offset):
+                return "reloaded"
+            logger.warning(f"Telegraf PID {process_id} did not reload {machine_conf_path}, restarting it")
             self._terminate_existing_process(process_id)
+        self._start_process()
+        return "started"
+
+    def _start_process(self):
+        """Have supervisor (re)start the process through the entrypoint. Raises RuntimeError if it does not get a program."""
+        machine_conf_path = self._get_machine_conf_path()
         try:
-            process = subprocess.Popen(['/app/backend-entrypoint.sh'])
-            #process = subprocess.Popen(['telegraf', '--config', str(machine_conf_path), '--watch-config', str(machine_conf_path)])
-            logger.info(f"Started new Telegraf process with PID: {process.pid}")
-        except Exception as e:
-                logger.error(f"Failed to start Telegraf for {machine_conf_path}: {e}")
+            self._remove_supervisor_program()
+            subprocess.run(['/app/backend-entrypoint.sh'], check=True, capture_output=True, text=True)
+        except (OSError, subprocess.CalledProcessError) as e:
+            raise RuntimeError(f"Failed to start Telegraf for {machine_conf_path}: {e}") from e
+        if not (self.SUPERVISOR_CONF_FOLDER / f"{self.process_name}.conf").is_file():
+            raise RuntimeError(f"Failed to start Telegraf for {machine_conf_path}: supervisor has no program {self.process_name}")
+        logger.info(f"Supervisor starts Telegraf for {machine_conf_path}")
+
+    def _remove_supervisor_program(self):
+        """Drop the supervisor program of the process, so the entrypoint adds and starts it afresh.
+
+        dynamic_startup_telegraf.sh skips configs that already have a program, and
+        a Telegraf stopped with SIGTERM exits with 0, which autorestart=unexpected
+        does not restart.
+        """
+        supervisor_conf_path = self.SUPERVISOR_CONF_FOLDER / f"{self.process_name}.conf"
+        if not supervisor_conf_path.is_file():
+            return
+        supervisor_conf_path.unlink()
+        subprocess.run(['supervisorctl', 'reread'], check=True)
+        subprocess.run(['supervisorctl', 'update'], check=True)
 
     def stop_telegraf_service(self):
-        """Stop the Telegraf service for the given machine and remove the configuration file."""
+        """Stop the Telegraf service for the given machine and remove the configuration file.
+
+        A packed machine is taken out of the pack, which keeps running for the
+        others; the pack's process and configuration go with its last machine.
+        In a worker pool the removal may leave the pool unbalanced, so one
+        machine may move to the then lightest worker.
+        """
         machine_conf_path = self._get_machine_conf_path()
         logger.info(f"Stopping Telegraf service: {machine_conf_path}")
 
         process_id = self._get_one_telegraf_process_id(machine_conf_path)
+        if self.pack:
+            # A machine started before packing was enabled still runs on its own
+            self._stop_unpacked_process()
+            member_service = MachineConfigurationService(
+                str(self.telegraf_config_folder),
+                self.machine_name,
+                self.couchdb_service,
+                pack=self.pack
+            )
+            if self.machine_name not in member_service.get_pack_members():
+                return
+            log_offset = self._get_log_size()
+            remaining = member_service.remove_pack_member()
+            if remaining:
+                if process_id:
+                    self._apply_changed_configuration(process_id, log_offset)
+                if self.workers:
+                    self._rebalance_workers()
+                return
         if process_id:
             self._terminate_existing_process(process_id)
 
         machine_config_service = MachineConfigurationService(
             str(self.telegraf_config_folder),
-            self.machine_name,
+            self.process_name,
             self.couchdb_service
         )
         machine_config_service.remove_configuration_file()
+        if self.workers:
+            self._rebalance_workers()
+
+    def _get_worker_loads(self):
+        """{worker: {machine: tag reads per second}} for every worker of the pool, in pool order."""
+        return {
+            worker: MachineConfigurationService(str(self.telegraf_config_folder), self.machine_name, self.couchdb_service, pack=worker).get_pack_member_weights()
+            for worker in self.workers
+        }
+
+    def _rebalance_workers(self):
+        """Move at most one machine from the heaviest to the lightest worker, rewriting and reloading only those two.
+
+        Both workers reload at the same time, so the request waits for one reload
+        on top of its own, not two. A worker that fails to reload is logged; the
+        machine that was started or stopped is not affected.
+        Returns the move as (machine, source, target), or None when the pool is balanced.
+        """
+        move = plan_rebalance(self._get_worker_loads())
+        if move is None:
+            return None
+        machine_name, source, target = move
+        workers = [TelegrafService(str(self.telegraf_config_folder), machine_name, self.couchdb_service, pack=worker) for worker in (target, source)]
+        running = [(worker, worker._get_one_telegraf_process_id(worker._get_machine_conf_path()), worker._get_log_size()) for worker in workers]
+        MachineConfigurationService(str(self.telegraf_config_folder), machine_name, self.couchdb_service, pack=source).move_pack_member(target)
+
+        def apply(worker, process_id, log_offset):
+            try:
+                worker._apply_changed_configuration(process_id, log_offset)
+            except Exception as e:
+                logger.error(f"Telegraf worker {worker.pack} did not take over its machines after moving {machine_name}: {e}")
+
+        threads = [threading.Thread(target=apply, args=entry) for entry in running]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return move
+
+    def _stop_unpacked_process(self):
+        """Stop a Telegraf process the machine still has of its own, and remove its configuration and supervisor program."""
+        own_conf_path = self.telegraf_config_folder / f"{self.machine_name}.conf"
+        if not own_conf_path.is_file():
+            return
+        logger.info(f"Stopping the Telegraf process {self.machine_name} runs outside of pack {self.pack}")
+        process_id = self._get_one_telegraf_process_id(own_conf_path)
+        if process_id:
+            self._terminate_existing_process(process_id)
+        MachineConfigurationService(str(self.telegraf_config_folder), self.machine_name, self.couchdb_service).remove_configuration_file()
 
     def get_active_telegraf_services(self):
         """
@@ -81,11 +239,21 @@ class TelegrafService:
                 if '--config' in (parts := line.split())
             ]
 
-            return processes
+            return [machine for process in processes for machine in self._expand_pack(process)]
         except Exception as e:
             logger.error(f"Error fetching active Telegraf services: {e}")
             return []
 
+    def _expand_pack(self, process):
+        """A pack's process stands for every machine in the pack, each listed with the pack name."""
+        pack_folder = self.telegraf_config_folder / f"{process['machine_name']}.d"
+        if not pack_folder.is_dir():
+            return [process]
+        return [
+            {"machine_name": file[:-5], "process": process["process"], "pack": process["machine_name"]}
+            for file in sorted(os.listdir(pack_folder)) if file.endswith('.conf')
+        ]
+
     def initiate_telegraf_services(self):
         """Start Telegraf for all existing configurations on app start."""
         config_files = self.get_configured_machines()
@@ -106,6 +274,15 @@ class TelegrafService:
         
 
     def get_current_telegraf_state(self):
+        """Connection state of the machine, from the stats file of the rendered inputs.internal pipeline.
+
+        Configurations rendered before the stats file existed fall back to the
+        debug lines of the machine log.
+        """
+        stats_file_path = self.telegraf_config_folder / f"{self.machine_name}.stats"
+        if stats_file_path.is_file():
+            return self._get_state_from_stats(stats_file_path)
+
         log_file_path = self.telegraf_config_folder / f"{self.machine_name}.log"
 
         if not log_file_path.is_file():
@@ -136,6 +313,71 @@ class TelegrafService:
             logger.error(f"Failed to get current machine state {self.machine_name}: {e}")
             return {"active_connection": False, "last_update": None, "last_disconnect": None}
 
+    def _get_state_from_stats(self, stats_file_path):
+        """Derive the connection state from the internal_gather samples of the s7comm inputs.
+
+        The counters are cumulative per Telegraf process: a sample whose
+        metrics_gathered grew since the previous one had successful reads, one
+        whose errors grew had failed ones. A lone sample is compared with zero.
+        """
+        try:
+            with open(stats_file_path) as file:
+                lines = self._get_last_log_lines(file, self.STATS_LINES)
+
+            samples = {}
+            for line in lines:
+                try:
+                    metric = json.loads(line)
+                except ValueError:
+                    # Telegraf may be writing this line right now
+                    continue
+                if metric.get("name") != "internal_gather" or metric.get("tags", {}).get("input") != "s7comm":
+                    continue
+                # Several s7comm inputs (rate classes) may report at the same timestamp
+                gathered, errors = samples.get(metric["timestamp"], (0, 0))
+                fields = metric.get("fields", {})
+                samples[metric["timestamp"]] = (gathered + fields.get("metrics_gathered", 0), errors + fields.get("errors", 0))
+
+            timestamps = sorted(samples)
+            if not timestamps:
+                return {"active_connection": False, "last_update": None, "last_disconnect": None}
+
+            last_connect = last_disconnect = None
+            first = 1 if len(timestamps) > 1 else 0
+            previous = samples[timestamps[0]] if first else (0, 0)
+            for timestamp in timestamps[first:]:
+                gathered, errors = samples[timestamp]
+                # A counter that went down belongs to a restarted process
+                if gathered > previous[0] or (gathered < previous[0] and gathered > 0):
+                    last_connect = timestamp
+                if errors > previous[1] or (errors < previous[1] and errors > 0):
+                    last_disconnect = timestamp
+                previous = (gathered, errors)
+
+            active = last_connect is not None and (last_disconnect is None or last_connect >= last_disconnect)
+            newest = timestamps[-1]
+            period = newest - timestamps[-2] if len(timestamps) > 1 else 0
+            if time.time() * 1000 - newest > max(self.STATS_STALE_AFTER * 1000, 3 * period):
+                # Telegraf stopped writing samples
+                active = False
+                last_disconnect = newest
+
+            return {
+                "active_connection": active,
+                "last_update": self._format_stats_timestamp(last_connect if active else last_disconnect),
+                "last_disconnect": self._format_stats_timestamp(last_disconnect)
+            }
+
+        except Exception as e:
+            logger.error(f"Failed to get current machine state {self.machine_name}: {e}")
+            return {"active_connection": False, "last_update": None, "last_disconnect": None}
+
+    def _format_stats_timestamp(self, timestamp):
+        """Format a millisecond stats timestamp like the local-time timestamps of the machine log."""
+        if timestamp is None:
+            return None
+        return datetime.fromtimestamp(timestamp / 1000).strftime("%Y-%m-%dT%H:%M:%S")
+
     def _update_state_from_log(self, line, timestamp, state):
         """Update connection state based on log line content."""
         for key, pattern in self.patterns.items():
@@ -154,7 +396,16 @@ class TelegrafService:
     def get_configured_machines(self):
         """Retrieve all configuration files from machines, which are configured."""
         try:
-            config_files = [file for file in os.listdir(self.telegraf_config_folder) if file.endswith('.conf')]
+            config_files = []
+            for file in os.listdir(self.telegraf_config_folder):
+                if not file.endswith('.conf'):
+                    continue
+                # A pack's configuration stands for the member files of its machines
+                pack_folder = self.telegraf_config_folder / f"{file[:-5]}.d"
+                if pack_folder.is_dir():
+                    config_files.extend(member for member in os.listdir(pack_folder) if member.endswith('.conf'))
+                else:
+                    config_files.append(file)
             if not config_files:
                 logger.warning('No configuration files found.')
             return config_files
@@ -196,9 +447,83 @@ class TelegrafService:
             logger.error("Error parsing process ID")
         return None
        
+    def _reload_telegraf_process(self, process_id, log_offset):
+        """Wait for the running process to reload its rewritten config, sending SIGHUP if --watch-config did not trigger.
+
+        A quiet agent logs errors only, so it gets SIGHUP straight away. A process
+        that is still alive and logged no error after SIGHUP counts as reloaded.
+        """
+        quiet = self._is_quiet()
+        outcome = None if quiet else self._await_reload(log_offset)
+        if outcome is None:
+            logger.info(f"No config reload logged by Telegraf PID {process_id}, sending SIGHUP")
+            log_offset = self._get_log_size()
+            try:
+                os.kill(process_id, signal.SIGHUP)
+            except ProcessLookupError:
+                logger.warning(f"Process with PID {process_id} no longer exists.")
+                return False
+            outcome = self._await_reload(log_offset)
+            if outcome is None and self._is_running(process_id):
+                if not quiet:
+                    logger.warning(f"Telegraf PID {process_id} logged no config reload after SIGHUP but is still running")
+                outcome = True
+        if outcome:
+            logger.info(f"Telegraf PID {process_id} reloaded its configuration in place")
+        return bool(outcome)
+
+    def _await_reload(self, log_offset):
+        """Follow the machine log from log_offset. True once a reload completed, False if it failed, None if none was logged in time."""
+        log_file_path = self.telegraf_config_folder / f"{self.process_name}.log"
+        deadline = time.monotonic() + self.RELOAD_TIMEOUT
+        reloading = False
+        while True:
+            try:
+                with open(log_file_path) as file:
+                    # A rotated log is shorter than the offset, read it from the start
+                    file.seek(log_offset if log_offset <= os.path.getsize(log_file_path) else 0)
+                    for line in file:
+                        if self.reload_patterns["failed"].search(line):
+                            logger.error(f"Telegraf config reload failed: {line.strip()}")
+                            return False
+                        if self.reload_patterns["reloading"].search(line):
+                            reloading = True
+                        elif reloading and self.reload_patterns["reloaded"].search(line):
+                            return True
+            except OSError:
+                pass
+            if time.monotonic() >= deadline:
+                if reloading:
+                    # Inputs restarted in place; the MQTT output may just not be reachable right now,
+                    # which a respawn would not fix either
+                    logger.warning(f"Telegraf reloaded {self.machine_name} but has not reconnected its outputs yet")
+                    return True
+                return None
+            time.sleep(self.RELOAD_POLL_INTERVAL)
+
+    def _is_quiet(self):
+        """Whether the rendered agent only logs errors, leaving no trace of a successful reload."""
+        try:
+            return bool(self.QUIET_PATTERN.search(self._get_machine_conf_path().read_text()))
+        except OSError:
+            return False
+
+    def _is_running(self, process_id):
+        try:
+            os.kill(process_id, 0)
+        except ProcessLookupError:
+            return False
+        return True
+
+    def _get_log_size(self):
+        try:
+            return os.path.getsize(self.telegraf_config_folder / f"{self.process_name}.log")
+        except OSError:
+            return 0
+
     def _get_machine_conf_path(self):
-        """Return the configuration file path for the machine."""
-        return self.telegraf_config_folder / f"{self.machine_name}.conf"
+        """Return the configuration file path for the machine, or for its pack."""
+        return self.telegraf_config_folder / f"{self.process_name}.conf"
 
     def _terminate_existing_process(self, process_id):
         """Terminate an existing Telegraf process."""
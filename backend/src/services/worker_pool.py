@@ -0,0 +1,62 @@
+from ..plc_datalink_rfc1006_model import RATE_CLASS_INTERVALS, group_by_rate_class, parse_duration
+
+# Telegraf workers are packs named <prefix><index>
+WORKER_PREFIX = 'telegraf-worker-'
+# A machine is only moved between workers when the heaviest one carries this
+# much more than the lightest, relative to the heaviest. Every move reloads two workers.
+REBALANCE_TOLERANCE = 0.25
+
+
+def worker_names(count):
+    """Pack names of a pool of count workers."""
+    return [f'{WORKER_PREFIX}{index}' for index in range(count)]
+
+
+def tag_reads_per_second(configuration):
+    """Weight of a machine in the pool: tags read per second over all its rate classes."""
+    request_interval = configuration['machineData']['requestInterval']
+    reads = 0.0
+    for rate_class, tags in group_by_rate_class(configuration['plcTagData']):
+        interval = RATE_CLASS_INTERVALS[rate_class]
+        reads += len(tags) / (request_interval if interval is None else parse_duration(interval))
+    return reads
+
+
+def find_worker(loads, machine_name):
+    """Worker the machine is assigned to, or None."""
+    return next((worker for worker, machines in loads.items() if machine_name in machines), None)
+
+
+def choose_worker(loads, machine_name):
+    """Worker for a machine: the one it already runs on, otherwise the least loaded.
+
+    loads maps every worker, in pool order, to {machine: weight}. Ties go to the
+    worker with fewer machines, then to the first in the pool.
+    """
+    current = find_worker(loads, machine_name)
+    if current is not None:
+        return current
+    order = {worker: index for index, worker in enumerate(loads)}
+    return min(loads, key=lambda worker: (sum(loads[worker].values()), len(loads[worker]), order[worker]))
+
+
+def plan_rebalance(loads):
+    """At most one move, (machine, source, target), that lowers the load of the heaviest worker; None if none is worth it.
+
+    The machine moves from the heaviest to the lightest worker. It must weigh
+    less than the gap between them, so the heaviest worker of the two gets
+    lighter, and is picked as close to half the gap as possible.
+    """
+    if len(loads) < 2:
+        return None
+    totals = {worker: sum(machines.values()) for worker, machines in loads.items()}
+    source = max(totals, key=totals.get)
+    target = min(totals, key=totals.get)
+    gap = totals[source] - totals[target]
+    if gap <= REBALANCE_TOLERANCE * totals[source]:
+        return None
+    candidates = [(machine, weight) for machine, weight in loads[source].items() if 0 < weight < gap]
+    if not candidates:
+        return None
+    machine, _ = min(candidates, key=lambda candidate: (abs(gap / 2 - candidate[1]), candidate[0]))
+    return machine, source, target
@@ -0,0 +1,90 @@
+"""Benchmark: importing a plant one document at a time vs. through _bulk_docs.
+
+Creates N machine configurations (default 1000) against the in-process
+CouchDB stand-in, once with one `CouchDBService.create_doc` PUT per machine
+(what N calls of `POST /config/create` cost) and once with
+`CouchDBService.bulk_docs` in batches, then reads them back with `bulk_get`.
+
+Run from backend/:
+
+    PYTHONPATH=. python test/scripts/benchmark/bench_bulk_import.py [--machines 1000] [--batch-size 200]
+"""
+
+from __future__ import annotations
+
+import argparse
+import copy
+import time
+
+from couchdb_standin import CouchDBStandIn
+
+from src.plc_datalink_rfc1006_model import PlcDatalinkRFC1006Model
+from src.services.couchdb_service import CouchDBService
+
+DATABASE_NAME = 'datalink'
+AUTH = ('admin', 'admin')
+
+TEMPLATE = {
+    'machineData': {
+        'machineName': None,
+        'pduSize': 480,
+        'plcIp': '10.0.0.1',
+        'plcPort': 102,
+        'plcRack': 0,
+        'plcSlot': 1,
+        'requestInterval': 1,
+    },
+    'mqttData': {'mqttIp': '10.0.0.2', 'mqttPort': 1883, 'mqttTopic': 'on/ot/bench'},
+    'plcTagData': [{'tagAddress': f'DB1.DI{4 * i}', 'tagName': f'Tag{i}'} for i in range(50)],
+}
+
+
+def _configurations(count: int) -> list[dict]:
+    configurations = []
+    for i in range(count):
+        configuration = copy.deepcopy(TEMPLATE)
+        configuration['machineData']['machineName'] = f'machine-{i:05d}'
+        configurations.append(PlcDatalinkRFC1006Model.from_dict(configuration).to_json_dict())
+    return configurations
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--machines', type=int, default=1000)
+    parser.add_argument('--batch-size', type=int, default=200)
+    args = parser.parse_args()
+
+    configurations = _configurations(args.machines)
+
+    with CouchDBStandIn() as couchdb:
+        service = CouchDBService(couchdb.base_url, *AUTH, DATABASE_NAME)
+        start = time.perf_counter()
+        for configuration in copy.deepcopy(configurations):
+            service.create_doc(configuration)
+        sequential = time.perf_counter() - start
+        service.close()
+
+    with CouchDBStandIn() as couchdb:
+        service = CouchDBService(couchdb.base_url, *AUTH, DATABASE_NAME)
+        documents = copy.deepcopy(configurations)
+        for document in documents:
+            document['_id'] = document['machineData']['machineName']
+        start = time.perf_counter()
+        results = service.bulk_docs(documents, args.batch_size)
+        bulk = time.perf_counter() - start
+        assert all(result.get('ok') for result in results)
+
+        start = time.perf_counter()
+        exported = service.bulk_get([d['_id'] for d in documents], args.batch_size)
+        export = time.perf_counter() - start
+        assert len(exported) == args.machines
+        service.close()
+
+    print(f'{args.machines} machines, {len(TEMPLATE["plcTagData"])} tags each')
+    print(f'sequential create_doc   {sequential:7.3f} s  ({args.machines} requests)')
+    print(f'_bulk_docs              {bulk:7.3f} s  ({-(-args.machines // args.batch_size)} requests)')
+    print(f'_bulk_get export        {export:7.3f} s')
+
+
+if __name__ == '__main__':
+    main()
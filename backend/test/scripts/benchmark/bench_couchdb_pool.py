@@ -0,0 +1,72 @@
+"""Micro-benchmark: CouchDB request latency with and without connection pooling.
+
+Compares the pre-pooling behaviour (one `requests.request` per call, i.e. a
+fresh TCP connection each time) with `CouchDBService`, which reuses
+keep-alive connections from its session pool. Both talk to the in-process
+stand-in from couchdb_standin.py, so the numbers isolate client overhead.
+
+Run from backend/:
+
+    PYTHONPATH=. python test/scripts/benchmark/bench_couchdb_pool.py [--requests 500]
+"""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import time
+
+import requests
+from couchdb_standin import CouchDBStandIn
+
+from src.services.couchdb_service import CouchDBService
+
+DATABASE_NAME = 'datalink'
+AUTH = ('admin', 'admin')
+
+
+def _time_calls(call, n: int) -> list[float]:
+    samples = []
+    for _ in range(n):
+        start = time.perf_counter()
+        call()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def _report(label: str, samples: list[float]) -> None:
+    samples = sorted(samples)
+    p95 = samples[int(len(samples) * 0.95) - 1]
+    print(
+        f'{label:<22} mean {statistics.mean(samples):6.3f} ms  '
+        f'p50 {statistics.median(samples):6.3f} ms  p95 {p95:6.3f} ms'
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=500, help='GET requests per variant')
+    args = parser.parse_args()
+
+    doc = {'_id': 'bench', '_rev': '1-a', 'machineData': {'machineName': 'bench'}}
+    with CouchDBStandIn({'bench': doc}) as couchdb:
+        url = f'{couchdb.base_url}/{DATABASE_NAME}/bench'
+
+        def unpooled():
+            response = requests.request('GET', url, auth=AUTH)
+            response.raise_for_status()
+            return response.json()
+
+        service = CouchDBService(couchdb.base_url, *AUTH, DATABASE_NAME)
+        try:
+            # Warm-up so interpreter and pool start-up do not skew either variant
+            unpooled()
+            service.get_doc('bench')
+            _report('unpooled (baseline)', _time_calls(unpooled, args.requests))
+            _report('pooled session', _time_calls(lambda: service.get_doc('bench'), args.requests))
+        finally:
+            service.close()
+
+
+if __name__ == '__main__':
+    main()
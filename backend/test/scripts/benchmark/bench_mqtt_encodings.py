@@ -0,0 +1,182 @@
+"""Benchmark: MQTT payload size and encode/decode cost of each mqttDataFormat.
+
+Builds the metrics one poll cycle of the ZKS reference machine publishes, one
+per tag (`mqttMessageMode` metric) and one with all 128 fields (`cycle`), and
+serializes them the way Telegraf's serializers write them: `json` as the JSON
+serializer with millisecond timestamps, `msgpack` as the MessagePack
+serializer with a timestamp extension and `influx` as line protocol with a
+nanosecond timestamp. Each line reports the mean bytes per message and the
+mean encode and decode time per message over `--rounds` runs; decoding is what
+a Python consumer pays (`json.loads`, `msgpack.unpackb` and a small
+line-protocol parser). `msgpack` is only measured when the msgpack package is
+installed.
+
+Run from backend/:
+
+    PYTHONPATH=. python test/scripts/benchmark/bench_mqtt_encodings.py [--rounds 200]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import re
+import sys
+import time
+from pathlib import Path
+from typing import Callable
+
+from src.plc_datalink_rfc1006_model import MQTT_DATA_FORMATS
+from src.s7_tag_address import parse_tag_address
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+REPO_ROOT = Path(__file__).resolve().parents[4]
+sys.path.insert(0, str(REPO_ROOT / 'database' / 'test' / 'python'))
+
+from zks_layout import build_machine_doc, load_layout  # noqa: E402
+
+LAYOUT_PATH = REPO_ROOT / 'docs' / 'machines-db-layout' / 'zks-machine-mock' / 'db-layout.yaml'
+HOSTNAME = 'PLC Datalink RFC1006'
+TIMESTAMP_NS = 1700000000123000000
+# Line protocol: series (measurement and tags) up to the first unescaped space, then fields and timestamp
+LINE_PATTERN = re.compile(r'((?:[^ \\]|\\.)+) (.*) (\d+)$')
+LINE_FIELD = re.compile(r'((?:[^,=\\]|\\.)+)=("(?:[^"\\]|\\.)*"|[^,]+)')
+
+
+def _value(tag_type: str, rng: random.Random):
+    if tag_type == 'X':
+        return rng.random() < 0.5
+    if tag_type == 'R':
+        return rng.uniform(-1000, 1000)
+    if tag_type in ('S', 'C', 'DT'):
+        return f'{rng.getrandbits(32):08x}'
+    return rng.randrange(-32768, 32768)
+
+
+def _metrics(machine: dict) -> dict[str, list[dict]]:
+    machine_name = machine['machineData']['machineName']
+    rng = random.Random(1)
+    fields = {
+        f'{machine_name}.{tag["tagName"]}': _value(parse_tag_address(tag['tagAddress']).type, rng)
+        for tag in machine['plcTagData']
+    }
+    return {
+        'metric': [
+            {'name': 's7comm', 'tags': {'host': HOSTNAME, 'machine': name}, 'fields': {name: value}}
+            for name, value in fields.items()
+        ],
+        'cycle': [{'name': 's7comm', 'tags': {'host': HOSTNAME, 'machine': machine_name}, 'fields': fields}],
+    }
+
+
+def _escape(text: str, characters: str) -> str:
+    for character in '\\' + characters:
+        text = text.replace(character, '\\' + character)
+    return text
+
+
+def _influx_value(value) -> str:
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, int):
+        return f'{value}i'
+    if isinstance(value, float):
+        return repr(value)
+    return '"' + _escape(value, '"') + '"'
+
+
+def encode_json(metric: dict) -> bytes:
+    payload = {**metric, 'timestamp': TIMESTAMP_NS // 1000000}
+    return json.dumps(payload, separators=(',', ':'), sort_keys=True).encode()
+
+
+def encode_msgpack(metric: dict) -> bytes:
+    return msgpack.packb({**metric, 'time': msgpack.Timestamp.from_unix_nano(TIMESTAMP_NS)})
+
+
+def encode_influx(metric: dict) -> bytes:
+    tags = ''.join(f',{_escape(key, ", =")}={_escape(value, ", =")}' for key, value in sorted(metric['tags'].items()))
+    fields = ','.join(f'{_escape(key, ", =")}={_influx_value(value)}' for key, value in metric['fields'].items())
+    return f'{_escape(metric["name"], ", ")}{tags} {fields} {TIMESTAMP_NS}\n'.encode()
+
+
+def _unescape(text: str) -> str:
+    return re.sub(r'\\(.)', r'\1', text)
+
+
+def _parse_influx_value(text: str):
+    if text.startswith('"'):
+        return _unescape(text[1:-1])
+    if text in ('true', 'false'):
+        return text == 'true'
+    if text.endswith('i'):
+        return int(text[:-1])
+    return float(text)
+
+
+def decode_influx(payload: bytes) -> dict:
+    series, fields, timestamp = LINE_PATTERN.match(payload.decode().rstrip('\n')).groups()
+    name, *tags = re.split(r'(?<!\\),', series)
+    return {
+        'name': _unescape(name),
+        'tags': dict(_unescape(tag).split('=', 1) for tag in tags),
+        'fields': {_unescape(key): _parse_influx_value(value) for key, value in LINE_FIELD.findall(fields)},
+        'time': int(timestamp),
+    }
+
+
+def _formats() -> dict[str, tuple[Callable[[dict], bytes], Callable[[bytes], object]]]:
+    formats = {
+        'json': (encode_json, json.loads),
+        'msgpack': (encode_msgpack, msgpack.unpackb) if msgpack else None,
+        'influx': (encode_influx, decode_influx),
+    }
+    return {data_format: formats[data_format] for data_format in MQTT_DATA_FORMATS if formats[data_format]}
+
+
+def _mean_us(run: Callable[[], object], rounds: int, messages: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        run()
+    return (time.perf_counter() - start) / rounds / messages * 1e6
+
+
+def _measure_format(
+    encode: Callable[[dict], bytes], decode: Callable[[bytes], object], metrics: list[dict], rounds: int
+) -> tuple[float, float, float]:
+    payloads = [encode(metric) for metric in metrics]
+    assert all(decode(payload)['fields'] == metric['fields'] for payload, metric in zip(payloads, metrics))
+    size = sum(len(payload) for payload in payloads) / len(payloads)
+    encode_us = _mean_us(lambda: [encode(metric) for metric in metrics], rounds, len(metrics))
+    decode_us = _mean_us(lambda: [decode(payload) for payload in payloads], rounds, len(payloads))
+    return size, encode_us, decode_us
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rounds', type=int, default=200)
+    args = parser.parse_args()
+
+    machine = build_machine_doc(load_layout(LAYOUT_PATH))
+    formats = _formats()
+    print(f'{machine["machineData"]["machineName"]}: {len(machine["plcTagData"])} tags, {args.rounds} rounds')
+    if msgpack is None:
+        print('msgpack is not installed, skipped (pip install msgpack)')
+    print(f'{"mode":<7} {"format":<8} {"bytes/msg":>10} {"vs json":>8} {"encode":>11} {"decode":>11}')
+    for mode, metrics in _metrics(machine).items():
+        json_bytes = None
+        for data_format, (encode, decode) in formats.items():
+            size, encode_us, decode_us = _measure_format(encode, decode, metrics, args.rounds)
+            json_bytes = json_bytes or size
+            print(
+                f'{mode:<7} {data_format:<8} {size:>8.0f} B {size / json_bytes:>8.1%} {encode_us:>8.1f} us {decode_us:>8.1f} us'
+            )
+
+
+if __name__ == '__main__':
+    main()
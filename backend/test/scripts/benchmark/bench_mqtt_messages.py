@@ -0,0 +1,131 @@
+"""Benchmark: MQTT messages and bytes per poll cycle for each mqttMessageMode.
+
+Replays `--cycles` poll cycles of the ZKS reference machine (or of a synthetic
+machine with `--tags` tags over five DBs) in which every tag changes with
+probability `--change`; the first cycle publishes everything, like the dedup
+processor after a start. Each changed tag is serialized the way Telegraf's
+JSON serializer writes a metric: one message per tag (`metric`, today's
+output), one per cycle with all changed fields (`cycle`) or one per cycle and
+DB (`db`). Wire bytes add the MQTT PUBLISH header, the topic and, for QoS 1
+and 2, the packet id and acknowledgements.
+
+Run from backend/:
+
+    PYTHONPATH=. python test/scripts/benchmark/bench_mqtt_messages.py [--tags 500] [--change 0.1] [--qos 2]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import sys
+from pathlib import Path
+
+from src.plc_datalink_rfc1006_model import MQTT_MESSAGE_MODES
+from src.s7_tag_address import parse_tag_address
+
+REPO_ROOT = Path(__file__).resolve().parents[4]
+sys.path.insert(0, str(REPO_ROOT / 'database' / 'test' / 'python'))
+
+from zks_layout import build_machine_doc, load_layout  # noqa: E402
+
+LAYOUT_PATH = REPO_ROOT / 'docs' / 'machines-db-layout' / 'zks-machine-mock' / 'db-layout.yaml'
+HOSTNAME = 'PLC Datalink RFC1006'
+# Bytes of the acknowledgements of one PUBLISH: none, PUBACK, PUBREC + PUBREL + PUBCOMP
+ACK_BYTES = {0: 0, 1: 4, 2: 12}
+
+
+def _machine(tags: int | None) -> dict:
+    if tags is None:
+        return build_machine_doc(load_layout(LAYOUT_PATH))
+    return {
+        'machineData': {'machineName': 'bench'},
+        'mqttData': {'mqttTopic': 'on/ot/bench'},
+        'plcTagData': [{'tagAddress': f'DB{1 + i % 5}.R{4 * (i // 5)}', 'tagName': f'Tag{i}'} for i in range(tags)],
+    }
+
+
+def _value(tag_type: str, rng: random.Random):
+    if tag_type == 'X':
+        return rng.random() < 0.5
+    if tag_type == 'R':
+        return rng.uniform(-1000, 1000)
+    if tag_type in ('S', 'C', 'DT'):
+        return f'{rng.getrandbits(32):08x}'
+    return rng.randrange(-32768, 32768)
+
+
+def _payload(fields: dict, machine: str, timestamp: int) -> bytes:
+    metric = {
+        'fields': fields,
+        'name': 's7comm',
+        'tags': {'host': HOSTNAME, 'machine': machine},
+        'timestamp': timestamp,
+    }
+    return json.dumps(metric, separators=(',', ':'), sort_keys=True).encode()
+
+
+def _wire_bytes(payload: int, topic: int, qos: int) -> int:
+    remaining = 2 + topic + (2 if qos else 0) + payload
+    length_bytes = 1 + (remaining >= 128) + (remaining >= 16384) + (remaining >= 2097152)
+    return 1 + length_bytes + remaining + ACK_BYTES[qos]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        '--tags', type=int, default=None, help='synthetic machine with this many REAL tags instead of ZKS'
+    )
+    parser.add_argument('--cycles', type=int, default=100)
+    parser.add_argument('--change', type=float, default=0.1, help='probability that a tag changes per cycle')
+    parser.add_argument(
+        '--qos', type=int, choices=sorted(ACK_BYTES), default=2, help='QoS of the Telegraf MQTT output (default 2)'
+    )
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    machine = _machine(args.tags)
+    machine_name = machine['machineData']['machineName']
+    topic = len(machine['mqttData']['mqttTopic'].encode())
+    tags = [(f'{machine_name}.{tag["tagName"]}', parse_tag_address(tag['tagAddress'])) for tag in machine['plcTagData']]
+    rng = random.Random(args.seed)
+
+    totals = {mode: [0, 0, 0] for mode in MQTT_MESSAGE_MODES}
+    for cycle in range(args.cycles):
+        timestamp = 1700000000000 + cycle * 1000
+        changed = [
+            (name, address, _value(address.type, rng))
+            for name, address in tags
+            if cycle == 0 or rng.random() < args.change
+        ]
+        messages = {
+            'metric': [_payload({name: value}, name, timestamp) for name, _, value in changed],
+            'cycle': [_payload({name: value for name, _, value in changed}, machine_name, timestamp)]
+            if changed
+            else [],
+            'db': [
+                _payload(
+                    {name: value for name, address, value in changed if address.db == db},
+                    f'{machine_name}.DB{db}',
+                    timestamp,
+                )
+                for db in sorted({address.db for _, address, _ in changed})
+            ],
+        }
+        for mode, payloads in messages.items():
+            totals[mode][0] += len(payloads)
+            totals[mode][1] += sum(len(payload) for payload in payloads)
+            totals[mode][2] += sum(_wire_bytes(len(payload), topic, args.qos) for payload in payloads)
+
+    print(f'{machine_name}: {len(tags)} tags, {args.cycles} cycles, change {args.change:.0%}, QoS {args.qos}')
+    print(f'{"mode":<7} {"msgs/cycle":>11} {"payload/cycle":>14} {"wire/cycle":>11} {"wire vs metric":>15}')
+    for mode, (messages, payload, wire) in totals.items():
+        print(
+            f'{mode:<7} {messages / args.cycles:>11.1f} {payload / args.cycles:>12.0f} B '
+            f'{wire / args.cycles:>9.0f} B {wire / totals["metric"][2]:>14.1%}'
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""Benchmark: peak memory of GET /config/read/all, buffered JSON vs. stream=true.
+
+Serves N machine documents (default 1,000 / 2,500 / 5,000, 50 tags each)
+from the CouchDB stand-in running in a child process, calls the real Flask
+route through the test client and consumes the response chunk by chunk.
+`tracemalloc` reports the peak Python allocation of the backend side only.
+The buffered mode grows linearly with fleet size; the streamed mode should
+stay flat at roughly one chunk.
+
+Run from backend/:
+
+    PYTHONPATH=. python test/scripts/benchmark/bench_read_all_memory.py [--machines 1000 2500 5000]
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+import tracemalloc
+
+from couchdb_standin import CouchDBStandIn
+from flask import Flask
+
+from src.routes import configure_routes
+
+TAGS_PER_MACHINE = 50
+
+
+def _docs(count: int) -> dict:
+    # Machines sort on both sides of the design document, so both key ranges are read
+    docs = {'_design/machines': {'_id': '_design/machines', '_rev': '1-a', 'views': {}}}
+    for i in range(count):
+        name = f'{"Mm"[i % 2]}achine-{i:05d}'
+        docs[name] = {
+            '_id': name,
+            '_rev': '1-a',
+            'machineData': {'machineName': name, 'plcIp': '10.0.0.1', 'plcPort': 102, 'pduSize': 480},
+            'mqttData': {'mqttIp': '10.0.0.2', 'mqttPort': 1883, 'mqttTopic': f'on/ot/{name}'},
+            'plcTagData': [{'tagAddress': f'DB1.DI{4 * t}', 'tagName': f'Tag{t}'} for t in range(TAGS_PER_MACHINE)],
+        }
+    return docs
+
+
+def _measure(client, url: str) -> tuple[float, float, int]:
+    tracemalloc.start()
+    start = time.perf_counter()
+    response = client.get(url, buffered=False)
+    size = 0
+    for chunk in response.response:
+        size += len(chunk)
+    response.close()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 2**20, size
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--machines', type=int, nargs='+', default=[1000, 2500, 5000])
+    args = parser.parse_args()
+
+    print(
+        f'{"machines":>8}  {"body MB":>8}  {"buffered peak MB":>16}  {"streamed peak MB":>16}  {"buffered s":>10}  {"streamed s":>10}'
+    )
+    for count in args.machines:
+        with CouchDBStandIn(_docs(count), in_subprocess=True) as couchdb:
+            app = Flask(__name__)
+            app.config.update(
+                DATABASE_USER='admin',
+                SECRET_KEY='admin',
+                DATABASE_URL=couchdb.base_url,
+                DATABASE_NAME='datalink',
+                TELEGRAF_CONFIG_FOLDER='/tmp',
+            )
+            configure_routes(app)
+            client = app.test_client()
+            buffered_s, buffered_peak, size = _measure(client, '/config/read/all')
+            streamed_s, streamed_peak, _ = _measure(client, '/config/read/all?stream=true')
+        print(
+            f'{count:>8}  {size / 2**20:>8.1f}  {buffered_peak:>16.1f}  {streamed_peak:>16.1f}  '
+            f'{buffered_s:>10.3f}  {streamed_s:>10.3f}'
+        )
+
+
+if __name__ == '__main__':
+    main()
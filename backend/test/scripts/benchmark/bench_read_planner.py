@@ -0,0 +1,65 @@
+"""Benchmark: read ranges, read items and S7 PDUs per poll cycle for the ZKS layout, per tag vs. planned ranges.
+
+Builds the ZKS reference machine from
+docs/machines-db-layout/zks-machine-mock/db-layout.yaml (through the same
+translation the database tests use), then runs `plan_reads` at a few merge gaps
+and negotiated PDU lengths. Every planned range is rendered as one
+`[[inputs.s7comm.metric]]` block. The s7comm input still reads every field as
+its own item and batches items by count, so items stay at one per tag; the
+PDUs are those items packed into read requests of at most `--batch-size`
+items, in document order without a plan ("pdus per tag") and in rendered order
+with one. The two PDU columns come out equal: ranges do not save reads.
+
+Run from backend/:
+
+    PYTHONPATH=. python test/scripts/benchmark/bench_read_planner.py [--batch-size 20] [--gaps 0,2,8]
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+from src.s7_tag_address import parse_tag_address
+from src.services.s7_read_planner import MAX_ITEMS_PER_PDU, count_pdus, plan_reads
+
+REPO_ROOT = Path(__file__).resolve().parents[4]
+sys.path.insert(0, str(REPO_ROOT / 'database' / 'test' / 'python'))
+
+from zks_layout import build_machine_doc, load_layout  # noqa: E402
+
+LAYOUT_PATH = REPO_ROOT / 'docs' / 'machines-db-layout' / 'zks-machine-mock' / 'db-layout.yaml'
+PDU_LENGTHS = (240, 480, 960)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--batch-size', type=int, default=20, help='items per read request (machineData.pduSize)')
+    parser.add_argument('--gaps', default='0,2,8', help='comma-separated readGap values in bytes')
+    parser.add_argument('--rounds', type=int, default=1000, help='planner runs to time')
+    args = parser.parse_args()
+
+    tags = build_machine_doc(load_layout(LAYOUT_PATH))['plcTagData']
+    print(f'ZKS layout: {len(tags)} tags, batch size {args.batch_size}')
+    print(
+        f'{"pdu":>5} {"gap":>4} {"ranges":>8} {"bytes":>6} {"items":>6} {"pdus":>5} {"pdus per tag":>13} {"plan":>10}'
+    )
+    for pdu_length in PDU_LENGTHS:
+        max_items = max(1, min(args.batch_size, MAX_ITEMS_PER_PDU))
+        pdus_per_tag = count_pdus([parse_tag_address(tag['tagAddress']).size for tag in tags], max_items, pdu_length)
+        for gap in (int(gap) for gap in args.gaps.split(',')):
+            start = time.perf_counter()
+            for _ in range(args.rounds):
+                plan = plan_reads(tags, args.batch_size, gap, pdu_length)
+            elapsed_us = (time.perf_counter() - start) / args.rounds * 1e6
+            report = plan.report()
+            print(
+                f'{pdu_length:>5} {gap:>4} {report["ranges"]:>8} {report["bytes"]:>6} '
+                f'{report["items"]:>6} {report["pdus"]:>5} {pdus_per_tag:>13} {elapsed_us:>8.1f}us'
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""Benchmark: rendering Telegraf configurations of 100, 1,000 and 10,000 tags.
+
+For every size the document is rendered three ways: into one string
+(`_render_configuration`), streamed into a fresh file
+(`write_configuration_to_file`) and re-rendered against the file it just
+wrote under a new `_rev`, which hashes the stream and leaves the file alone.
+Each line reports the mean time over `--rounds` runs and the peak Python
+allocation of one run (`tracemalloc`). With `--read-gap` tags are rendered as
+planned read ranges instead of one metric per tag. Run it before and after
+adding a section to the renderer to spot regressions.
+
+Run from backend/:
+
+    PYTHONPATH=. python test/scripts/benchmark/bench_render.py [--tags 100 1000 10000] [--read-gap 2]
+"""
+
+from __future__ import annotations
+
+import argparse
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable
+
+from src.services.machine_configuration_service import MachineConfigurationService
+
+# Cycles through every address type the backend understands
+ADDRESS_TEMPLATES = (
+    'DB{db}.X{offset}.3',
+    'DB{db}.I{offset}',
+    'DB{db}.DI{offset}',
+    'DB{db}.R{offset}',
+    'DB{db}.S{offset}.20',
+    'DB{db}.DT{offset}',
+)
+
+
+def _configuration(tags: int, read_gap: int | None) -> dict:
+    machine_data = {
+        'machineName': 'bench',
+        'pduSize': 20,
+        'plcIp': '10.0.0.1',
+        'plcPort': 102,
+        'plcRack': 0,
+        'plcSlot': 1,
+        'requestInterval': 1,
+    }
+    if read_gap is not None:
+        machine_data['readGap'] = read_gap
+    return {
+        '_rev': '1-a',
+        'machineData': machine_data,
+        'mqttData': {'mqttIp': '10.0.0.2', 'mqttPort': 1883, 'mqttTopic': 'on/ot/bench'},
+        'plcTagData': [
+            {
+                'tagAddress': ADDRESS_TEMPLATES[i % len(ADDRESS_TEMPLATES)].format(
+                    db=1 + i // 1000, offset=32 * (i % 1000)
+                ),
+                'tagName': f'Tag{i}',
+            }
+            for i in range(tags)
+        ],
+    }
+
+
+def _measure(run: Callable[[], object], rounds: int) -> tuple[float, float]:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        run()
+    elapsed = (time.perf_counter() - start) / rounds
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 2**20
+
+
+def _measure_modes(configuration: dict, rounds: int) -> dict[str, tuple[float, float]]:
+    with tempfile.TemporaryDirectory() as folder:
+        service = MachineConfigurationService(folder, machine_name='bench', couchdb_service=None)
+
+        def write() -> None:
+            # A new _rev skips the fingerprint shortcut, so every round renders
+            configuration['_rev'] = f'{int(configuration["_rev"].split("-")[0]) + 1}-a'
+            service.write_configuration_to_file(configuration)
+
+        def fresh_write() -> None:
+            (Path(folder) / 'bench.conf').unlink(missing_ok=True)
+            write()
+
+        return {
+            'string': _measure(lambda: service._render_configuration(configuration), rounds),
+            'write': _measure(fresh_write, rounds),
+            'unchanged': _measure(write, rounds),
+        }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tags', type=int, nargs='+', default=[100, 1000, 10000])
+    parser.add_argument('--read-gap', type=int, default=None, help='machineData.readGap in bytes')
+    parser.add_argument('--rounds', type=int, default=20)
+    args = parser.parse_args()
+
+    print(f'{"tags":>6} {"mode":<10} {"time":>10} {"peak":>10}')
+    for tags in args.tags:
+        results = _measure_modes(_configuration(tags, args.read_gap), args.rounds)
+        for mode, (elapsed, peak) in results.items():
+            print(f'{tags:>6} {mode:<10} {elapsed * 1000:>7.2f} ms {peak:>6.2f} MiB')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""Benchmark: validating and compiling the tag addresses of large configurations.
+
+Runs `PlcDatalinkRFC1006Model.from_dict` on a configuration with N tags
+(default 10,000, every address distinct), once with an empty address cache,
+as when the first machine of a fleet is created, and once with a warm cache,
+as for further machines reading the same addresses. A bulk request with many
+such machines pays the cold cost once.
+
+Run from backend/:
+
+    PYTHONPATH=. python test/scripts/benchmark/bench_tag_validation.py [--tags 10000]
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+
+from src.plc_datalink_rfc1006_model import PlcDatalinkRFC1006Model
+from src.s7_tag_address import parse_tag_address
+
+# Cycles through every address type the backend understands
+ADDRESS_TEMPLATES = (
+    'DB{db}.X{offset}.3',
+    'DB{db}.I{offset}',
+    'DB{db}.DI{offset}',
+    'DB{db}.R{offset}',
+    'DB{db}.S{offset}.20',
+    'DB{db}.DT{offset}',
+)
+
+
+def _configuration(tags: int) -> dict:
+    return {
+        'machineData': {
+            'machineName': 'bench',
+            'pduSize': 20,
+            'plcIp': '10.0.0.1',
+            'plcPort': 102,
+            'plcRack': 0,
+            'plcSlot': 1,
+            'requestInterval': 1,
+        },
+        'mqttData': {'mqttIp': '10.0.0.2', 'mqttPort': 1883, 'mqttTopic': 'on/ot/bench'},
+        'plcTagData': [
+            {
+                'tagAddress': ADDRESS_TEMPLATES[i % len(ADDRESS_TEMPLATES)].format(
+                    db=1 + i // 1000, offset=4 * (i % 1000)
+                ),
+                'tagName': f'Tag{i}',
+            }
+            for i in range(tags)
+        ],
+    }
+
+
+def _report(label: str, seconds: float, tags: int) -> None:
+    print(f'{label:<12} {seconds * 1000:8.2f} ms  {tags / seconds:12,.0f} tags/s')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tags', type=int, default=10000)
+    args = parser.parse_args()
+
+    configuration = _configuration(args.tags)
+    parse_tag_address.cache_clear()
+    start = time.perf_counter()
+    PlcDatalinkRFC1006Model.from_dict(configuration)
+    _report('cold cache', time.perf_counter() - start, args.tags)
+
+    start = time.perf_counter()
+    PlcDatalinkRFC1006Model.from_dict(configuration)
+    _report('warm cache', time.perf_counter() - start, args.tags)
+
+
+if __name__ == '__main__':
+    main()
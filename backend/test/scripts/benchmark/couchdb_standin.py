@@ -0,0 +1,186 @@
+"""Minimal in-process CouchDB stand-in for the benchmark scripts.
+
+Serves `GET/PUT/DELETE /<db>/<doc_id>`, `GET /<db>/_all_docs` and
+`POST /<db>/_bulk_docs|_bulk_get` from a dict
+over HTTP/1.1 keep-alive, so client-side effects (connection reuse, payload
+size) can be measured without a real CouchDB or a docker socket. It is not a
+CouchDB emulator — only the subset the benchmarks exercise is implemented.
+"""
+
+from __future__ import annotations
+
+import json
+import multiprocessing
+import socket
+import threading
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        # Like CouchDB itself: without TCP_NODELAY the separate header/body
+        # writes hit Nagle + delayed ACK and every keep-alive call costs ~40 ms.
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def log_message(self, format, *args):  # noqa: A002 - keep stdout clean
+        pass
+
+    def _send(self, status: int, body: dict) -> None:
+        self._send_payload(status, json.dumps(body).encode())
+
+    def _send_payload(self, status: int, payload: bytes) -> None:
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _doc_id(self) -> str:
+        return urlsplit(self.path).path.split('/', 2)[-1]
+
+    def do_GET(self):  # noqa: N802 - BaseHTTPRequestHandler API
+        docs = self.server.docs
+        doc_id = self._doc_id()
+        if doc_id == '_all_docs':
+            self._send_payload(200, self._all_docs(docs, parse_qs(urlsplit(self.path).query)))
+        elif doc_id in docs:
+            self._send(200, docs[doc_id])
+        else:
+            self._send(404, {'error': 'not_found', 'reason': 'missing'})
+
+    @staticmethod
+    def _all_docs(docs: dict, query: dict) -> bytes:
+        """Like CouchDB: ids in raw order, startkey/endkey/inclusive_end/limit/include_docs, one row per line."""
+        startkey = json.loads(query['startkey'][0]) if 'startkey' in query else None
+        endkey = json.loads(query['endkey'][0]) if 'endkey' in query else None
+        inclusive_end = query.get('inclusive_end', ['true'])[0] == 'true'
+        include_docs = query.get('include_docs', ['false'])[0] == 'true'
+        ids = [
+            k
+            for k in sorted(docs)
+            if (startkey is None or k >= startkey) and (endkey is None or k < endkey or (inclusive_end and k == endkey))
+        ]
+        if 'limit' in query:
+            ids = ids[: int(query['limit'][0])]
+        rows = ',\r\n'.join(
+            json.dumps(
+                {'id': k, 'key': k, 'value': {'rev': docs[k]['_rev']}, **({'doc': docs[k]} if include_docs else {})}
+            )
+            for k in ids
+        )
+        return f'{{"total_rows":{len(docs)},"offset":0,"rows":[\r\n{rows}\r\n]}}\n'.encode()
+
+    def _read_body(self):
+        return json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+
+    def _store(self, doc: dict) -> dict:
+        docs = self.server.docs
+        doc_id = doc['_id']
+        current = docs.get(doc_id)
+        if current and doc.get('_rev') != current['_rev']:
+            return {'id': doc_id, 'error': 'conflict', 'reason': 'Document update conflict.'}
+        generation = int(current['_rev'].split('-')[0]) + 1 if current else 1
+        rev = f'{generation}-{uuid.uuid4().hex}'
+        if doc.get('_deleted'):
+            docs.pop(doc_id, None)
+        else:
+            docs[doc_id] = {**doc, '_rev': rev}
+        return {'ok': True, 'id': doc_id, 'rev': rev}
+
+    def do_PUT(self):  # noqa: N802
+        body = self._read_body()
+        body['_id'] = self._doc_id()
+        result = self._store(body)
+        self._send(409 if 'error' in result else 201, result)
+
+    def do_POST(self):  # noqa: N802
+        body = self._read_body()
+        endpoint = self._doc_id()
+        if endpoint == '_bulk_docs':
+            self._send(201, [self._store(doc) for doc in body['docs']])
+        elif endpoint == '_bulk_get':
+            docs = self.server.docs
+            results = [
+                {
+                    'id': d['id'],
+                    'docs': [
+                        {'ok': docs[d['id']]}
+                        if d['id'] in docs
+                        else {'error': {'id': d['id'], 'error': 'not_found', 'reason': 'missing'}}
+                    ],
+                }
+                for d in body['docs']
+            ]
+            self._send(200, {'results': results})
+        else:
+            self._send(404, {'error': 'not_found', 'reason': 'missing'})
+
+    def do_DELETE(self):  # noqa: N802
+        doc = self.server.docs.pop(self._doc_id(), None)
+        if doc is None:
+            self._send(404, {'error': 'not_found', 'reason': 'missing'})
+        else:
+            self._send(200, {'ok': True, 'id': doc['_id'], 'rev': doc['_rev']})
+
+
+class CouchDBStandIn:
+    """Context manager running the stand-in on an ephemeral localhost port.
+
+    With `in_subprocess=True` the server runs in a forked child process, so its
+    allocations do not show up in memory measurements of the client side.
+    """
+
+    def __init__(self, docs: dict | None = None, in_subprocess: bool = False):
+        self._docs = dict(docs or {})
+        self._in_subprocess = in_subprocess
+        self._server = None
+        self._process = None
+        self._address = None
+
+    def _make_server(self) -> ThreadingHTTPServer:
+        server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+        server.daemon_threads = True
+        server.docs = self._docs
+        return server
+
+    def _serve_in_child(self, conn) -> None:
+        server = self._make_server()
+        conn.send(server.server_address[:2])
+        server.serve_forever()
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._address
+        return f'http://{host}:{port}'
+
+    @property
+    def docs(self) -> dict:
+        if self._server is None:
+            raise RuntimeError('docs of a subprocess stand-in are not accessible')
+        return self._server.docs
+
+    def __enter__(self) -> CouchDBStandIn:
+        if self._in_subprocess:
+            context = multiprocessing.get_context('fork')
+            parent_conn, child_conn = context.Pipe()
+            self._process = context.Process(target=self._serve_in_child, args=(child_conn,), daemon=True)
+            self._process.start()
+            self._address = parent_conn.recv()
+        else:
+            self._server = self._make_server()
+            self._address = self._server.server_address[:2]
+            threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        if self._process is not None:
+            self._process.terminate()
+            self._process.join()
+        else:
+            self._server.shutdown()
+            self._server.server_close()
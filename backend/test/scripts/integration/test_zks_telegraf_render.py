@@ -7,14 +7,14 @@ appears in the generated Telegraf config — i.e. the renderer covers the
 whole address grammar (`X`, `B`, `W`, `I`, `DI`, `R`, `DT`, `S`) used by
 the mock, not just the unit sample.
 
-`couchdb_service` is mocked here on purpose: the renderer is a pure
+No `couchdb_service` is needed here on purpose: the renderer is a pure
 function of the config dict. Network access to a real CouchDB is exercised
 separately by test_couchdb_zks_roundtrip.py.
 """
 from __future__ import annotations
 
-import io
-from unittest.mock import MagicMock
+import tempfile
+from pathlib import Path
 
 import pytest
 
@@ -27,16 +27,15 @@ TELEGRAF_CONFIG_FOLDER = '/etc/telegraf/telegraf.d'
 
 
 def _render(config: dict) -> str:
-    couchdb_service = MagicMock()
-    couchdb_service.get_doc.return_value = config
     service = MachineConfigurationService(
         TELEGRAF_CONFIG_FOLDER,
         machine_name=config['machineData']['machineName'],
-        couchdb_service=couchdb_service,
+        couchdb_service=None,
     )
-    buf = io.StringIO()
-    service._write_configuration_content(buf)
-    return buf.getvalue()
+    with tempfile.TemporaryDirectory() as folder:
+        conf = Path(folder) / 'render.conf'
+        service._write_if_changed(str(conf), config)
+        return conf.read_text()
 
 
 def test_renderer_outputs_s7comm_server_pointing_at_zks(zks_config):
@@ -0,0 +1,79 @@
+import pytest
+
+from src.services.agent_sizing import size_agent_buffers
+
+
+def _with_tags(config, count, **tag):
+    config['plcTagData'] = [{'tagAddress': f'DB1.R{4 * i}', 'tagName': f'Tag{i}', **tag} for i in range(count)]
+    return config
+
+
+def test_small_machine_keeps_former_limits(sample_config_dict):
+    sizing = size_agent_buffers(sample_config_dict)
+    assert sizing.metrics_per_second == 10
+    assert (sizing.metric_batch_size, sizing.metric_buffer_limit) == (100, 1000)
+    assert sizing.drop_risk is False
+    assert sizing.warnings == []
+
+
+def test_large_machine_buffers_flush_interval_plus_outage_tolerance(sample_config_dict):
+    sizing = size_agent_buffers(_with_tags(sample_config_dict, 2000))
+    assert sizing.metric_batch_size == 2000
+    assert sizing.metric_buffer_limit == 2000 * (1 + 60)
+    assert sizing.tolerated_outage == pytest.approx(60)
+    assert sizing.drop_risk is False
+
+
+def test_aggregated_classes_publish_one_metric_per_aggregator_and_window(sample_config_dict):
+    _with_tags(sample_config_dict, 100, rateClass='fast')
+    sample_config_dict['aggregations'] = [
+        {'rateClass': 'fast', 'period': '10s', 'stats': ['min', 'max', 'last'], 'dropOriginal': True}
+    ]
+    assert size_agent_buffers(sample_config_dict).metrics_per_second == pytest.approx(100 * 2 / 10)
+    sample_config_dict['aggregations'][0]['dropOriginal'] = False
+    assert size_agent_buffers(sample_config_dict).metrics_per_second == pytest.approx(20 + 1000)
+
+
+def test_merged_messages_count_one_metric_per_cycle_and_group(sample_config_dict):
+    _with_tags(sample_config_dict, 500, rateClass='fast')
+    sample_config_dict['plcTagData'][0]['tagAddress'] = 'DB2.R0'
+    sample_config_dict['mqttData']['mqttMessageMode'] = 'cycle'
+    assert size_agent_buffers(sample_config_dict).metrics_per_second == pytest.approx(10)
+    sample_config_dict['mqttData']['mqttMessageMode'] = 'db'
+    assert size_agent_buffers(sample_config_dict).metrics_per_second == pytest.approx(20)
+
+
+def test_rate_classes_and_read_ranges_change_the_metric_rate(sample_config_dict):
+    assert size_agent_buffers(
+        _with_tags(sample_config_dict, 100, rateClass='fast')
+    ).metrics_per_second == pytest.approx(1000)
+    assert size_agent_buffers(
+        _with_tags(sample_config_dict, 120, rateClass='static')
+    ).metrics_per_second == pytest.approx(2)
+    sample_config_dict['machineData']['readGap'] = 0
+    assert size_agent_buffers(_with_tags(sample_config_dict, 100)).metrics_per_second == 2
+
+
+def test_overrides_win_and_report_drop_risk(sample_config_dict):
+    _with_tags(sample_config_dict, 2000)
+    sample_config_dict['machineData'].update(metricBatchSize=500, metricBufferLimit=10000, outageTolerance=30)
+    sizing = size_agent_buffers(sample_config_dict)
+    assert (sizing.metric_batch_size, sizing.metric_buffer_limit) == (500, 10000)
+    assert sizing.tolerated_outage == pytest.approx(4)
+    assert sizing.drop_risk is True
+    assert 'holds 4.0s of metrics' in sizing.warnings[0]
+
+
+def test_buffer_is_capped(sample_config_dict):
+    _with_tags(sample_config_dict, 2000, rateClass='fast')
+    sample_config_dict['machineData']['outageTolerance'] = 3600
+    sizing = size_agent_buffers(sample_config_dict)
+    assert sizing.metric_buffer_limit == 1000000
+    assert sizing.drop_risk is True
+
+
+def test_machine_without_tags_has_no_outage_limit(sample_config_dict):
+    sample_config_dict['plcTagData'] = []
+    sizing = size_agent_buffers(sample_config_dict)
+    assert sizing.tolerated_outage is None
+    assert sizing.to_json_dict()['dropRisk'] is False
@@ -1,6 +1,9 @@
+import json
+
 import pytest
-from requests.exceptions import HTTPError
+from requests.exceptions import ConnectionError, HTTPError
 
+from src.services.circuit_breaker import CircuitBreaker, CircuitOpenError
 from src.services.couchdb_service import CouchDBService
 
 
@@ -77,3 +80,256 @@ def test_delete_doc_passes_rev_query(service, requests_mock):
     result = service.delete_doc('m1', '2-bbb')
     assert result['rev'] == '3-ccc'
     assert requests_mock.last_request.qs == {'rev': ['2-bbb']}
+
+
+def test_requests_share_one_pooled_session(service, requests_mock):
+    requests_mock.get('http://couchdb-test:5984/datalink/m1', json={'_id': 'm1'})
+    service.get_doc('m1')
+    service.get_doc('m1')
+    assert service.session.auth == ('admin', 'secret')
+    adapter = service.session.get_adapter('http://couchdb-test:5984')
+    assert adapter._pool_maxsize == 10
+
+
+def test_requests_use_configured_timeout(requests_mock):
+    service = CouchDBService('http://couchdb-test:5984', 'admin', 'secret', 'datalink', timeout=(1, 5))
+    requests_mock.get('http://couchdb-test:5984/datalink/m1', json={'_id': 'm1'})
+    service.get_doc('m1')
+    assert requests_mock.last_request.timeout == (1, 5)
+
+
+def test_get_retries_transient_failures(service, requests_mock, mocker):
+    mock_sleep = mocker.patch('src.services.couchdb_service.time.sleep')
+    requests_mock.get(
+        'http://couchdb-test:5984/datalink/m1',
+        [
+            {'exc': ConnectionError},
+            {'status_code': 503, 'json': {}},
+            {'json': {'_id': 'm1'}},
+        ],
+    )
+    assert service.get_doc('m1') == {'_id': 'm1'}
+    assert requests_mock.call_count == 3
+    assert mock_sleep.call_count == 2
+
+
+def test_get_gives_up_after_configured_retries(service, requests_mock, mocker):
+    mocker.patch('src.services.couchdb_service.time.sleep')
+    requests_mock.get('http://couchdb-test:5984/datalink/m1', status_code=503, json={})
+    with pytest.raises(HTTPError) as excinfo:
+        service.get_doc('m1')
+    assert excinfo.value.response.status_code == 503
+    assert requests_mock.call_count == 3
+
+
+def test_put_is_never_retried(service, requests_mock, mocker):
+    mock_sleep = mocker.patch('src.services.couchdb_service.time.sleep')
+    requests_mock.put('http://couchdb-test:5984/datalink/m1', exc=ConnectionError)
+    with pytest.raises(ConnectionError):
+        service.update_doc('m1', {'_rev': '1-aaa'})
+    assert requests_mock.call_count == 1
+    mock_sleep.assert_not_called()
+
+
+def test_open_circuit_fails_fast_without_request(requests_mock, mocker):
+    mocker.patch('src.services.couchdb_service.time.sleep')
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    service = CouchDBService('http://couchdb-test:5984', 'admin', 'secret', 'datalink', circuit_breaker=breaker)
+    requests_mock.get('http://couchdb-test:5984/datalink/m1', exc=ConnectionError)
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            service.get_doc('m1')
+    # Retries of one call count as a single failure
+    assert requests_mock.call_count == 6
+    with pytest.raises(CircuitOpenError):
+        service.get_doc('m1')
+    assert requests_mock.call_count == 6
+    assert service.circuit_stats()['state'] == 'open'
+
+
+def test_client_errors_do_not_open_the_circuit(requests_mock):
+    breaker = CircuitBreaker(failure_threshold=1)
+    service = CouchDBService('http://couchdb-test:5984', 'admin', 'secret', 'datalink', circuit_breaker=breaker)
+    requests_mock.get('http://couchdb-test:5984/datalink/missing', status_code=404, json={})
+    with pytest.raises(HTTPError):
+        service.get_doc('missing')
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_get_doc_revalidates_cached_document_with_etag(service, requests_mock):
+    payload = {'_id': 'm1', '_rev': '1-abc', 'plcTagData': []}
+    requests_mock.get(
+        'http://couchdb-test:5984/datalink/m1',
+        [
+            {'json': payload, 'headers': {'ETag': '"1-abc"'}},
+            {'status_code': 304, 'headers': {'ETag': '"1-abc"'}},
+        ],
+    )
+    assert service.get_doc('m1') == payload
+    assert 'If-None-Match' not in requests_mock.last_request.headers
+    assert service.get_doc('m1') == payload
+    assert requests_mock.last_request.headers['If-None-Match'] == '"1-abc"'
+    stats = service.cache_stats()
+    assert (stats['hits'], stats['misses'], stats['size']) == (1, 1, 1)
+
+
+def test_get_doc_returns_private_copies_from_cache(service, requests_mock):
+    requests_mock.get(
+        'http://couchdb-test:5984/datalink/m1',
+        [
+            {'json': {'_id': 'm1', '_rev': '1-abc'}, 'headers': {'ETag': '"1-abc"'}},
+            {'status_code': 304},
+        ],
+    )
+    service.get_doc('m1')['_rev'] = 'mutated'
+    assert service.get_doc('m1')['_rev'] == '1-abc'
+
+
+def test_get_doc_replaces_changed_document(service, requests_mock):
+    requests_mock.get(
+        'http://couchdb-test:5984/datalink/m1',
+        [
+            {'json': {'_id': 'm1', '_rev': '1-abc'}, 'headers': {'ETag': '"1-abc"'}},
+            {'json': {'_id': 'm1', '_rev': '2-def'}, 'headers': {'ETag': '"2-def"'}},
+            {'status_code': 304},
+        ],
+    )
+    service.get_doc('m1')
+    assert service.get_doc('m1')['_rev'] == '2-def'
+    assert service.get_doc('m1')['_rev'] == '2-def'
+    assert requests_mock.last_request.headers['If-None-Match'] == '"2-def"'
+
+
+def test_cache_is_bounded_lru():
+    service = CouchDBService('http://couchdb-test:5984', 'admin', 'secret', 'datalink', cache_size=2)
+    for doc_id in ('a', 'b', 'c'):
+        service.cache.store(doc_id, f'"1-{doc_id}"', b'{}')
+    assert service.cache.get_etag('a') is None
+    assert service.cache_stats()['evictions'] == 1
+    assert service.cache_stats()['size'] == 2
+
+
+def test_writes_invalidate_cached_document(service, requests_mock):
+    service.cache.store('m1', '"1-abc"', b'{}')
+    requests_mock.put('http://couchdb-test:5984/datalink/m1', json={'ok': True, 'rev': '2-def'})
+    service.update_doc('m1', {'_rev': '1-abc'})
+    assert service.cache.get_etag('m1') is None
+
+
+def test_bulk_docs_posts_in_batches(service, requests_mock):
+    requests_mock.post(
+        'http://couchdb-test:5984/datalink/_bulk_docs',
+        [
+            {'json': [{'ok': True, 'id': 'a', 'rev': '1-a'}, {'ok': True, 'id': 'b', 'rev': '1-b'}]},
+            {'json': [{'id': 'c', 'error': 'conflict', 'reason': 'Document update conflict.'}]},
+        ],
+    )
+    results = service.bulk_docs([{'_id': 'a'}, {'_id': 'b'}, {'_id': 'c'}], batch_size=2)
+    assert [r['id'] for r in results] == ['a', 'b', 'c']
+    assert requests_mock.call_count == 2
+    assert requests_mock.request_history[1].json() == {'docs': [{'_id': 'c'}]}
+
+
+def test_bulk_get_maps_documents_and_errors(service, requests_mock):
+    requests_mock.post(
+        'http://couchdb-test:5984/datalink/_bulk_get',
+        json={
+            'results': [
+                {'id': 'a', 'docs': [{'ok': {'_id': 'a', '_rev': '1-a'}}]},
+                {'id': 'x', 'docs': [{'error': {'id': 'x', 'error': 'not_found', 'reason': 'missing'}}]},
+            ]
+        },
+    )
+    docs = service.bulk_get(['a', 'x'])
+    assert docs['a'] == {'_id': 'a', '_rev': '1-a'}
+    assert docs['x'] == {'error': 'not_found', 'reason': 'missing'}
+    assert requests_mock.last_request.json() == {'docs': [{'id': 'a'}, {'id': 'x'}]}
+
+
+def test_get_revisions_skips_missing_and_deleted(service, requests_mock):
+    requests_mock.post(
+        'http://couchdb-test:5984/datalink/_all_docs',
+        json={
+            'rows': [
+                {'id': 'a', 'key': 'a', 'value': {'rev': '1-a'}},
+                {'key': 'x', 'error': 'not_found'},
+                {'id': 'd', 'key': 'd', 'value': {'rev': '2-d', 'deleted': True}},
+            ]
+        },
+    )
+    assert service.get_revisions(['a', 'x', 'd']) == {'a': '1-a', 'x': None, 'd': None}
+    assert requests_mock.last_request.json() == {'keys': ['a', 'x', 'd']}
+
+
+def test_get_all_docs_paginates_with_one_extra_row(service, requests_mock):
+    rows = [{'id': doc_id, 'doc': {}} for doc_id in ('b', 'c', 'd')]
+    requests_mock.get('http://couchdb-test:5984/datalink/_all_docs', json={'rows': rows})
+    result = service.get_all_docs(startkey='b', limit=2)
+    assert requests_mock.last_request.qs == {'include_docs': ['true'], 'startkey': ['"b"'], 'limit': ['3']}
+    assert [row['id'] for row in result['rows']] == ['b', 'c']
+    assert result['next'] == 'd'
+
+
+def test_get_all_docs_last_page_has_no_next(service, requests_mock):
+    requests_mock.get('http://couchdb-test:5984/datalink/_all_docs', json={'rows': [{'id': 'z', 'doc': {}}]})
+    assert service.get_all_docs(limit=2)['next'] is None
+
+
+def _all_docs_callback(ids):
+    """Serve ids like CouchDB's _all_docs: raw id order, startkey/endkey/limit, one row per line."""
+
+    def callback(request, context):
+        query = {name: values[0] for name, values in request.qs.items()}
+        startkey = json.loads(query['startkey']) if 'startkey' in query else None
+        endkey = json.loads(query['endkey']) if 'endkey' in query else None
+        selected = [i for i in sorted(ids) if (startkey is None or i >= startkey) and (endkey is None or i <= endkey)]
+        selected = selected[: int(query['limit'])] if 'limit' in query else selected
+        rows = ',\r\n'.join(json.dumps({'id': i, 'key': i, 'doc': {'_id': i}}, separators=(',', ':')) for i in selected)
+        return f'{{"total_rows":{len(ids)},"offset":0,"rows":[\r\n{rows}\r\n]}}\n'.encode()
+
+    return callback
+
+
+ALL_DOCS_IDS = ['A', '_design/machines', 'a', 'b']
+
+
+def test_stream_all_docs_reads_the_ranges_around_design_docs(service, requests_mock):
+    requests_mock.get('http://couchdb-test:5984/datalink/_all_docs', content=_all_docs_callback(ALL_DOCS_IDS))
+    streamed = json.loads(b''.join(service.stream_all_docs(chunk_size=7)))
+    assert [row['id'] for row in streamed['rows']] == ['A', 'a', 'b']
+    assert [request.qs for request in requests_mock.request_history] == [
+        {'include_docs': ['true'], 'endkey': ['"_design/"']},
+        {'include_docs': ['true'], 'startkey': ['"_design0"']},
+    ]
+
+
+@pytest.mark.parametrize(
+    'startkey,limit,ids',
+    [
+        (None, 2, ['A', 'a']),
+        (None, 1, ['A']),
+        ('a', 5, ['a', 'b']),
+        ('B', 5, ['a', 'b']),
+    ],
+)
+def test_stream_all_docs_pages_across_both_ranges(service, requests_mock, startkey, limit, ids):
+    requests_mock.get('http://couchdb-test:5984/datalink/_all_docs', content=_all_docs_callback(ALL_DOCS_IDS))
+    streamed = json.loads(b''.join(service.stream_all_docs(startkey, limit, chunk_size=5)))
+    assert [row['id'] for row in streamed['rows']] == ids
+
+
+def test_stream_all_docs_without_machines(service, requests_mock):
+    requests_mock.get('http://couchdb-test:5984/datalink/_all_docs', content=_all_docs_callback(['_design/machines']))
+    assert json.loads(b''.join(service.stream_all_docs())) == {'rows': []}
+
+
+def test_iter_rows_holds_back_only_the_envelope():
+    body = b'{"total_rows":2,"offset":0,"rows":[{"id":"a"},{"id":"b"}]}'
+    chunks = [body[i : i + 8] for i in range(0, len(body), 8)]
+    assert b''.join(CouchDBService._iter_rows(chunks)) == b'{"id":"a"},{"id":"b"}'
+
+
+def test_stream_all_docs_raises_before_streaming(service, requests_mock):
+    requests_mock.get('http://couchdb-test:5984/datalink/_all_docs', status_code=404, json={})
+    with pytest.raises(HTTPError):
+        service.stream_all_docs()
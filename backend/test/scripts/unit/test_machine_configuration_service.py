@@ -1,6 +1,6 @@
 """Tests for the Telegraf config renderer.
 
-The renderer (`MachineConfigurationService._write_configuration_content`)
+The renderer (`MachineConfigurationService._write_if_changed`)
 must produce byte-for-byte the same output on every run for a given input.
 A committed snapshot under `snapshots/sample_machine.conf` is the ground
 truth — refresh it intentionally with `UPDATE_SNAPSHOT=1 pytest` when the
@@ -8,10 +8,13 @@ rendering logic changes.
 """
 from __future__ import annotations
 
-import io
+import copy
 import os
 import subprocess
+import tempfile
+import threading
 from pathlib import Path
+from types import SimpleNamespace
 from unittest.mock import MagicMock
 
 import pytest
@@ -27,16 +30,17 @@ UPDATE_SNAPSHOT = os.environ.get('UPDATE_SNAPSHOT') == '1'
 
 
 def _render(sample_config_dict: dict) -> str:
-    couchdb_service = MagicMock()
-    couchdb_service.get_doc.return_value = sample_config_dict
     service = MachineConfigurationService(
         TELEGRAF_CONFIG_FOLDER,
         machine_name=sample_config_dict['machineData']['machineName'],
-        couchdb_service=couchdb_service,
+        couchdb_service=None,
     )
-    buf = io.StringIO()
-    service._write_configuration_content(buf)
-    return buf.getvalue()
+    # The rendered paths stay under TELEGRAF_CONFIG_FOLDER, only the file lands in a temp dir
+    with tempfile.TemporaryDirectory() as folder:
+        conf = Path(folder) / 'render.conf'
+        service._write_if_changed(str(conf), sample_config_dict)
+        # Drop the fingerprint line, the snapshot pins the rendering itself
+        return conf.read_text().split('\n', 1)[1]
 
 
 def test_renderer_output_matches_snapshot(sample_config_dict):
@@ -81,6 +85,447 @@ def test_renderer_quotes_server_with_port(sample_config_dict):
     assert 'server = "192.168.4.100:102"' in rendered
 
 
+def test_renderer_groups_tags_by_read_range_when_read_gap_is_set(sample_config_dict):
+    sample_config_dict['machineData']['readGap'] = 2
+    rendered = _render(sample_config_dict)
+    assert rendered.count('[[inputs.s7comm.metric]]') == 1
+    assert '# DB2000.B0-44' in rendered
+    assert 'machine = "sample"' in rendered
+    for tag in sample_config_dict['plcTagData']:
+        assert f'name="sample.{tag["tagName"]}", address="{tag["tagAddress"]}"' in rendered
+
+
+def test_renderer_renders_one_input_per_rate_class(sample_config_dict):
+    tags = sample_config_dict['plcTagData']
+    tags[0]['rateClass'] = 'fast'
+    tags[9]['rateClass'] = 'static'
+    tags[5]['rateClass'] = 'normal'
+    rendered = _render(sample_config_dict)
+    inputs = rendered.split('[[inputs.s7comm]]')[1:]
+    assert len(inputs) == 3
+    assert inputs[0].startswith('\n  interval = "100ms"\n') and 'address="DB2000.X0.0"' in inputs[0]
+    assert 'interval' not in inputs[1] and inputs[1].count('[[inputs.s7comm.metric]]') == 8
+    assert inputs[2].startswith('\n  interval = "60s"\n') and 'address="DB2000.S30.13"' in inputs[2]
+    assert all('pdu_size = 10' in section for section in inputs)
+
+
+def test_renderer_sizes_agent_limits_for_large_machines(sample_config_dict):
+    sample_config_dict['plcTagData'] = [{'tagAddress': f'DB1.R{4 * i}', 'tagName': f'Tag{i}'} for i in range(2000)]
+    rendered = _render(sample_config_dict)
+    assert 'metric_batch_size = 2000' in rendered
+    assert 'metric_buffer_limit = 122000' in rendered
+    sample_config_dict['machineData']['metricBufferLimit'] = 5000
+    assert 'metric_buffer_limit = 5000' in _render(sample_config_dict)
+
+
+def test_renderer_reports_state_through_internal_stats_instead_of_debug_log(sample_config_dict):
+    rendered = _render(sample_config_dict)
+    assert 'debug = false' in rendered
+    assert '[[inputs.internal]]' in rendered
+    stats_output = rendered.split('[[outputs.file]]')[1]
+    assert 'files = ["/etc/telegraf/telegraf.d/sample.stats"]' in stats_output
+    assert 'namepass = ["internal_gather"]' in stats_output
+    mqtt_output = rendered.split('[[outputs.mqtt]]')[1].split('[[outputs.file]]')[0]
+    assert 'namedrop = ["internal_*"]' in mqtt_output
+    sample_config_dict['agent'] = {'debug': True}
+    assert 'debug = true' in _render(sample_config_dict)
+
+
+def _deadband_filter(rendered):
+    """The rendered Starlark filter, run as Python: both languages agree on this subset but for type()."""
+    source = rendered.split("  source = '''\n")[1].split("'''")[0]
+    namespace = {'state': {}, 'type': lambda value: type(value).__name__}
+    exec(source, namespace)
+    return namespace['apply']
+
+
+class _Fields(dict):
+    def items(self):
+        return list(super().items())
+
+
+def _sample(name, value, seconds):
+    return SimpleNamespace(fields=_Fields({name: value}), time=int(seconds * 1e9))
+
+
+def test_renderer_leaves_deadband_tags_to_their_starlark_filter(sample_config_dict):
+    sample_config_dict['plcTagData'][7].update(deadband=0.5, maxSilence=60)
+    rendered = _render(sample_config_dict)
+    real, string = (rendered.split(f'name="sample.{name}"')[1].split('[[')[0] for name in ('Real_Value', 'String_Value'))
+    assert 'machine = "sample.Real_Value"\n      datalink_deadband = "sample"\n' in real
+    assert 'datalink_deadband' not in string
+    starlark = rendered.split('[[processors.starlark]]')[1].split('[[processors.dedup]]')[0]
+    assert '"sample.Real_Value": (0.5, False, 60000000000),' in starlark
+    assert '[processors.starlark.tagpass]\n    datalink_deadband = ["sample"]' in starlark
+    assert '[processors.dedup.tagdrop]\n    datalink_deadband = ["*"]' in rendered
+    assert 'tagexclude = ["datalink_deadband"]' in rendered.split('[[outputs.mqtt]]')[1]
+
+
+def test_renderer_without_deadbands_has_no_filter(sample_config_dict):
+    rendered = _render(sample_config_dict)
+    assert 'starlark' not in rendered and 'datalink_deadband' not in rendered
+
+
+def test_deadband_filter_publishes_real_changes_and_heartbeats(sample_config_dict):
+    sample_config_dict['plcTagData'][7].update(deadband=0.5, maxSilence=60)
+    apply = _deadband_filter(_render(sample_config_dict))
+    published = [
+        apply(_sample('sample.Real_Value', value, seconds)) is not None
+        for value, seconds in ((20.0, 0), (20.2, 1), (19.7, 2), (20.6, 3), (20.3, 4), (20.3, 63), (20.4, 64))
+    ]
+    # The band is measured from the last published value, 20.0 then 20.6; 63s is the heartbeat
+    assert published == [True, False, False, True, False, True, False]
+
+
+def test_deadband_filter_percent_band_and_plain_change_in_read_ranges(sample_config_dict):
+    sample_config_dict['machineData']['readGap'] = 0
+    sample_config_dict['plcTagData'][4]['deadbandPercent'] = 10
+    rendered = _render(sample_config_dict)
+    assert rendered.count('datalink_deadband = "sample"') == 1
+    apply = _deadband_filter(rendered)
+    assert apply(_sample('sample.Int_Value', -200, 0)) is not None
+    assert apply(_sample('sample.Int_Value', -215, 1)) is None
+    assert apply(_sample('sample.Int_Value', -225, 2)) is not None
+    # Fields read in the same range without a deadband of their own are published on any change
+    assert apply(_sample('sample.Word_Value', 7, 0)) is not None
+    assert apply(_sample('sample.Word_Value', 7, 1)) is None
+    assert apply(_sample('sample.Word_Value', 8, 2)) is not None
+
+
+def test_renderer_aggregates_rate_classes_over_their_window(sample_config_dict):
+    sample_config_dict['plcTagData'][7]['rateClass'] = 'fast'
+    sample_config_dict['aggregations'] = [
+        {'rateClass': 'fast', 'period': '10s'},
+        {'rateClass': 'static', 'period': '1h', 'stats': ['last']},
+    ]
+    rendered = _render(sample_config_dict)
+    fast_input, normal_input = rendered.split('[[inputs.s7comm]]')[1:3]
+    assert '[inputs.s7comm.tags]\n    datalink_aggregation = "sample.fast"\n' in fast_input
+    assert 'datalink_aggregation' not in normal_input.split('[[inputs.internal]]')[0]
+    # The static class has no tags, so it gets no aggregator
+    assert rendered.count('[[aggregators.') == 2
+    basicstats = rendered.split('[[aggregators.basicstats]]')[1].split('[[aggregators.final]]')[0]
+    assert 'period = "10s"\n  drop_original = true\n  stats = ["min", "max", "mean"]\n' in basicstats
+    assert '[aggregators.basicstats.tagpass]\n    datalink_aggregation = ["sample.fast"]' in basicstats
+    final = rendered.split('[[aggregators.final]]')[1].split('# MQTT')[0]
+    assert 'output_strategy = "periodic"' in final and 'datalink_aggregation = ["sample.fast"]' in final
+    assert '[processors.dedup.tagdrop]\n    datalink_aggregation = ["*"]' in rendered
+    assert 'tagexclude = ["datalink_aggregation"]' in rendered.split('[[outputs.mqtt]]')[1]
+
+
+def test_renderer_publishes_only_aggregates_of_dropped_classes_in_agent_limits(sample_config_dict):
+    sample_config_dict['plcTagData'] = [{'tagAddress': f'DB1.R{4 * i}', 'tagName': f'Tag{i}', 'rateClass': 'fast'} for i in range(500)]
+    assert 'metric_batch_size = 5000' in _render(sample_config_dict)
+    sample_config_dict['aggregations'] = [{'rateClass': 'fast', 'period': '10s', 'stats': ['mean']}]
+    assert 'metric_batch_size = 100' in _render(sample_config_dict)
+
+
+@pytest.mark.parametrize('data_format', ['msgpack', 'influx'])
+def test_renderer_compact_data_format_drops_json_options(sample_config_dict, data_format):
+    sample_config_dict['mqttData']['mqttDataFormat'] = data_format
+    output = _render(sample_config_dict).split('[[outputs.mqtt]]')[1].split('# Machine state')[0]
+    assert f'  data_format = "{data_format}"\n' in output
+    assert 'json_timestamp_units' not in output
+
+
+def test_renderer_merges_one_message_per_cycle(sample_config_dict):
+    sample_config_dict['mqttData']['mqttMessageMode'] = 'cycle'
+    sample_config_dict['plcTagData'][7]['deadband'] = 0.5
+    rendered = _render(sample_config_dict)
+    assert rendered.count('datalink_message = "sample"\n') == 10
+    merge = rendered.split('# One MQTT message per poll cycle of sample')[1].split('# MQTT')[0]
+    assert '[processors.starlark.tagpass]\n    datalink_message = ["sample"]' in merge
+    assert '[[aggregators.merge]]\n  period = "1s"\n  grace = "10s"\n  drop_original = true\n' in merge
+    # Dedup still sees one series per tag, the merge comes after it
+    assert 'datalink_message' not in rendered.split('[[processors.dedup]]')[1].split('# One MQTT')[0]
+    assert 'tagexclude = ["datalink_deadband", "datalink_message"]' in rendered
+
+    namespace = {}
+    exec(merge.split("source = '''")[1].split("'''")[0], namespace)
+    metric = SimpleNamespace(tags={'machine': 'sample.Real_Value', 'datalink_deadband': 'sample', 'datalink_message': 'sample'})
+    assert namespace['apply'](metric).tags == {'machine': 'sample', 'datalink_message': 'sample'}
+
+
+def test_renderer_merges_one_message_per_db_and_range(sample_config_dict):
+    sample_config_dict['mqttData']['mqttMessageMode'] = 'db'
+    sample_config_dict['machineData']['readGap'] = 0
+    sample_config_dict['plcTagData'][9]['tagAddress'] = 'DB7.S30.13'
+    sample_config_dict['plcTagData'][8]['tagAddress'] = 'MK0.DT20'
+    sample_config_dict['aggregations'] = [{'rateClass': 'normal', 'period': '10s'}]
+    rendered = _render(sample_config_dict)
+    # Every read range of a DB carries the message of its DB
+    assert rendered.count('datalink_message = "sample.DB7"\n') == 1
+    assert rendered.count('datalink_message = "sample.MK0"\n') == 1
+    assert rendered.count('datalink_message = "sample.DB2000"\n') == rendered.count('[[inputs.s7comm.metric]]') - 2
+    merge = rendered.split('# One MQTT message per poll cycle and DB of sample')[1].split('# MQTT')[0]
+    assert merge.count('datalink_message = ["sample.DB2000", "sample.DB7", "sample.MK0"]') == 2
+    assert '[aggregators.merge.tagdrop]\n    datalink_aggregation = ["*"]' in merge
+
+
+def test_renderer_without_message_mode_publishes_every_metric(sample_config_dict):
+    sample_config_dict['mqttData']['mqttMessageMode'] = 'metric'
+    rendered = _render(sample_config_dict)
+    assert 'datalink_message' not in rendered and '[[aggregators.merge]]' not in rendered
+
+
+def test_renderer_rejects_invalid_tag_address(sample_config_dict):
+    sample_config_dict['plcTagData'].append({'tagAddress': 'DB1.S20', 'tagName': 'Unknown'})
+    service = MachineConfigurationService(TELEGRAF_CONFIG_FOLDER, 'sample', MagicMock())
+    with pytest.raises(ValueError, match='DB1.S20'):
+        service._render_configuration(sample_config_dict)
+
+
+def test_refresh_configuration_file_rewrites_existing_file(tmp_path, sample_config_dict):
+    conf = tmp_path / 'sample.conf'
+    conf.write_text('stale')
+    service = MachineConfigurationService(
+        str(tmp_path), machine_name='sample', couchdb_service=None
+    )
+    assert service.refresh_configuration_file(sample_config_dict)
+    assert 'server = "192.168.4.100:102"' in conf.read_text()
+
+
+def test_refresh_configuration_file_skips_unconfigured_machine(tmp_path, sample_config_dict):
+    service = MachineConfigurationService(
+        str(tmp_path), machine_name='sample', couchdb_service=None
+    )
+    assert not service.refresh_configuration_file(sample_config_dict)
+    assert not (tmp_path / 'sample.conf').exists()
+
+
+def test_write_configuration_to_file_uses_given_document(tmp_path, sample_config_dict, mocker):
+    couchdb_service = mocker.Mock()
+    service = MachineConfigurationService(
+        str(tmp_path), machine_name='sample', couchdb_service=couchdb_service
+    )
+    service.write_configuration_to_file(sample_config_dict)
+    assert 'topic = "on/ot/sample"' in (tmp_path / 'sample.conf').read_text()
+    couchdb_service.get_doc.assert_not_called()
+
+
+def test_write_configuration_to_file_skips_identical_output(tmp_path, sample_config_dict, mocker):
+    sample_config_dict['_rev'] = '1-aaa'
+    service = MachineConfigurationService(str(tmp_path), machine_name='sample', couchdb_service=None)
+    remove = mocker.patch.object(service, 'remove_configuration_file')
+    assert service.write_configuration_to_file(sample_config_dict)
+    conf = tmp_path / 'sample.conf'
+    first_line, body = conf.read_text().split('\n', 1)
+    assert first_line.startswith(f'{MachineConfigurationService.FINGERPRINT_PREFIX} rev=1-aaa renderer=')
+    assert body == service._render_configuration(sample_config_dict)
+
+    mtime = conf.stat().st_mtime_ns
+    assert not service.write_configuration_to_file(sample_config_dict)
+    # A new revision with the same rendered output is not rewritten either
+    sample_config_dict['_rev'] = '2-bbb'
+    assert not service.write_configuration_to_file(sample_config_dict)
+    assert conf.stat().st_mtime_ns == mtime
+    remove.assert_not_called()
+
+
+def test_write_configuration_to_file_rewrites_changed_output(tmp_path, sample_config_dict, mocker):
+    service = MachineConfigurationService(str(tmp_path), machine_name='sample', couchdb_service=None)
+    mocker.patch.object(service, 'remove_configuration_file')
+    service.write_configuration_to_file(sample_config_dict)
+    sample_config_dict['mqttData']['mqttTopic'] = 'on/ot/other'
+    assert service.write_configuration_to_file(sample_config_dict)
+    assert 'topic = "on/ot/other"' in (tmp_path / 'sample.conf').read_text()
+
+
+def test_existing_configuration_is_replaced_atomically(tmp_path, sample_config_dict, mocker):
+    service = MachineConfigurationService(str(tmp_path), machine_name='sample', couchdb_service=None)
+    remove = mocker.patch.object(service, 'remove_configuration_file')
+    conf = tmp_path / 'sample.conf'
+    conf.write_text('old')
+    replace = mocker.spy(os, 'replace')
+    assert service.write_configuration_to_file(sample_config_dict)
+    replace.assert_called_once()
+    tmp_file, target = replace.call_args.args
+    assert target == str(conf)
+    assert os.path.dirname(tmp_file) == str(tmp_path) and not tmp_file.endswith('.conf')
+    assert os.stat(conf).st_mode & 0o777 == 0o644
+    # The supervisor entry stays, so the running Telegraf reloads instead of being stopped
+    remove.assert_not_called()
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['sample.conf']
+
+
+def test_concurrent_writers_of_one_file_are_serialized(tmp_path):
+    service = MachineConfigurationService(str(tmp_path), machine_name='sample', couchdb_service=None)
+    conf = str(tmp_path / 'sample.conf')
+    rendering, release = threading.Event(), threading.Event()
+
+    def slow_render(document):
+        rendering.set()
+        release.wait(5)
+        yield 'first\n'
+
+    first = threading.Thread(target=service._write_if_changed, args=(conf, {'_rev': '1-a'}, slow_render))
+    first.start()
+    rendering.wait(5)
+    second = threading.Thread(target=service._write_if_changed, args=(conf, {'_rev': '2-b'}, lambda _: iter(['second\n'])))
+    second.start()
+    second.join(0.2)
+    # The listener thread waits for the request's render instead of racing it on the same file
+    assert second.is_alive()
+    release.set()
+    first.join(5)
+    second.join(5)
+    assert open(conf).read().endswith('second\n')
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['sample.conf']
+
+
+def test_failed_write_keeps_previous_configuration(tmp_path, sample_config_dict, mocker):
+    service = MachineConfigurationService(str(tmp_path), machine_name='sample', couchdb_service=None)
+    conf = tmp_path / 'sample.conf'
+    conf.write_text('old')
+    mocker.patch.object(os, 'replace', side_effect=OSError('disk full'))
+    service.write_configuration_to_file(sample_config_dict)
+    assert conf.read_text() == 'old'
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['sample.conf']
+
+
+def test_invalid_document_leaves_configuration_and_no_temp_file(tmp_path, sample_config_dict):
+    service = MachineConfigurationService(str(tmp_path), machine_name='sample', couchdb_service=None)
+    conf = tmp_path / 'sample.conf'
+    conf.write_text('old')
+    sample_config_dict['plcTagData'].append({'tagAddress': 'DB1.S20', 'tagName': 'Unknown'})
+    with pytest.raises(ValueError, match='DB1.S20'):
+        service.write_configuration_to_file(sample_config_dict)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['sample.conf']
+    assert conf.read_text() == 'old'
+
+
+def test_renderer_streams_one_chunk_per_metric(sample_config_dict):
+    service = MachineConfigurationService(TELEGRAF_CONFIG_FOLDER, 'sample', None)
+    chunks = list(service._iter_configuration(sample_config_dict))
+    assert sum(chunk.count('[[inputs.s7comm.metric]]') == 1 for chunk in chunks) == len(sample_config_dict['plcTagData'])
+    assert ''.join(chunks) == _render(sample_config_dict)
+
+
+def test_hand_edited_configuration_is_rewritten(tmp_path, sample_config_dict, mocker):
+    sample_config_dict['_rev'] = '1-aaa'
+    service = MachineConfigurationService(str(tmp_path), machine_name='sample', couchdb_service=None)
+    mocker.patch.object(service, 'remove_configuration_file')
+    service.write_configuration_to_file(sample_config_dict)
+    conf = tmp_path / 'sample.conf'
+    conf.write_text(conf.read_text().replace('pdu_size = 10', 'pdu_size = 240'))
+    assert service.write_configuration_to_file(sample_config_dict)
+    assert 'pdu_size = 10' in conf.read_text()
+
+
+def _machine(sample_config_dict, name):
+    config = copy.deepcopy(sample_config_dict)
+    config['machineData']['machineName'] = name
+    config['mqttData']['mqttTopic'] = f'on/ot/{name}'
+    return config
+
+
+def test_pack_renders_every_started_machine_into_one_configuration(tmp_path, sample_config_dict):
+    for name in ('press', 'lathe'):
+        service = MachineConfigurationService(str(tmp_path), machine_name=name, couchdb_service=None, pack='edge')
+        assert service.write_configuration_to_file(_machine(sample_config_dict, name))
+    assert sorted(p.name for p in (tmp_path / 'edge.d').iterdir()) == ['lathe.conf', 'press.conf']
+    assert not (tmp_path / 'press.conf').exists()
+
+    pack = (tmp_path / 'edge.conf').read_text()
+    assert pack.count('[agent]') == 1
+    assert pack.count(MachineConfigurationService.FINGERPRINT_PREFIX) == 1
+    assert f'logfile = "{tmp_path}/edge.log"' in pack
+    lathe, press = pack.split('# inputs.s7comm Configuration of ')[1:]
+    assert lathe.startswith('lathe\n') and press.startswith('press\n')
+    assert 'alias = "press"' in press and 'interval = "1s"' in press
+    assert 'datalink_machine = "press"' in press
+    assert 'topic = "on/ot/press"' in press
+    assert 'tagexclude = ["datalink_machine"]' in press
+    assert '[outputs.mqtt.tagpass]\n    datalink_machine = ["press"]' in press
+    assert f'files = ["{tmp_path}/press.stats"]' in press
+    assert '[outputs.file.tagpass]\n    alias = ["press"]' in press
+
+
+def test_pack_leaves_deadband_tags_of_every_member_to_their_filter(tmp_path, sample_config_dict):
+    config = _machine(sample_config_dict, 'press')
+    config['plcTagData'][7]['deadband'] = 0.5
+    MachineConfigurationService(str(tmp_path), 'press', None, pack='edge').write_configuration_to_file(config)
+    pack = (tmp_path / 'edge.conf').read_text()
+    assert '[processors.dedup.tagdrop]\n    datalink_deadband = ["*"]' in pack
+    member = pack.split('# inputs.s7comm Configuration of press')[1]
+    assert member.index('[[processors.starlark]]') < member.index('[[outputs.mqtt]]')
+    assert 'tagexclude = ["datalink_machine", "datalink_deadband"]' in member
+
+
+def test_pack_members_keep_their_own_mqtt_data_format(tmp_path, sample_config_dict):
+    for name, data_format in (('lathe', 'json'), ('press', 'msgpack')):
+        config = _machine(sample_config_dict, name)
+        config['mqttData']['mqttDataFormat'] = data_format
+        MachineConfigurationService(str(tmp_path), name, None, pack='edge').write_configuration_to_file(config)
+    lathe, press = (member.split('[[outputs.mqtt]]')[1].split('# Machine state')[0] for member in (tmp_path / 'edge.conf').read_text().split('# inputs.s7comm Configuration of ')[1:])
+    assert '  data_format = "json"\n' in lathe and 'json_timestamp_units' in lathe
+    assert '  data_format = "msgpack"\n' in press and 'json_timestamp_units' not in press
+    assert '[outputs.mqtt.tagpass]\n    datalink_machine = ["press"]' in press
+
+
+def test_pack_member_aggregates_its_classes_within_the_pack(tmp_path, sample_config_dict):
+    config = _machine(sample_config_dict, 'press')
+    config['aggregations'] = [{'rateClass': 'normal', 'period': '1m', 'stats': ['max']}]
+    MachineConfigurationService(str(tmp_path), 'press', None, pack='edge').write_configuration_to_file(config)
+    pack = (tmp_path / 'edge.conf').read_text()
+    assert '[inputs.s7comm.tags]\n    datalink_machine = "press"\n    datalink_aggregation = "press.normal"\n' in pack
+    assert 'datalink_aggregation = ["press.normal"]' in pack.split('[[aggregators.basicstats]]')[1]
+    assert '[[aggregators.final]]' not in pack
+    assert 'datalink_aggregation = ["*"]' in pack.split('[[processors.dedup]]')[1]
+    assert 'tagexclude = ["datalink_machine", "datalink_aggregation"]' in pack
+
+
+def test_pack_member_is_only_rewritten_when_its_rendering_changes(tmp_path, sample_config_dict):
+    service = MachineConfigurationService(str(tmp_path), machine_name='press', couchdb_service=None, pack='edge')
+    config = _machine(sample_config_dict, 'press')
+    assert service.write_configuration_to_file(config)
+    assert not service.write_configuration_to_file(config)
+    config['mqttData']['mqttTopic'] = 'on/ot/other'
+    assert service.write_configuration_to_file(config)
+    assert 'topic = "on/ot/other"' in (tmp_path / 'edge.conf').read_text()
+
+
+def test_remove_pack_member_rewrites_pack_for_remaining_machines(tmp_path, sample_config_dict):
+    for name in ('press', 'lathe'):
+        MachineConfigurationService(str(tmp_path), name, None, pack='edge').write_configuration_to_file(_machine(sample_config_dict, name))
+    assert MachineConfigurationService(str(tmp_path), 'press', None, pack='edge').remove_pack_member() == 1
+    pack = (tmp_path / 'edge.conf').read_text()
+    assert 'alias = "lathe"' in pack
+    assert 'alias = "press"' not in pack
+    assert MachineConfigurationService(str(tmp_path), 'lathe', None, pack='edge').remove_pack_member() == 0
+
+
+def test_pack_members_record_their_tag_read_rate(tmp_path, sample_config_dict):
+    press = _machine(sample_config_dict, 'press')
+    press['plcTagData'][0]['rateClass'] = 'fast'
+    for config in (press, _machine(sample_config_dict, 'lathe')):
+        MachineConfigurationService(str(tmp_path), config['machineData']['machineName'], None, pack='edge').write_configuration_to_file(config)
+    service = MachineConfigurationService(str(tmp_path), 'press', None, pack='edge')
+    assert service.get_pack_member_weights() == {'lathe': 10.0, 'press': 19.0}
+    # A member rendered before weights were recorded counts as weightless
+    (tmp_path / 'edge.d' / 'mill.conf').write_text('[[inputs.s7comm]]\n')
+    assert service.get_pack_member_weights()['mill'] == 0.0
+
+
+def test_move_pack_member_rewrites_both_packs(tmp_path, sample_config_dict):
+    for name in ('press', 'lathe'):
+        MachineConfigurationService(str(tmp_path), name, None, pack='edge').write_configuration_to_file(_machine(sample_config_dict, name))
+    member = (tmp_path / 'edge.d' / 'press.conf').read_text()
+
+    assert MachineConfigurationService(str(tmp_path), 'press', None, pack='edge').move_pack_member('core') == 1
+
+    assert (tmp_path / 'core.d' / 'press.conf').read_text() == member
+    assert 'alias = "press"' in (tmp_path / 'core.conf').read_text()
+    assert 'alias = "press"' not in (tmp_path / 'edge.conf').read_text()
+    assert 'alias = "lathe"' in (tmp_path / 'edge.conf').read_text()
+
+
+def test_pack_name_is_reserved(tmp_path, sample_config_dict):
+    service = MachineConfigurationService(str(tmp_path), machine_name='edge', couchdb_service=None, pack='edge')
+    with pytest.raises(ValueError, match='reserved'):
+        service.write_configuration_to_file(_machine(sample_config_dict, 'edge'))
+
+
 def test_remove_log_file_silent_when_missing(tmp_path):
     service = MachineConfigurationService(
         str(tmp_path), machine_name='nope', couchdb_service=None
@@ -92,11 +537,14 @@ def test_remove_log_file_silent_when_missing(tmp_path):
 def test_remove_log_file_deletes_existing(tmp_path):
     log = tmp_path / 'machine.log'
     log.write_text('hello')
+    stats = tmp_path / 'machine.stats'
+    stats.write_text('{}')
     service = MachineConfigurationService(
         str(tmp_path), machine_name='machine', couchdb_service=None
     )
     service.remove_log_file()
     assert not log.exists()
+    assert not stats.exists()
 
 
 def test_remove_configuration_file_swallows_missing_files(tmp_path, mocker):
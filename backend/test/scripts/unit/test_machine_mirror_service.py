@@ -0,0 +1,209 @@
+"""Tests for the _changes-feed mirror of the datalink database.
+
+The feed is served by `requests_mock`; the follower thread is never started —
+`poll_once()` drives the mirror one batch at a time.
+"""
+
+from __future__ import annotations
+
+import json
+
+import pytest
+import requests
+
+from src.services.couchdb_service import CouchDBService
+from src.services.machine_mirror_service import MachineMirrorService
+
+CHANGES_URL = 'http://couchdb-test:5984/datalink/_changes'
+
+
+def _change(doc_id, rev, deleted=False, **fields):
+    doc = {'_id': doc_id, '_rev': rev, **fields}
+    if deleted:
+        doc = {'_id': doc_id, '_rev': rev, '_deleted': True}
+    change = {'seq': f'{rev}-seq', 'id': doc_id, 'changes': [{'rev': rev}], 'doc': doc}
+    if deleted:
+        change['deleted'] = True
+    return change
+
+
+@pytest.fixture
+def mirror(tmp_path):
+    couchdb_service = CouchDBService('http://couchdb-test:5984', 'admin', 'secret', 'datalink')
+    return MachineMirrorService(couchdb_service, tmp_path / 'checkpoint.json', batch_size=10)
+
+
+def test_first_poll_reads_normal_feed_from_zero(mirror, requests_mock):
+    requests_mock.get(CHANGES_URL, json={'results': [_change('m1', '1-a')], 'last_seq': '1-x'})
+    assert mirror.poll_once() == 1
+    assert requests_mock.last_request.qs['since'] == ['0']
+    assert requests_mock.last_request.qs['feed'] == ['normal']
+    assert requests_mock.last_request.qs['include_docs'] == ['true']
+    assert mirror.is_ready()
+    assert mirror.get_doc('m1')['_rev'] == '1-a'
+
+
+def test_longpoll_once_caught_up(mirror, requests_mock):
+    requests_mock.get(CHANGES_URL, json={'results': [], 'last_seq': '5-x'})
+    mirror.poll_once()
+    mirror.poll_once()
+    assert requests_mock.last_request.qs['feed'] == ['longpoll']
+    assert requests_mock.last_request.qs['since'] == ['5-x']
+
+
+def test_not_ready_while_batch_is_full(mirror, requests_mock):
+    changes = [_change(f'm{i}', '1-a') for i in range(10)]
+    requests_mock.get(CHANGES_URL, json={'results': changes, 'last_seq': '10-x'})
+    mirror.poll_once()
+    assert not mirror.is_ready()
+
+
+def test_deletion_removes_document(mirror, requests_mock):
+    requests_mock.get(
+        CHANGES_URL,
+        [
+            {'json': {'results': [_change('m1', '1-a')], 'last_seq': '1-x'}},
+            {'json': {'results': [_change('m1', '2-b', deleted=True)], 'last_seq': '2-x'}},
+        ],
+    )
+    mirror.poll_once()
+    mirror.poll_once()
+    assert mirror.get_doc('m1') is None
+    assert mirror.all_docs()['rows'] == []
+
+
+def test_all_docs_matches_couchdb_shape(mirror, requests_mock):
+    requests_mock.get(
+        CHANGES_URL,
+        json={'results': [_change('b', '1-b'), _change('a', '1-a')], 'last_seq': '2-x'},
+    )
+    mirror.poll_once()
+    result = mirror.all_docs()
+    assert result['total_rows'] == 2
+    assert [row['id'] for row in result['rows']] == ['a', 'b']
+    assert result['rows'][0] == {'id': 'a', 'key': 'a', 'value': {'rev': '1-a'}, 'doc': {'_id': 'a', '_rev': '1-a'}}
+
+
+def test_all_docs_paginates_like_couchdb(mirror, requests_mock):
+    changes = [_change(doc_id, '1-a') for doc_id in ('a', 'b', 'c')]
+    requests_mock.get(CHANGES_URL, json={'results': changes, 'last_seq': '3-x'})
+    mirror.poll_once()
+    page = mirror.all_docs(startkey='b', limit=1)
+    assert [row['id'] for row in page['rows']] == ['b']
+    assert page['next'] == 'c'
+    assert mirror.all_docs(startkey='c', limit=1)['next'] is None
+
+
+def test_expected_revision_blocks_reads_until_delivered(mirror, requests_mock):
+    requests_mock.get(
+        CHANGES_URL,
+        [
+            {'json': {'results': [_change('m1', '1-a')], 'last_seq': '1-x'}},
+            {'json': {'results': [_change('m1', '2-b')], 'last_seq': '2-x'}},
+        ],
+    )
+    mirror.poll_once()
+    mirror.expect_revision('m1', '2-b')
+    assert not mirror.is_ready('m1')
+    assert not mirror.is_ready()
+    assert mirror.is_ready('other')
+    mirror.poll_once()
+    assert mirror.is_ready('m1')
+    assert mirror.is_ready()
+
+
+def test_expected_revision_already_applied_is_ignored(mirror, requests_mock):
+    requests_mock.get(CHANGES_URL, json={'results': [_change('m1', '3-c')], 'last_seq': '3-x'})
+    mirror.poll_once()
+    mirror.expect_revision('m1', '2-b')
+    assert mirror.is_ready('m1')
+
+
+def test_checkpoint_roundtrip_resumes_from_last_seq(mirror, requests_mock, tmp_path):
+    requests_mock.get(CHANGES_URL, json={'results': [_change('m1', '1-a')], 'last_seq': '1-x'})
+    mirror.poll_once()
+    mirror.save_checkpoint()
+    assert json.loads((tmp_path / 'checkpoint.json').read_text())['last_seq'] == '1-x'
+
+    resumed = MachineMirrorService(mirror.couchdb_service, tmp_path / 'checkpoint.json')
+    assert resumed.load_checkpoint()
+    assert resumed.get_doc('m1')['_rev'] == '1-a'
+    requests_mock.get(CHANGES_URL, json={'results': [], 'last_seq': '1-x'})
+    resumed.poll_once()
+    assert requests_mock.last_request.qs['since'] == ['1-x']
+
+
+def test_snapshot_needs_a_completed_sync(mirror, requests_mock):
+    assert not mirror.has_snapshot()
+    assert mirror.snapshot_age() is None
+    changes = [_change(f'm{i}', '1-a') for i in range(10)]
+    requests_mock.get(CHANGES_URL, json={'results': changes, 'last_seq': '10-x'})
+    mirror.poll_once()
+    assert not mirror.has_snapshot()
+    requests_mock.get(CHANGES_URL, json={'results': [], 'last_seq': '10-x'})
+    mirror.poll_once()
+    assert mirror.has_snapshot()
+    assert mirror.snapshot_age() < 5
+
+
+def test_checkpoint_restores_snapshot_time(mirror, requests_mock, tmp_path):
+    requests_mock.get(CHANGES_URL, json={'results': [_change('m1', '1-a')], 'last_seq': '1-x'})
+    mirror.poll_once()
+    mirror.synced_at -= 600
+    mirror.save_checkpoint()
+
+    resumed = MachineMirrorService(None, tmp_path / 'checkpoint.json')
+    resumed.load_checkpoint()
+    assert resumed.has_snapshot()
+    assert resumed.snapshot_age() >= 600
+    # Not served as live data until the feed confirms it again
+    assert not resumed.is_ready()
+
+
+def test_lost_feed_makes_mirror_not_ready(mirror, requests_mock, mocker):
+    requests_mock.get(CHANGES_URL, json={'results': [], 'last_seq': '1-x'})
+    mirror.poll_once()
+    assert mirror.is_ready()
+    requests_mock.get(CHANGES_URL, exc=requests.exceptions.ConnectionError)
+    # One iteration of the follower loop
+    stop_event = mocker.patch.object(mirror, '_stop_event')
+    stop_event.is_set.side_effect = [False, True]
+    mirror._follow()
+    assert not mirror.is_ready()
+    assert mirror.has_snapshot()
+
+
+def test_corrupt_checkpoint_is_ignored(tmp_path):
+    (tmp_path / 'checkpoint.json').write_text('{not json')
+    mirror = MachineMirrorService(None, tmp_path / 'checkpoint.json')
+    assert not mirror.load_checkpoint()
+    assert mirror.last_seq == '0'
+
+
+def test_listeners_only_see_live_changes(mirror, requests_mock):
+    seen = []
+    mirror.add_listener(lambda doc_id, doc: seen.append((doc_id, doc and doc['_rev'])))
+    requests_mock.get(
+        CHANGES_URL,
+        [
+            {'json': {'results': [_change('m1', '1-a')], 'last_seq': '1-x'}},
+            {'json': {'results': [_change('m1', '2-b')], 'last_seq': '2-x'}},
+            {'json': {'results': [_change('m1', '3-c', deleted=True)], 'last_seq': '3-x'}},
+        ],
+    )
+    mirror.poll_once()  # initial download — no notifications
+    mirror.poll_once()
+    mirror.poll_once()
+    assert seen == [('m1', '2-b'), ('m1', None)]
+
+
+def test_failing_listener_does_not_stop_the_mirror(mirror, requests_mock):
+    mirror._bootstrapping = False
+
+    def broken(doc_id, doc):
+        raise RuntimeError('boom')
+
+    mirror.add_listener(broken)
+    requests_mock.get(CHANGES_URL, json={'results': [_change('m1', '1-a')], 'last_seq': '1-x'})
+    mirror.poll_once()
+    assert mirror.get_doc('m1')['_rev'] == '1-a'
@@ -53,6 +53,175 @@ def test_from_dict_fills_static_agent_defaults():
     assert out['mqttData']['mqttLayout'] == 'non-batch'
 
 
+def test_read_gap_is_optional_and_kept_when_set(sample_config_dict):
+    assert 'readGap' not in PlcDatalinkRFC1006Model.from_dict(sample_config_dict).to_json_dict()['machineData']
+    sample_config_dict['machineData']['readGap'] = 4
+    assert PlcDatalinkRFC1006Model.from_dict(sample_config_dict).to_json_dict()['machineData']['readGap'] == 4
+
+
+@pytest.mark.parametrize('read_gap', [-1, '4', 1.5, True])
+def test_invalid_read_gap_raises(sample_config_dict, read_gap):
+    sample_config_dict['machineData']['readGap'] = read_gap
+    with pytest.raises(ValueError, match='readGap'):
+        PlcDatalinkRFC1006Model.from_dict(sample_config_dict)
+
+
+def test_tag_addresses_are_compiled_once_on_the_model(sample_config_dict):
+    model = PlcDatalinkRFC1006Model.from_dict(sample_config_dict)
+    addresses = model.tag_addresses()
+    assert [address.start for address in addresses] == [0, 1, 2, 4, 6, 8, 12, 16, 20, 30]
+    assert addresses[0].bit == 0
+    assert addresses[-1].length == 13
+    assert model.plc_tag_data[0] == PlcDatalinkRFC1006Model.from_dict(sample_config_dict).plc_tag_data[0]
+
+
+def test_invalid_tag_addresses_raise_together(sample_config_dict):
+    sample_config_dict['plcTagData'] += [
+        {'tagAddress': 'DB1.S20', 'tagName': 'NoLength'},
+        {'tagAddress': 'DB1.X36', 'tagName': 'NoBit'},
+    ]
+    with pytest.raises(ValueError, match='2 invalid tag addresses') as error:
+        PlcDatalinkRFC1006Model.from_dict(sample_config_dict)
+    assert 'DB1.S20' in str(error.value) and 'DB1.X36' in str(error.value)
+
+
+def test_rate_class_is_optional_and_kept_when_set(sample_config_dict):
+    sample_config_dict['plcTagData'][0]['rateClass'] = 'fast'
+    out = PlcDatalinkRFC1006Model.from_dict(sample_config_dict).to_json_dict()
+    assert out['plcTagData'][0] == {'tagAddress': 'DB2000.X0.0', 'tagName': 'Bool_Value', 'rateClass': 'fast'}
+    assert 'rateClass' not in out['plcTagData'][1]
+
+
+def test_deadband_filters_are_optional_and_kept_when_set(sample_config_dict):
+    sample_config_dict['plcTagData'][7].update(deadband=0.5, maxSilence=60)
+    sample_config_dict['plcTagData'][4]['deadbandPercent'] = 2
+    sample_config_dict['plcTagData'][9]['maxSilence'] = 3600
+    out = PlcDatalinkRFC1006Model.from_dict(sample_config_dict).to_json_dict()
+    assert out['plcTagData'][7] == {
+        'tagAddress': 'DB2000.R16',
+        'tagName': 'Real_Value',
+        'deadband': 0.5,
+        'maxSilence': 60,
+    }
+    assert out['plcTagData'][4] == {'tagAddress': 'DB2000.I6', 'tagName': 'Int_Value', 'deadbandPercent': 2}
+    assert out['plcTagData'][9]['maxSilence'] == 3600
+    assert out['plcTagData'][0] == {'tagAddress': 'DB2000.X0.0', 'tagName': 'Bool_Value'}
+
+
+@pytest.mark.parametrize(
+    'index,filters,message',
+    [
+        (7, {'deadband': -1}, 'deadband of tag Real_Value must be a non-negative number'),
+        (7, {'deadbandPercent': '5'}, 'deadbandPercent of tag Real_Value must be a non-negative number'),
+        (7, {'maxSilence': True}, 'maxSilence of tag Real_Value must be a non-negative number'),
+        (7, {'maxSilence': 0}, 'maxSilence of tag Real_Value must be positive'),
+        (7, {'deadband': 1, 'deadbandPercent': 1}, 'sets both deadband and deadbandPercent'),
+        (9, {'deadband': 1}, 'String_Value of type S cannot have a deadband'),
+        (0, {'deadbandPercent': 1}, 'Bool_Value of type X cannot have a deadband'),
+    ],
+)
+def test_invalid_deadband_filters_raise(sample_config_dict, index, filters, message):
+    sample_config_dict['plcTagData'][index].update(filters)
+    with pytest.raises(ValueError, match=message):
+        PlcDatalinkRFC1006Model.from_dict(sample_config_dict)
+
+
+def test_aggregations_are_optional_and_filled_with_defaults(sample_config_dict):
+    assert 'aggregations' not in PlcDatalinkRFC1006Model.from_dict(sample_config_dict).to_json_dict()
+    sample_config_dict['aggregations'] = [
+        {'rateClass': 'fast', 'period': '10s'},
+        {'rateClass': 'normal', 'period': '1m', 'stats': ['count', 'sum'], 'dropOriginal': False},
+    ]
+    out = PlcDatalinkRFC1006Model.from_dict(sample_config_dict).to_json_dict()
+    assert out['aggregations'] == [
+        {'rateClass': 'fast', 'period': '10s', 'stats': ['min', 'max', 'mean', 'last'], 'dropOriginal': True},
+        {'rateClass': 'normal', 'period': '1m', 'stats': ['count', 'sum'], 'dropOriginal': False},
+    ]
+
+
+@pytest.mark.parametrize(
+    'aggregations,message',
+    [
+        ({'rateClass': 'fast'}, 'must be a list of objects'),
+        ([{'rateClass': 'turbo', 'period': '10s'}], 'Unknown rateClass turbo in aggregations'),
+        ([{'rateClass': 'fast', 'period': '10s'}, {'rateClass': 'fast', 'period': '1m'}], 'aggregated more than once'),
+        ([{'rateClass': 'normal', 'period': '500ms'}], 'shorter than its interval'),
+        ([{'rateClass': 'fast', 'period': 'often'}], 'Invalid duration'),
+        ([{'rateClass': 'fast', 'period': '10s', 'stats': []}], 'must list distinct statistics'),
+        ([{'rateClass': 'fast', 'period': '10s', 'stats': ['min', 'min']}], 'must list distinct statistics'),
+        ([{'rateClass': 'fast', 'period': '10s', 'stats': ['median']}], 'must list distinct statistics'),
+        ([{'rateClass': 'fast', 'period': '10s', 'dropOriginal': 'yes'}], 'dropOriginal must be a boolean'),
+        ([{'period': '10s'}], 'Missing required key'),
+    ],
+)
+def test_invalid_aggregations_raise(sample_config_dict, aggregations, message):
+    sample_config_dict['aggregations'] = aggregations
+    with pytest.raises(ValueError, match=message):
+        PlcDatalinkRFC1006Model.from_dict(sample_config_dict)
+
+
+def test_aggregated_tags_cannot_have_a_deadband(sample_config_dict):
+    sample_config_dict['plcTagData'][7].update(rateClass='fast', deadband=0.5)
+    sample_config_dict['aggregations'] = [{'rateClass': 'fast', 'period': '10s'}]
+    with pytest.raises(ValueError, match='Tag Real_Value cannot have a deadband'):
+        PlcDatalinkRFC1006Model.from_dict(sample_config_dict)
+
+
+@pytest.mark.parametrize('data_format', ['msgpack', 'influx'])
+def test_compact_mqtt_data_formats_round_trip(sample_config_dict, data_format):
+    sample_config_dict['mqttData']['mqttDataFormat'] = data_format
+    assert (
+        PlcDatalinkRFC1006Model.from_dict(sample_config_dict).to_json_dict()['mqttData']['mqttDataFormat']
+        == data_format
+    )
+
+
+def test_unknown_mqtt_data_format_is_rejected(sample_config_dict):
+    sample_config_dict['mqttData']['mqttDataFormat'] = 'protobuf'
+    with pytest.raises(ValueError, match='Unknown mqttDataFormat protobuf, expected one of json, msgpack, influx'):
+        PlcDatalinkRFC1006Model.from_dict(sample_config_dict)
+
+
+def test_mqtt_message_mode_is_only_stored_when_not_the_default(sample_config_dict):
+    assert 'mqttMessageMode' not in PlcDatalinkRFC1006Model.from_dict(sample_config_dict).to_json_dict()['mqttData']
+    sample_config_dict['mqttData']['mqttMessageMode'] = 'cycle'
+    assert (
+        PlcDatalinkRFC1006Model.from_dict(sample_config_dict).to_json_dict()['mqttData']['mqttMessageMode'] == 'cycle'
+    )
+    sample_config_dict['mqttData']['mqttMessageMode'] = 'batch'
+    with pytest.raises(ValueError, match='Unknown mqttMessageMode batch'):
+        PlcDatalinkRFC1006Model.from_dict(sample_config_dict)
+
+
+@pytest.mark.parametrize('rate_class', ['turbo', 5, ['fast']])
+def test_unknown_rate_class_raises(sample_config_dict, rate_class):
+    sample_config_dict['plcTagData'][0]['rateClass'] = rate_class
+    with pytest.raises(ValueError, match='Unknown rateClass'):
+        PlcDatalinkRFC1006Model.from_dict(sample_config_dict)
+
+
+@pytest.mark.parametrize('key,value', [('metricBatchSize', 0), ('metricBufferLimit', '5000'), ('outageTolerance', -1)])
+def test_invalid_agent_limits_raise(sample_config_dict, key, value):
+    sample_config_dict['machineData'][key] = value
+    with pytest.raises(ValueError, match=key):
+        PlcDatalinkRFC1006Model.from_dict(sample_config_dict)
+
+
+def test_invalid_flush_interval_raises(sample_config_dict):
+    sample_config_dict['agent']['flushInterval'] = 'soon'
+    with pytest.raises(ValueError, match='Invalid duration'):
+        PlcDatalinkRFC1006Model.from_dict(sample_config_dict)
+
+
+def test_agent_debug_is_only_stored_when_enabled(sample_config_dict):
+    assert 'debug' not in PlcDatalinkRFC1006Model.from_dict(sample_config_dict).to_json_dict()['agent']
+    sample_config_dict['agent']['debug'] = True
+    assert PlcDatalinkRFC1006Model.from_dict(sample_config_dict).to_json_dict()['agent']['debug'] is True
+    sample_config_dict['agent']['debug'] = 'yes'
+    with pytest.raises(ValueError, match='debug must be a boolean'):
+        PlcDatalinkRFC1006Model.from_dict(sample_config_dict)
+
+
 def test_from_dict_missing_required_key_raises(sample_config_dict):
     broken = copy.deepcopy(sample_config_dict)
     del broken['machineData']['machineName']
@@ -72,6 +241,12 @@ PLC_ADDRESS_CASES = [
     ('DB2000.R16', 'Real'),
     ('DB2000.DT20', 'DateTime'),
     ('DB2000.S30.13', 'String'),
+    ('DB2000.T22', 'Timer'),
+    ('PE0.X0.1', 'Input_Bit'),
+    ('PA0.B2', 'Output_Byte'),
+    ('MK0.DI4', 'Merker_DInt'),
+    ('C0.W3', 'Counter'),
+    ('T0.T5', 'Timer_Area'),
 ]
 
 
@@ -8,8 +8,12 @@ inside route handlers, so the module-level patch wraps every construction.
 from __future__ import annotations
 
 import json
+import re
+import time
+from urllib.parse import unquote
 
 import pytest
+import requests
 
 
 COUCHDB_BASE = 'http://couchdb-test:5984/datalink'
@@ -37,6 +41,46 @@ def test_read_all_config_404_when_couchdb_missing(client, requests_mock):
     assert response.status_code == 404
 
 
+def test_read_all_config_hides_design_documents(client, requests_mock):
+    payload = {'rows': [
+        {'id': '_design/machines', 'doc': {'_id': '_design/machines'}},
+        {'id': 'sample', 'doc': SAMPLE_DOC_RESPONSE},
+    ]}
+    requests_mock.get(f'{COUCHDB_BASE}/_all_docs', json=payload)
+    response = client.get('/config/read/all')
+    assert [row['id'] for row in response.get_json()['rows']] == ['sample']
+
+
+def test_read_all_config_paginates(client, requests_mock):
+    rows = [{'id': doc_id, 'doc': {}} for doc_id in ('a', 'b', 'c')]
+    requests_mock.get(f'{COUCHDB_BASE}/_all_docs', json={'rows': rows})
+    response = client.get('/config/read/all?limit=2&startkey=a')
+    assert response.status_code == 200
+    body = response.get_json()
+    assert [row['id'] for row in body['rows']] == ['a', 'b']
+    assert body['next'] == 'c'
+
+
+def test_read_all_config_400_on_invalid_limit(client):
+    response = client.get('/config/read/all?limit=0')
+    assert response.status_code == 400
+
+
+def test_read_all_config_streams_couchdb_rows(client, requests_mock):
+    requests_mock.get(f'{COUCHDB_BASE}/_all_docs?endkey=%22_design%2F%22', content=b'{"total_rows":2,"offset":0,"rows":[\r\n{"id":"sample"}\r\n]}')
+    requests_mock.get(f'{COUCHDB_BASE}/_all_docs?startkey=%22_design0%22', content=b'{"total_rows":2,"offset":1,"rows":[\r\n\r\n]}')
+    response = client.get('/config/read/all?stream=true')
+    assert response.status_code == 200
+    assert response.is_streamed
+    assert response.data == b'{"rows":[{"id":"sample"}\r\n]}'
+
+
+def test_read_all_config_stream_404_when_couchdb_missing(client, requests_mock):
+    requests_mock.get(f'{COUCHDB_BASE}/_all_docs', status_code=404, json={})
+    response = client.get('/config/read/all?stream=true')
+    assert response.status_code == 404
+
+
 # ─── /config/read/one ───────────────────────────────────────────────────
 
 
@@ -45,6 +89,7 @@ def test_read_one_config_returns_200(client, requests_mock):
     response = client.get('/config/read/one?machine_name=sample')
     assert response.status_code == 200
     assert response.get_json()['_id'] == 'sample'
+    assert response.headers['ETag'] == '"1-aaa"'
 
 
 def test_read_one_config_400_without_machine_name(client):
@@ -58,6 +103,256 @@ def test_read_one_config_404_when_missing(client, requests_mock):
     assert response.status_code == 404
 
 
+def test_read_one_config_is_served_from_cache_on_304(client, requests_mock):
+    requests_mock.get(
+        f'{COUCHDB_BASE}/sample',
+        [
+            {'json': SAMPLE_DOC_RESPONSE, 'headers': {'ETag': '"1-aaa"'}},
+            {'status_code': 304},
+        ],
+    )
+    client.get('/config/read/one?machine_name=sample')
+    response = client.get('/config/read/one?machine_name=sample')
+    assert response.status_code == 200
+    assert response.get_json() == SAMPLE_DOC_RESPONSE
+
+    stats = client.get('/config/cache/stats').get_json()['cache']
+    assert stats['hits'] == 1
+    assert stats['misses'] == 1
+
+
+# ─── machine mirror (changes feed) ──────────────────────────────────────
+
+
+@pytest.fixture
+def mirrored_client(app, tmp_path):
+    from flask import Flask
+
+    from src.routes import configure_routes
+    from src.services.machine_mirror_service import MachineMirrorService
+
+    mirror = MachineMirrorService(None, tmp_path / 'checkpoint.json')
+    mirror._docs = {'sample': SAMPLE_DOC_RESPONSE}
+    mirror._applied_revs = {'sample': '1-aaa'}
+    mirror._synced = True
+    flask_app = Flask(__name__)
+    flask_app.config.update(app.config)
+    configure_routes(flask_app, mirror)
+    return flask_app.test_client(), mirror
+
+
+def test_read_all_config_served_from_mirror(mirrored_client, requests_mock):
+    client, _ = mirrored_client
+    response = client.get('/config/read/all')
+    assert response.status_code == 200
+    assert response.get_json()['rows'][0]['doc'] == SAMPLE_DOC_RESPONSE
+    assert not requests_mock.called
+
+
+def test_read_one_config_served_from_mirror(mirrored_client, requests_mock):
+    client, _ = mirrored_client
+    response = client.get('/config/read/one?machine_name=sample')
+    assert response.status_code == 200
+    assert response.get_json() == SAMPLE_DOC_RESPONSE
+    assert not requests_mock.called
+
+
+def test_read_one_config_falls_back_when_mirror_lacks_doc(mirrored_client, requests_mock):
+    client, _ = mirrored_client
+    requests_mock.get(f'{COUCHDB_BASE}/other', status_code=404, json={})
+    response = client.get('/config/read/one?machine_name=other')
+    assert response.status_code == 404
+
+
+def test_update_makes_mirror_wait_for_new_revision(mirrored_client, requests_mock, sample_config_dict):
+    client, mirror = mirrored_client
+    requests_mock.get(f'{COUCHDB_BASE}/sample', json=SAMPLE_DOC_RESPONSE)
+    requests_mock.put(f'{COUCHDB_BASE}/sample', json={'ok': True, 'id': 'sample', 'rev': '2-bbb'})
+    client.put('/config/update', json=sample_config_dict)
+    assert not mirror.is_ready('sample')
+
+    requests_mock.get(f'{COUCHDB_BASE}/_all_docs', json={'rows': []})
+    assert client.get('/config/read/all').get_json() == {'rows': []}
+
+
+# ─── CouchDB unavailable: snapshot fallback ─────────────────────────────
+
+
+@pytest.fixture
+def degraded_client(mirrored_client, requests_mock, mocker):
+    """Mirror holds a two-minute-old snapshot, has lost the feed and CouchDB refuses connections."""
+    client, mirror = mirrored_client
+    mirror._feed_ok = False
+    mirror.synced_at = time.time() - 120
+    mocker.patch('src.services.couchdb_service.time.sleep')
+    requests_mock.get(re.compile(f'{re.escape(COUCHDB_BASE)}/.*'), exc=requests.exceptions.ConnectionError)
+    return client
+
+
+def test_read_one_config_served_from_snapshot_when_couchdb_down(degraded_client):
+    response = degraded_client.get('/config/read/one?machine_name=sample')
+    assert response.status_code == 200
+    assert response.get_json() == SAMPLE_DOC_RESPONSE
+    assert response.headers['Warning'] == '110 - "Response is Stale"'
+    assert 120 <= int(response.headers['Age']) < 130
+
+
+def test_read_all_config_reports_staleness_in_body(degraded_client):
+    body = degraded_client.get('/config/read/all').get_json()
+    assert body['stale'] is True
+    assert body['snapshotAge'] >= 120
+    assert [row['id'] for row in body['rows']] == ['sample']
+
+
+def test_read_one_config_503_when_not_in_snapshot(degraded_client):
+    response = degraded_client.get('/config/read/one?machine_name=other')
+    assert response.status_code == 503
+
+
+def test_machine_start_renders_from_snapshot(degraded_client, telegraf_class_mock):
+    telegraf_class_mock.return_value.get_active_telegraf_services.return_value = []
+    response = degraded_client.get('/machine/start?machine_name=sample')
+    assert response.status_code == 200
+    assert response.get_json()['stale'] is True
+    telegraf_class_mock.return_value.start_telegraf_service.assert_called_once_with(SAMPLE_DOC_RESPONSE)
+
+
+def test_circuit_opens_after_repeated_failures(degraded_client, requests_mock):
+    for _ in range(3):
+        degraded_client.get('/config/read/one?machine_name=other')
+    calls = requests_mock.call_count
+    response = degraded_client.get('/config/read/one?machine_name=sample')
+    assert response.status_code == 200
+    assert requests_mock.call_count == calls
+    assert degraded_client.get('/config/cache/stats').get_json()['circuit']['state'] == 'open'
+
+
+# ─── /config/summary ────────────────────────────────────────────────────
+
+
+def test_config_summary_serves_view_rows(client, requests_mock):
+    summary = {'machineName': 'sample', 'plcIp': '192.168.4.100', 'mqttTopic': 'on/ot/sample', 'tagCount': 10}
+    requests_mock.get(
+        f'{COUCHDB_BASE}/_design/machines/_view/summary',
+        json={'total_rows': 1, 'offset': 0, 'rows': [{'id': 'sample', 'key': 'sample', 'value': summary}]},
+    )
+    response = client.get('/config/summary')
+    assert response.status_code == 200
+    assert response.get_json()['machines'] == [summary]
+    assert requests_mock.last_request.qs == {'include_docs': ['false']}
+
+
+def test_config_summary_404_without_design_doc(client, requests_mock):
+    requests_mock.get(f'{COUCHDB_BASE}/_design/machines/_view/summary', status_code=404, json={})
+    response = client.get('/config/summary')
+    assert response.status_code == 404
+
+
+# ─── /config/query/* ────────────────────────────────────────────────────
+
+
+def test_query_by_plc_ip_uses_view_key(client, requests_mock):
+    summary = {'machineName': 'sample', 'plcIp': '10.1.2.3', 'mqttTopic': 'on/ot/sample', 'tagCount': 10}
+    requests_mock.get(
+        f'{COUCHDB_BASE}/_design/machines/_view/by_plc_ip',
+        json={'rows': [{'id': 'sample', 'key': '10.1.2.3', 'value': summary}]},
+    )
+    response = client.get('/config/query/plc?plc_ip=10.1.2.3')
+    assert response.status_code == 200
+    assert response.get_json()['machines'] == [summary]
+    assert requests_mock.last_request.qs == {'include_docs': ['false'], 'key': ['"10.1.2.3"']}
+
+
+def test_query_by_plc_ip_400_without_ip(client):
+    assert client.get('/config/query/plc').status_code == 400
+
+
+def test_query_by_broker_with_port_uses_exact_key(client, requests_mock):
+    requests_mock.get(f'{COUCHDB_BASE}/_design/machines/_view/by_mqtt_broker', json={'rows': []})
+    response = client.get('/config/query/broker?mqtt_ip=192.168.4.172&mqtt_port=1883')
+    assert response.status_code == 200
+    assert requests_mock.last_request.qs['key'] == ['["192.168.4.172", 1883]']
+
+
+def test_query_by_broker_without_port_scans_key_range(client, requests_mock):
+    requests_mock.get(f'{COUCHDB_BASE}/_design/machines/_view/by_mqtt_broker', json={'rows': []})
+    client.get('/config/query/broker?mqtt_ip=192.168.4.172')
+    qs = requests_mock.last_request.qs
+    assert qs['startkey'] == ['["192.168.4.172"]']
+    assert qs['endkey'] == ['["192.168.4.172", {}]']
+    assert 'key' not in qs
+
+
+def test_query_by_tag_address_is_case_insensitive(client, requests_mock):
+    match = {'machineName': 'sample', 'plcIp': '10.1.2.3', 'tagName': 'Dint_Value', 'tagAddress': 'DB1.DI4'}
+    requests_mock.get(
+        f'{COUCHDB_BASE}/_design/machines/_view/by_tag_address',
+        json={'rows': [{'id': 'sample', 'key': 'DB1.DI4', 'value': match}]},
+    )
+    response = client.get('/config/query/tag?tag_address=db1.di4')
+    assert response.get_json()['machines'] == [match]
+    # requests_mock lower-cases .qs and .query, so check the raw URL
+    assert unquote(requests_mock.last_request.url).endswith('key="DB1.DI4"')
+
+
+def test_query_404_without_design_doc(client, requests_mock):
+    requests_mock.get(f'{COUCHDB_BASE}/_design/machines/_view/by_plc_ip', status_code=404, json={})
+    assert client.get('/config/query/plc?plc_ip=10.1.2.3').status_code == 404
+
+
+# ─── /config/estimate ───────────────────────────────────────────────────
+
+
+def test_estimate_for_stored_configuration(client, sample_config_dict, requests_mock):
+    requests_mock.get(f'{COUCHDB_BASE}/sample', json={'_id': 'sample', '_rev': '1-aaa', **sample_config_dict})
+    response = client.get('/config/estimate?machine_name=sample')
+    assert response.status_code == 200
+    estimate = response.get_json()['estimate']
+    assert estimate['tags'] == 10
+    assert estimate['requests'] == 1
+    assert estimate['pduLength'] == 240
+    assert 0 < estimate['pduUtilisation'] < 1
+    assert estimate['cycleTimeMs'] >= 1.0
+    assert estimate['warnings'] == []
+    buffer = response.get_json()['buffer']
+    assert (buffer['metricBatchSize'], buffer['metricBufferLimit'], buffer['dropRisk']) == (100, 1000, False)
+
+
+def test_estimate_reports_drop_risk_of_small_buffer(client, sample_config_dict):
+    sample_config_dict['machineData']['metricBufferLimit'] = 20
+    response = client.post('/config/estimate', json=sample_config_dict)
+    assert response.status_code == 200
+    buffer = response.get_json()['buffer']
+    assert buffer['dropRisk'] is True
+    assert buffer['toleratedOutage'] == 1.0
+
+
+def test_estimate_for_proposed_configuration_warns_on_short_interval(client, sample_config_dict):
+    sample_config_dict['machineData']['pduSize'] = 1
+    response = client.post('/config/estimate?round_trip_ms=200', json=sample_config_dict)
+    assert response.status_code == 200
+    estimate = response.get_json()['estimate']
+    assert estimate['requests'] == 10
+    assert estimate['cycleTimeMs'] > 1000
+    assert 'shorter than the estimated read time' in estimate['warnings'][0]
+
+
+def test_estimate_400_on_invalid_tag_address(client, sample_config_dict):
+    sample_config_dict['plcTagData'].append({'tagAddress': 'DB1.S20', 'tagName': 'Broken'})
+    response = client.post('/config/estimate', json=sample_config_dict)
+    assert response.status_code == 400
+    assert 'DB1.S20' in response.get_json()['error']
+
+
+def test_estimate_400_without_machine_name(client):
+    assert client.get('/config/estimate').status_code == 400
+
+
+def test_estimate_404_when_missing(client, requests_mock):
+    requests_mock.get(f'{COUCHDB_BASE}/sample', status_code=404, json={})
+    assert client.get('/config/estimate?machine_name=sample').status_code == 404
+
+
 # ─── /config/create ─────────────────────────────────────────────────────
 
 
@@ -95,10 +390,18 @@ def test_create_config_400_on_invalid_model(client, sample_config_dict):
     assert response.status_code == 400
 
 
+def test_create_config_400_lists_invalid_tag_addresses(client, sample_config_dict, requests_mock):
+    sample_config_dict['plcTagData'].append({'tagAddress': 'DB1.S20', 'tagName': 'Broken'})
+    response = client.post('/config/create', data=json.dumps(json.dumps(sample_config_dict)), content_type='application/json')
+    assert response.status_code == 400
+    assert 'DB1.S20' in response.get_json()['error']
+    assert not requests_mock.called
+
+
 # ─── /config/update ─────────────────────────────────────────────────────
 
 
-def test_update_config_happy_path(client, requests_mock):
+def test_update_config_happy_path(client, requests_mock, sample_config_dict):
     requests_mock.get(
         f'{COUCHDB_BASE}/sample',
         json={**SAMPLE_DOC_RESPONSE, '_rev': '1-aaa'},
@@ -109,11 +412,61 @@ def test_update_config_happy_path(client, requests_mock):
     )
     response = client.put(
         '/config/update',
-        json={'machineData': {'machineName': 'sample'}},
+        json=sample_config_dict,
     )
     assert response.status_code == 200
 
 
+def test_update_config_with_body_rev_skips_the_read(client, requests_mock, sample_config_dict):
+    put = requests_mock.put(
+        f'{COUCHDB_BASE}/sample',
+        json={'ok': True, 'id': 'sample', 'rev': '2-bbb'},
+    )
+    response = client.put(
+        '/config/update',
+        json={**sample_config_dict, '_rev': '1-aaa'},
+    )
+    assert response.status_code == 200
+    assert requests_mock.call_count == 1
+    assert put.last_request.json()['_rev'] == '1-aaa'
+    assert response.headers['ETag'] == '"2-bbb"'
+    assert response.get_json()['rev'] == '2-bbb'
+
+
+def test_update_config_with_if_match_skips_the_read(client, requests_mock, sample_config_dict):
+    put = requests_mock.put(
+        f'{COUCHDB_BASE}/sample',
+        json={'ok': True, 'id': 'sample', 'rev': '2-bbb'},
+    )
+    response = client.put(
+        '/config/update',
+        json=sample_config_dict,
+        headers={'If-Match': '"1-aaa"'},
+    )
+    assert response.status_code == 200
+    assert requests_mock.call_count == 1
+    assert put.last_request.json()['_rev'] == '1-aaa'
+
+
+def test_update_config_400_on_conflicting_revisions(client, requests_mock):
+    response = client.put(
+        '/config/update',
+        json={'_rev': '1-aaa', 'machineData': {'machineName': 'sample'}},
+        headers={'If-Match': '"2-bbb"'},
+    )
+    assert response.status_code == 400
+    assert not requests_mock.called
+
+
+def test_update_config_409_on_stale_client_rev(client, requests_mock, sample_config_dict):
+    requests_mock.put(f'{COUCHDB_BASE}/sample', status_code=409, json={})
+    response = client.put(
+        '/config/update',
+        json={**sample_config_dict, '_rev': '1-old'},
+    )
+    assert response.status_code == 409
+
+
 def test_update_config_400_missing_machine_data(client):
     response = client.put('/config/update', json={'foo': 'bar'})
     assert response.status_code == 400
@@ -124,16 +477,16 @@ def test_update_config_400_missing_machine_name(client):
     assert response.status_code == 400
 
 
-def test_update_config_404_when_missing(client, requests_mock):
+def test_update_config_404_when_missing(client, requests_mock, sample_config_dict):
     requests_mock.get(f'{COUCHDB_BASE}/sample', status_code=404, json={})
     response = client.put(
         '/config/update',
-        json={'machineData': {'machineName': 'sample'}},
+        json=sample_config_dict,
     )
     assert response.status_code == 404
 
 
-def test_update_config_409_on_rev_conflict(client, requests_mock):
+def test_update_config_409_on_rev_conflict(client, requests_mock, sample_config_dict):
     requests_mock.get(
         f'{COUCHDB_BASE}/sample',
         json={**SAMPLE_DOC_RESPONSE, '_rev': '1-aaa'},
@@ -141,11 +494,19 @@ def test_update_config_409_on_rev_conflict(client, requests_mock):
     requests_mock.put(f'{COUCHDB_BASE}/sample', status_code=409, json={})
     response = client.put(
         '/config/update',
-        json={'machineData': {'machineName': 'sample'}},
+        json=sample_config_dict,
     )
     assert response.status_code == 409
 
 
+def test_update_config_400_on_malformed_tag_address(client, requests_mock, sample_config_dict):
+    sample_config_dict['plcTagData'][0]['tagAddress'] = 'DB1.S20'
+    response = client.put('/config/update', json={**sample_config_dict, '_rev': '1-aaa'})
+    assert response.status_code == 400
+    assert 'DB1.S20' in response.get_json()['error']
+    assert not requests_mock.called
+
+
 # ─── /config/remove ─────────────────────────────────────────────────────
 
 
@@ -197,6 +558,116 @@ def test_remove_config_404_when_missing(
     assert response.status_code == 404
 
 
+# ─── /config/bulk/* ─────────────────────────────────────────────────────
+
+
+def _named_config(sample_config_dict, name):
+    config = json.loads(json.dumps(sample_config_dict))
+    config['machineData']['machineName'] = name
+    return config
+
+
+def test_bulk_create_writes_all_documents(client, sample_config_dict, requests_mock):
+    requests_mock.post(
+        f'{COUCHDB_BASE}/_bulk_docs',
+        json=[
+            {'ok': True, 'id': 'm1', 'rev': '1-a'},
+            {'id': 'm2', 'error': 'conflict', 'reason': 'Document update conflict.'},
+        ],
+    )
+    body = [_named_config(sample_config_dict, 'm1'), _named_config(sample_config_dict, 'm2')]
+    response = client.post('/config/bulk/create', json=body)
+    assert response.status_code == 200
+    assert response.get_json()['message'] == '1 of 2 configurations created'
+    sent = requests_mock.last_request.json()['docs']
+    assert [doc['_id'] for doc in sent] == ['m1', 'm2']
+
+
+def test_bulk_create_rejects_whole_batch_on_invalid_document(client, sample_config_dict, requests_mock):
+    broken = _named_config(sample_config_dict, 'm2')
+    del broken['mqttData']['mqttIp']
+    body = [_named_config(sample_config_dict, 'm1'), broken, _named_config(sample_config_dict, 'm1')]
+    response = client.post('/config/bulk/create', json=body)
+    assert response.status_code == 400
+    errors = response.get_json()['results']
+    assert [(e['index'], e['id']) for e in errors] == [(1, 'm2'), (2, 'm1')]
+    assert not requests_mock.called
+
+
+def test_bulk_create_400_on_empty_body(client):
+    response = client.post('/config/bulk/create', json=[])
+    assert response.status_code == 400
+
+
+def test_bulk_update_uses_client_rev_and_looks_up_the_rest(client, sample_config_dict, requests_mock):
+    requests_mock.post(
+        f'{COUCHDB_BASE}/_all_docs',
+        json={'rows': [
+            {'id': 'm2', 'key': 'm2', 'value': {'rev': '3-c'}},
+            {'key': 'm3', 'error': 'not_found'},
+        ]},
+    )
+    bulk = requests_mock.post(
+        f'{COUCHDB_BASE}/_bulk_docs',
+        json=[{'ok': True, 'id': 'm1', 'rev': '2-a'}, {'ok': True, 'id': 'm2', 'rev': '4-c'}],
+    )
+    m1 = {**_named_config(sample_config_dict, 'm1'), '_rev': '1-a'}
+    body = [m1, _named_config(sample_config_dict, 'm2'), _named_config(sample_config_dict, 'm3')]
+    response = client.put('/config/bulk/update', json=body)
+    assert response.status_code == 200
+    results = response.get_json()['results']
+    assert [r.get('ok', r.get('error')) for r in results] == [True, True, 'not_found']
+    assert [(d['_id'], d['_rev']) for d in bulk.last_request.json()['docs']] == [('m1', '1-a'), ('m2', '3-c')]
+
+
+def test_bulk_remove_skips_running_and_missing(client, telegraf_class_mock, machine_config_class_mock, requests_mock):
+    telegraf_class_mock.return_value.get_active_telegraf_services.return_value = [
+        {'machine_name': 'running', 'process': '1'}
+    ]
+    requests_mock.post(
+        f'{COUCHDB_BASE}/_all_docs',
+        json={'rows': [
+            {'id': 'm1', 'key': 'm1', 'value': {'rev': '1-a'}},
+            {'id': 'running', 'key': 'running', 'value': {'rev': '1-r'}},
+            {'key': 'gone', 'error': 'not_found'},
+        ]},
+    )
+    bulk = requests_mock.post(f'{COUCHDB_BASE}/_bulk_docs', json=[{'ok': True, 'id': 'm1', 'rev': '2-a'}])
+    response = client.post('/config/bulk/remove', json={'machineNames': ['m1', 'running', 'gone']})
+    assert response.status_code == 200
+    results = response.get_json()['results']
+    assert [r.get('ok', r.get('error')) for r in results] == [True, 'conflict', 'not_found']
+    assert bulk.last_request.json() == {'docs': [{'_id': 'm1', '_rev': '1-a', '_deleted': True}]}
+    machine_config_class_mock.return_value.remove_log_file.assert_called_once()
+
+
+def test_bulk_read_exports_requested_configurations(client, requests_mock):
+    requests_mock.post(
+        f'{COUCHDB_BASE}/_bulk_get',
+        json={'results': [
+            {'id': 'sample', 'docs': [{'ok': SAMPLE_DOC_RESPONSE}]},
+            {'id': 'x', 'docs': [{'error': {'id': 'x', 'error': 'not_found', 'reason': 'missing'}}]},
+        ]},
+    )
+    response = client.post('/config/bulk/read', json={'machineNames': ['sample', 'x']})
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['configurations'] == [SAMPLE_DOC_RESPONSE]
+    assert body['errors'] == [{'id': 'x', 'error': 'not_found', 'reason': 'missing'}]
+
+
+def test_bulk_read_without_names_exports_everything_but_design_docs(client, requests_mock):
+    requests_mock.get(
+        f'{COUCHDB_BASE}/_all_docs',
+        json={'rows': [
+            {'id': '_design/machines', 'doc': {'_id': '_design/machines'}},
+            {'id': 'sample', 'doc': SAMPLE_DOC_RESPONSE},
+        ]},
+    )
+    response = client.post('/config/bulk/read', json={})
+    assert response.get_json()['configurations'] == [SAMPLE_DOC_RESPONSE]
+
+
 # ─── /machine/start  /machine/stop ──────────────────────────────────────
 
 
@@ -208,7 +679,7 @@ def test_machine_start_happy_path(client, telegraf_class_mock, requests_mock):
     telegraf_class_mock.return_value.start_telegraf_service.assert_called_once()
 
 
-def test_machine_start_restarts_if_already_running(
+def test_machine_start_leaves_running_service_to_start(
     client, telegraf_class_mock, requests_mock
 ):
     telegraf_class_mock.return_value.get_active_telegraf_services.return_value = [
@@ -217,8 +688,57 @@ def test_machine_start_restarts_if_already_running(
     requests_mock.get(f'{COUCHDB_BASE}/sample', json=SAMPLE_DOC_RESPONSE)
     response = client.get('/machine/start?machine_name=sample')
     assert response.status_code == 200
-    telegraf_class_mock.return_value.stop_telegraf_service.assert_called_once()
-    telegraf_class_mock.return_value.start_telegraf_service.assert_called_once()
+    # No stop first: that would delete the config and always force a restart
+    telegraf_class_mock.return_value.stop_telegraf_service.assert_not_called()
+    telegraf_class_mock.return_value.start_telegraf_service.assert_called_once_with(SAMPLE_DOC_RESPONSE)
+
+
+def test_machine_start_400_on_invalid_stored_configuration(client, telegraf_class_mock, requests_mock):
+    telegraf_class_mock.return_value.start_telegraf_service.side_effect = ValueError('1 invalid tag address: DB1.S20')
+    requests_mock.get(f'{COUCHDB_BASE}/sample', json=SAMPLE_DOC_RESPONSE)
+    response = client.get('/machine/start?machine_name=sample')
+    assert response.status_code == 400
+    assert 'DB1.S20' in response.get_json()['error']
+
+
+def test_machine_start_reports_unchanged_configuration(client, telegraf_class_mock, requests_mock):
+    telegraf_class_mock.return_value.start_telegraf_service.return_value = 'unchanged'
+    requests_mock.get(f'{COUCHDB_BASE}/sample', json=SAMPLE_DOC_RESPONSE)
+    response = client.get('/machine/start?machine_name=sample')
+    assert response.status_code == 200
+    assert 'identical configuration' in response.get_json()['message']
+
+
+def test_machine_start_reports_in_place_reload(client, telegraf_class_mock, requests_mock):
+    telegraf_class_mock.return_value.start_telegraf_service.return_value = 'reloaded'
+    requests_mock.get(f'{COUCHDB_BASE}/sample', json=SAMPLE_DOC_RESPONSE)
+    response = client.get('/machine/start?machine_name=sample')
+    assert response.get_json()['message'] == 'Telegraf service reloaded its configuration successfully'
+
+
+def test_machine_start_500_when_telegraf_does_not_start(client, telegraf_class_mock, requests_mock):
+    telegraf_class_mock.return_value.start_telegraf_service.side_effect = RuntimeError(
+        'Failed to start Telegraf for /etc/telegraf/telegraf.d/sample.conf: supervisor has no program sample')
+    requests_mock.get(f'{COUCHDB_BASE}/sample', json=SAMPLE_DOC_RESPONSE)
+    response = client.get('/machine/start?machine_name=sample')
+    assert response.status_code == 500
+    assert 'supervisor has no program sample' in response.get_json()['error']
+
+
+def test_machine_start_runs_machine_in_configured_pack(app, client, telegraf_class_mock, requests_mock):
+    app.config['TELEGRAF_PACK'] = 'edge'
+    requests_mock.get(f'{COUCHDB_BASE}/sample', json=SAMPLE_DOC_RESPONSE)
+    response = client.get('/machine/start?machine_name=sample')
+    assert response.status_code == 200
+    assert telegraf_class_mock.call_args.kwargs['pack'] == 'edge'
+
+
+def test_machine_start_spreads_machines_over_configured_workers(app, client, telegraf_class_mock, requests_mock):
+    app.config['TELEGRAF_WORKERS'] = 4
+    requests_mock.get(f'{COUCHDB_BASE}/sample', json=SAMPLE_DOC_RESPONSE)
+    response = client.get('/machine/start?machine_name=sample')
+    assert response.status_code == 200
+    assert telegraf_class_mock.call_args.kwargs['workers'] == 4
 
 
 def test_machine_start_400_without_machine_name(client):
@@ -0,0 +1,94 @@
+import pytest
+
+from src.services.s7_read_planner import count_pdus, estimate_cycle, plan_reads
+
+
+def _tags(*addresses):
+    return [{'tagAddress': address, 'tagName': f'Tag{i}'} for i, address in enumerate(addresses)]
+
+
+def test_adjacent_and_overlapping_tags_share_a_range():
+    plan = plan_reads(_tags('DB1.R4', 'DB1.I0', 'DB1.X2.0', 'DB1.X2.1', 'DB1.B3', 'DB1.DI8'), batch_size=10)
+    assert [(r.db, r.start, r.end) for r in plan.ranges] == [(1, 0, 12)]
+    assert [tag['tagAddress'] for tag in plan.ranges[0].tags] == [
+        'DB1.I0',
+        'DB1.X2.0',
+        'DB1.X2.1',
+        'DB1.B3',
+        'DB1.R4',
+        'DB1.DI8',
+    ]
+
+
+def test_gap_and_db_boundaries_split_ranges():
+    tags = _tags('DB1.I0', 'DB1.I6', 'DB2.I2')
+    assert [r.label for r in plan_reads(tags, batch_size=10).ranges] == ['DB1.B0-1', 'DB1.B6-7', 'DB2.B2-3']
+    assert [r.label for r in plan_reads(tags, batch_size=10, max_gap=4).ranges] == ['DB1.B0-7', 'DB2.B2-3']
+
+
+def test_ranges_fit_into_one_response_pdu():
+    tags = _tags(*(f'DB1.R{4 * i}' for i in range(100)))
+    plan = plan_reads(tags, batch_size=10, pdu_length=240)
+    assert max(r.size for r in plan.ranges) <= 240 - 18
+    assert sum(len(r.tags) for r in plan.ranges) == 100
+
+
+def test_negative_gap_is_rejected():
+    with pytest.raises(ValueError):
+        plan_reads(_tags('DB1.I0'), batch_size=10, max_gap=-1)
+
+
+def test_count_pdus_respects_item_and_byte_limits():
+    assert count_pdus([], max_items=10) == 0
+    assert count_pdus([2] * 25, max_items=10) == 3
+    # 18 items of 12 request bytes each fill a 240 byte request PDU
+    assert count_pdus([2] * 25, max_items=20, pdu_length=240) == 2
+    assert count_pdus([100, 100, 100], max_items=20, pdu_length=240) == 2
+
+
+def test_report_counts_one_item_per_tag_as_rendered(sample_config_dict):
+    report = plan_reads(sample_config_dict['plcTagData'], batch_size=5, max_gap=2).report()
+    # One range is one metric, but its 10 fields are still 10 items in 2 requests
+    assert report == {'ranges': 1, 'bytes': 45, 'items': 10, 'pdus': 2}
+
+
+def test_estimate_cycle_counts_wire_bytes_and_utilisation(sample_config_dict):
+    estimate = estimate_cycle(sample_config_dict)
+    assert (estimate.tags, estimate.requests) == (10, 1)
+    assert estimate.request_bytes == 12 + 10 * 12
+    assert estimate.response_bytes == 14 + 10 * 4 + 46
+    assert estimate.wire_bytes == estimate.request_bytes + estimate.response_bytes + 2 * 65
+    assert estimate.pdu_utilisation == pytest.approx(100 / 240)
+    assert estimate.warnings == []
+
+
+def test_estimate_cycle_flags_oversized_tags_and_batches(sample_config_dict):
+    sample_config_dict['machineData']['pduSize'] = 40
+    sample_config_dict['plcTagData'].append({'tagAddress': 'DB1.S0.250', 'tagName': 'Long'})
+    warnings = estimate_cycle(sample_config_dict).warnings
+    assert any('exceeds the 20 items' in warning for warning in warnings)
+    assert any('Long (252 bytes)' in warning for warning in warnings)
+
+
+def test_estimate_cycle_rejects_pdu_below_minimum(sample_config_dict):
+    with pytest.raises(ValueError):
+        estimate_cycle(sample_config_dict, pdu_length=100)
+
+
+def test_estimate_cycle_estimates_each_rate_class_at_its_interval(sample_config_dict):
+    for tag in sample_config_dict['plcTagData'][:4]:
+        tag['rateClass'] = 'fast'
+    sample_config_dict['plcTagData'][9]['rateClass'] = 'static'
+    estimate = estimate_cycle(sample_config_dict, round_trip_ms=50)
+    assert [(i['rateClass'], i['intervalMs'], i['tags'], i['requests']) for i in estimate.inputs] == [
+        ('fast', 100, 4, 1),
+        ('normal', 1000, 5, 1),
+        ('static', 60000, 1, 1),
+    ]
+    assert estimate.requests == 3
+    assert estimate.requests_per_second == pytest.approx(10 + 1 + 1 / 60)
+    assert estimate.warnings == []
+
+    estimate = estimate_cycle(sample_config_dict, round_trip_ms=150)
+    assert len(estimate.warnings) == 1
+    assert estimate.warnings[0].startswith('Interval of 100ms (fast) is shorter than the estimated read time')
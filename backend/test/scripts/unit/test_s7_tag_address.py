@@ -0,0 +1,77 @@
+import pytest
+
+from src.s7_tag_address import S7Address, compile_tag_addresses, format_address_errors, parse_tag_address
+
+
+@pytest.mark.parametrize(
+    'address,expected',
+    [
+        ('DB2000.X0.3', S7Address('DB', 2000, 'X', 0, 1, bit=3)),
+        ('DB2000.B1', S7Address('DB', 2000, 'B', 1, 1)),
+        ('DB2000.C2', S7Address('DB', 2000, 'C', 2, 1)),
+        ('DB2000.W4', S7Address('DB', 2000, 'W', 4, 2)),
+        ('DB2000.I6', S7Address('DB', 2000, 'I', 6, 2)),
+        ('DB2000.DW8', S7Address('DB', 2000, 'DW', 8, 4)),
+        ('DB2000.DI12', S7Address('DB', 2000, 'DI', 12, 4)),
+        ('DB2000.R16', S7Address('DB', 2000, 'R', 16, 4)),
+        ('DB2000.DT20', S7Address('DB', 2000, 'DT', 20, 8)),
+        ('DB2000.S30.13', S7Address('DB', 2000, 'S', 30, 15, length=13)),
+        ('DB2000.T22', S7Address('DB', 2000, 'T', 22, 2)),
+        # Areas other than data blocks, with the number Telegraf expects but ignores
+        ('PE0.X0.1', S7Address('PE', 0, 'X', 0, 1, bit=1)),
+        ('PA0.B2', S7Address('PA', 0, 'B', 2, 1)),
+        ('MK0.R10', S7Address('MK', 0, 'R', 10, 4)),
+        ('MK0.S20.8', S7Address('MK', 0, 'S', 20, 10, length=8)),
+        ('C0.W3', S7Address('C', 0, 'W', 3, 2)),
+        ('T0.T5', S7Address('T', 0, 'T', 5, 2)),
+    ],
+)
+def test_parse_tag_address(address, expected):
+    assert parse_tag_address(address) == expected
+
+
+@pytest.mark.parametrize(
+    'address',
+    [
+        '',
+        'DB1',
+        'DB1.Q0',
+        'DB1.X0',
+        'DB1.X0.8',
+        'DB1.S0',
+        'DB1.S20',
+        'DB1.S0.255',
+        'DB1.R4.1',
+        'M1.B0',
+        'MK.B0',
+        'PE0.X0',
+        'T0.T5.1',
+        'db1.i0',
+        None,
+        42,
+    ],
+)
+def test_parse_tag_address_rejects_invalid(address):
+    with pytest.raises(ValueError):
+        parse_tag_address(address)
+
+
+def test_compile_tag_addresses_reports_every_invalid_address():
+    addresses = ['DB1.I0', 'DB1.S20', 'DB1.R4', 'DB1.X0', ['DB1.I0']]
+    compiled, errors = compile_tag_addresses(addresses)
+    assert compiled[0].end == 2
+    assert compiled[1] is None and compiled[3] is None and compiled[4] is None
+    assert [error['index'] for error in errors] == [1, 3, 4]
+    assert errors[0]['tagAddress'] == 'DB1.S20'
+
+
+def test_compiled_addresses_are_shared():
+    assert parse_tag_address('DB7.DI4') is parse_tag_address('DB7.DI4')
+
+
+def test_format_address_errors_summarizes_long_lists():
+    _, errors = compile_tag_addresses([f'DB1.X{i}' for i in range(12)])
+    message = format_address_errors(errors)
+    assert message.startswith('12 invalid tag addresses: ')
+    assert 'DB1.X9' in message and 'DB1.X10' not in message
+    assert message.endswith('and 2 more')
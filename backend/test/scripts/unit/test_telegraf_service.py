@@ -5,9 +5,13 @@ or supervisorctl on the host running pytest.
 """
 from __future__ import annotations
 
+import json
 import os
 import signal
 import subprocess
+import threading
+import time
+from pathlib import Path
 from types import SimpleNamespace
 
 import pytest
@@ -22,6 +26,30 @@ def _make_service(tmp_path, machine_name='m1', couchdb_service=None):
     )
 
 
+ENTRYPOINT = ['/app/backend-entrypoint.sh']
+
+
+def _mock_supervisor(mocker, tmp_path, pgrep=lambda conf_path: ''):
+    """Stand in for subprocess.run: pgrep answers pgrep(conf_path), the entrypoint adds a supervisor program per config."""
+    supervisor_folder = tmp_path / 'supervisor'
+    supervisor_folder.mkdir(exist_ok=True)
+    mocker.patch.object(TelegrafService, 'SUPERVISOR_CONF_FOLDER', supervisor_folder)
+
+    def run(cmd, **kwargs):
+        if cmd[0] == 'pgrep':
+            return SimpleNamespace(stdout=pgrep(cmd[-1]))
+        if cmd == ENTRYPOINT:
+            for conf_path in tmp_path.glob('*.conf'):
+                (supervisor_folder / conf_path.name).touch()
+        return SimpleNamespace(stdout='')
+
+    return mocker.patch.object(subprocess, 'run', side_effect=run)
+
+
+def _entrypoint_runs(mock_run):
+    return sum(1 for c in mock_run.call_args_list if c.args[0] == ENTRYPOINT)
+
+
 def test_get_active_telegraf_services_parses_ps_output(mocker, tmp_path):
     fake_ps_output = (
         'root  123  0.0 0.0 telegraf --config /etc/telegraf/telegraf.d/m1.conf --watch-config x\n'
@@ -64,6 +92,34 @@ def test_get_logged_machines_lists_log_files(tmp_path):
     assert result == ['a.log', 'b.log']
 
 
+def _make_pack(tmp_path, pack, machines):
+    (tmp_path / f'{pack}.conf').write_text('')
+    (tmp_path / f'{pack}.d').mkdir()
+    for machine in machines:
+        (tmp_path / f'{pack}.d' / f'{machine}.conf').write_text('')
+
+
+def test_get_active_telegraf_services_lists_every_machine_of_a_pack(mocker, tmp_path):
+    _make_pack(tmp_path, 'edge', ['press', 'lathe'])
+    fake_ps_output = (
+        f'root  123  0.0 0.0 telegraf --config {tmp_path}/edge.conf --watch-config {tmp_path}/edge.conf\n'
+        f'root  456  0.0 0.0 telegraf --config {tmp_path}/m1.conf\n'
+    )
+    mocker.patch.object(subprocess, 'run', return_value=SimpleNamespace(stdout=fake_ps_output))
+    result = _make_service(tmp_path).get_active_telegraf_services()
+    assert result == [
+        {'machine_name': 'lathe', 'process': '123', 'pack': 'edge'},
+        {'machine_name': 'press', 'process': '123', 'pack': 'edge'},
+        {'machine_name': 'm1', 'process': '456'},
+    ]
+
+
+def test_get_configured_machines_lists_machines_of_a_pack(tmp_path):
+    _make_pack(tmp_path, 'edge', ['press', 'lathe'])
+    (tmp_path / 'm1.conf').write_text('')
+    assert sorted(_make_service(tmp_path).get_configured_machines()) == ['lathe.conf', 'm1.conf', 'press.conf']
+
+
 def test_get_current_telegraf_state_returns_idle_when_no_log(tmp_path):
     service = _make_service(tmp_path, machine_name='nolog')
     state = service.get_current_telegraf_state()
@@ -91,6 +147,57 @@ def test_get_current_telegraf_state_detects_disconnect(tmp_path):
     assert state['last_disconnect'] == '2026-05-15T10:00:10'
 
 
+def _write_stats(tmp_path, samples, machine_name='m1'):
+    """Write internal_gather samples (timestamp ms, metrics_gathered, errors) as Telegraf's json file output does."""
+    (tmp_path / f'{machine_name}.stats').write_text(''.join(
+        json.dumps({
+            'fields': {'errors': errors, 'gather_time_ns': 1200000, 'metrics_gathered': gathered},
+            'name': 'internal_gather',
+            'tags': {'host': 'PLC Datalink RFC1006', 'input': 's7comm', 'version': '1.32.0'},
+            'timestamp': timestamp,
+        }) + '\n'
+        for timestamp, gathered, errors in samples
+    ))
+
+
+def test_get_current_telegraf_state_reads_stats_instead_of_log(tmp_path):
+    now = int(time.time()) * 1000
+    _write_stats(tmp_path, [(now - 2000, 10, 0), (now - 1000, 20, 0), (now, 30, 0)])
+    (tmp_path / 'm1.log').write_text('2026-05-15T10:00:10 I! [agent] Stopping running outputs\n')
+    service = _make_service(tmp_path, machine_name='m1')
+    state = service.get_current_telegraf_state()
+    assert state['active_connection'] is True
+    assert state['last_update'] == time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(now / 1000))
+    assert state['last_disconnect'] is None
+
+
+def test_get_current_telegraf_state_detects_gather_errors_in_stats(tmp_path):
+    now = int(time.time()) * 1000
+    _write_stats(tmp_path, [(now - 2000, 10, 0), (now - 1000, 20, 0), (now, 20, 1)])
+    service = _make_service(tmp_path, machine_name='m1')
+    state = service.get_current_telegraf_state()
+    assert state['active_connection'] is False
+    assert state['last_disconnect'] == time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(now / 1000))
+
+
+def test_get_current_telegraf_state_treats_stale_stats_as_stopped(tmp_path):
+    before = (int(time.time()) - 3600) * 1000
+    _write_stats(tmp_path, [(before - 1000, 10, 0), (before, 20, 0)])
+    service = _make_service(tmp_path, machine_name='m1')
+    state = service.get_current_telegraf_state()
+    assert state['active_connection'] is False
+    assert state['last_disconnect'] == time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(before / 1000))
+
+
+def test_get_current_telegraf_state_skips_partial_stats_line(tmp_path):
+    now = int(time.time()) * 1000
+    _write_stats(tmp_path, [(now, 5, 0)])
+    with open(tmp_path / 'm1.stats', 'a') as stats:
+        stats.write('{"fields":{"errors":0,')
+    service = _make_service(tmp_path, machine_name='m1')
+    assert service.get_current_telegraf_state()['active_connection'] is True
+
+
 def test_stop_telegraf_service_terminates_existing(mocker, tmp_path):
     mocker.patch.object(
         ts_module,
@@ -130,15 +237,306 @@ def test_start_telegraf_service_writes_config_and_starts_process(mocker, tmp_pat
         'MachineConfigurationService',
         autospec=True,
     )
-    mocker.patch.object(
-        subprocess, 'run', return_value=SimpleNamespace(stdout='')
-    )
-    mock_popen = mocker.patch.object(
-        subprocess, 'Popen', return_value=SimpleNamespace(pid=1234)
-    )
+    mock_config_cls.return_value.write_configuration_to_file.side_effect = lambda *args: (tmp_path / 'm1.conf').touch()
+    mock_run = _mock_supervisor(mocker, tmp_path)
 
     service = _make_service(tmp_path, machine_name='m1')
-    service.start_telegraf_service()
+    assert service.start_telegraf_service() == 'started'
 
     mock_config_cls.return_value.write_configuration_to_file.assert_called_once()
-    mock_popen.assert_called_once_with(['/app/backend-entrypoint.sh'])
+    assert _entrypoint_runs(mock_run) == 1
+    assert (tmp_path / 'supervisor' / 'm1.conf').is_file()
+
+
+def test_start_telegraf_service_starts_unchanged_config_without_process(mocker, tmp_path):
+    (tmp_path / 'm1.conf').touch()
+    mock_config_cls = mocker.patch.object(ts_module, 'MachineConfigurationService', autospec=True)
+    mock_config_cls.return_value.write_configuration_to_file.return_value = False
+    mock_run = _mock_supervisor(mocker, tmp_path)
+    # The program of a Telegraf that exited cleanly is still registered, but supervisor does not restart it
+    (tmp_path / 'supervisor' / 'm1.conf').touch()
+
+    assert _make_service(tmp_path, machine_name='m1').start_telegraf_service() == 'started'
+
+    commands = [c.args[0] for c in mock_run.call_args_list if c.args[0][0] != 'pgrep']
+    assert commands == [['supervisorctl', 'reread'], ['supervisorctl', 'update'], ENTRYPOINT]
+    assert (tmp_path / 'supervisor' / 'm1.conf').is_file()
+
+
+def test_start_telegraf_service_reports_failed_start(mocker, tmp_path):
+    mock_config_cls = mocker.patch.object(ts_module, 'MachineConfigurationService', autospec=True)
+    mock_config_cls.return_value.write_configuration_to_file.return_value = False
+    mock_run = _mock_supervisor(mocker, tmp_path)
+    mock_run.side_effect = lambda cmd, **kwargs: SimpleNamespace(stdout='')
+
+    with pytest.raises(RuntimeError, match='supervisor has no program m1'):
+        _make_service(tmp_path, machine_name='m1').start_telegraf_service()
+
+    def entrypoint_fails(cmd, **kwargs):
+        if cmd == ENTRYPOINT:
+            raise subprocess.CalledProcessError(1, cmd)
+        return SimpleNamespace(stdout='')
+
+    mock_run.side_effect = entrypoint_fails
+    with pytest.raises(RuntimeError, match='Failed to start Telegraf'):
+        _make_service(tmp_path, machine_name='m1').start_telegraf_service()
+
+
+def _make_pack_service(tmp_path, machine_name):
+    return TelegrafService(str(tmp_path), machine_name=machine_name, couchdb_service=None, pack='edge')
+
+
+def test_stop_telegraf_service_keeps_pack_running_for_other_machines(mocker, tmp_path):
+    mock_config_cls = mocker.patch.object(ts_module, 'MachineConfigurationService', autospec=True)
+    mock_config_cls.return_value.remove_pack_member.return_value = 1
+    mock_config_cls.return_value.get_pack_members.return_value = ['press']
+    mock_run = mocker.patch.object(subprocess, 'run', return_value=SimpleNamespace(stdout='4242\n'))
+    mock_kill = mocker.patch.object(os, 'kill')
+    reload = mocker.patch.object(TelegrafService, '_reload_telegraf_process', return_value=True)
+
+    _make_pack_service(tmp_path, 'press').stop_telegraf_service()
+
+    assert mock_config_cls.call_args.args[1] == 'press'
+    assert mock_run.call_args.args[0] == ['pgrep', '-f', f'telegraf --config {tmp_path}/edge.conf']
+    reload.assert_called_once_with(4242, 0)
+    mock_kill.assert_not_called()
+    mock_config_cls.return_value.remove_configuration_file.assert_not_called()
+
+
+def test_stop_telegraf_service_stops_pack_with_its_last_machine(mocker, tmp_path):
+    mock_config_cls = mocker.patch.object(ts_module, 'MachineConfigurationService', autospec=True)
+    mock_config_cls.return_value.remove_pack_member.return_value = 0
+    mock_config_cls.return_value.get_pack_members.return_value = ['press']
+    mocker.patch.object(subprocess, 'run', return_value=SimpleNamespace(stdout='4242\n'))
+    mock_kill = mocker.patch.object(os, 'kill')
+
+    _make_pack_service(tmp_path, 'press').stop_telegraf_service()
+
+    mock_kill.assert_called_once_with(4242, signal.SIGTERM)
+    # The pack's own configuration and supervisor entry are removed
+    assert mock_config_cls.call_args.args[1] == 'edge'
+    mock_config_cls.return_value.remove_configuration_file.assert_called_once()
+
+
+def test_stop_telegraf_service_stops_machine_running_outside_the_pack(mocker, tmp_path):
+    (tmp_path / 'm1.conf').write_text('')
+    mock_config_cls = mocker.patch.object(ts_module, 'MachineConfigurationService', autospec=True)
+    mock_config_cls.return_value.get_pack_members.return_value = ['other']
+    _mock_supervisor(mocker, tmp_path, pgrep=lambda conf_path: {'m1.conf': '1111\n', 'edge.conf': '4242\n'}[Path(conf_path).name])
+    mock_kill = mocker.patch.object(os, 'kill')
+    reload = mocker.patch.object(TelegrafService, '_reload_telegraf_process')
+
+    _make_pack_service(tmp_path, 'm1').stop_telegraf_service()
+
+    mock_kill.assert_called_once_with(1111, signal.SIGTERM)
+    # The machine's own configuration and supervisor program go, the unrelated pack is left alone
+    assert mock_config_cls.call_args_list[0].args[1] == 'm1' and 'pack' not in mock_config_cls.call_args_list[0].kwargs
+    mock_config_cls.return_value.remove_configuration_file.assert_called_once()
+    mock_config_cls.return_value.remove_pack_member.assert_not_called()
+    reload.assert_not_called()
+
+
+def test_start_telegraf_service_moves_machine_into_pack(mocker, tmp_path):
+    (tmp_path / 'press.conf').write_text('')
+    mock_config_cls = mocker.patch.object(ts_module, 'MachineConfigurationService', autospec=True)
+    mock_config_cls.return_value.write_configuration_to_file.return_value = True
+
+    # Only the machine's own process runs, the pack is not started yet
+    mock_config_cls.return_value.write_configuration_to_file.side_effect = lambda *args: (tmp_path / 'edge.conf').touch()
+    mock_run = _mock_supervisor(mocker, tmp_path, pgrep=lambda conf_path: '1111\n' if conf_path.endswith('press.conf') else '')
+    mock_kill = mocker.patch.object(os, 'kill')
+
+    assert _make_pack_service(tmp_path, 'press').start_telegraf_service() == 'started'
+
+    mock_kill.assert_called_once_with(1111, signal.SIGTERM)
+    mock_config_cls.return_value.remove_configuration_file.assert_called_once()
+    assert mock_config_cls.call_args_list[0].kwargs['pack'] == 'edge'
+    assert _entrypoint_runs(mock_run) == 1
+
+
+def _start_in_pool(tmp_path, sample_config_dict, name, workers=2, tags=10):
+    config = json.loads(json.dumps(sample_config_dict))
+    config['machineData']['machineName'] = name
+    config['plcTagData'] = config['plcTagData'][:tags]
+    return TelegrafService(str(tmp_path), machine_name=name, couchdb_service=None, workers=workers).start_telegraf_service(config)
+
+
+def test_start_telegraf_service_assigns_new_machines_to_the_least_loaded_worker(mocker, tmp_path, sample_config_dict):
+    mock_run = _mock_supervisor(mocker, tmp_path)
+
+    assert _start_in_pool(tmp_path, sample_config_dict, 'press', tags=10) == 'started'
+    assert _start_in_pool(tmp_path, sample_config_dict, 'lathe', tags=4) == 'started'
+    assert _start_in_pool(tmp_path, sample_config_dict, 'mill', tags=4) == 'started'
+
+    assert sorted(p.name for p in (tmp_path / 'telegraf-worker-0.d').iterdir()) == ['press.conf']
+    assert sorted(p.name for p in (tmp_path / 'telegraf-worker-1.d').iterdir()) == ['lathe.conf', 'mill.conf']
+    assert TelegrafService(str(tmp_path), machine_name='mill', couchdb_service=None, workers=2).pack == 'telegraf-worker-1'
+    assert _entrypoint_runs(mock_run) == 3
+
+
+def test_stop_telegraf_service_rebalances_only_the_two_affected_workers(mocker, tmp_path, sample_config_dict):
+    _mock_supervisor(mocker, tmp_path)
+    for name in ('press', 'lathe', 'mill', 'drill'):
+        _start_in_pool(tmp_path, sample_config_dict, name, workers=3)
+    # press, drill on worker 0; lathe on 1; mill on 2
+    assert sorted(p.name for p in (tmp_path / 'telegraf-worker-0.d').iterdir()) == ['drill.conf', 'press.conf']
+    untouched = (tmp_path / 'telegraf-worker-1.conf').read_text()
+
+    mock_run = _mock_supervisor(mocker, tmp_path, pgrep=lambda conf_path: '4242\n' if conf_path.endswith('telegraf-worker-0.conf') else '')
+    mock_kill = mocker.patch.object(os, 'kill')
+    reload = mocker.patch.object(TelegrafService, '_reload_telegraf_process', return_value=True)
+
+    TelegrafService(str(tmp_path), machine_name='mill', couchdb_service=None, workers=3).stop_telegraf_service()
+
+    # Worker 2 lost its last machine and took over drill from worker 0
+    assert sorted(p.name for p in (tmp_path / 'telegraf-worker-2.d').iterdir()) == ['drill.conf']
+    assert 'alias = "drill"' in (tmp_path / 'telegraf-worker-2.conf').read_text()
+    assert 'alias = "drill"' not in (tmp_path / 'telegraf-worker-0.conf').read_text()
+    assert (tmp_path / 'telegraf-worker-1.conf').read_text() == untouched
+    reload.assert_called_once_with(4242, 0)
+    assert _entrypoint_runs(mock_run) == 1
+    mock_kill.assert_not_called()
+
+
+def test_rebalance_reloads_both_workers_at_the_same_time(mocker, tmp_path, sample_config_dict):
+    _mock_supervisor(mocker, tmp_path)
+    for name in ('press', 'lathe', 'mill', 'drill'):
+        _start_in_pool(tmp_path, sample_config_dict, name, workers=3)
+    _mock_supervisor(mocker, tmp_path, pgrep=lambda conf_path: '4242\n')
+    mocker.patch.object(os, 'kill')
+    both_reloading = threading.Barrier(2, timeout=5)
+    reloaded = []
+
+    def reload(self, process_id, log_offset):
+        # Sequential reloads would leave the first one waiting at the barrier until it breaks
+        both_reloading.wait()
+        reloaded.append(self.pack)
+        return True
+
+    mocker.patch.object(TelegrafService, '_reload_telegraf_process', reload)
+
+    TelegrafService(str(tmp_path), machine_name='mill', couchdb_service=None, workers=3).stop_telegraf_service()
+
+    assert sorted(reloaded) == ['telegraf-worker-0', 'telegraf-worker-2']
+
+
+def _mock_running_telegraf(mocker, tmp_path, changed, log_lines=()):
+    """Telegraf runs as PID 4242; writing the config returns `changed` and appends log_lines to the machine log."""
+    mock_config_cls = mocker.patch.object(ts_module, 'MachineConfigurationService', autospec=True)
+
+    def write_configuration_to_file(machine_configuration=None):
+        with open(tmp_path / 'm1.log', 'a') as log:
+            log.writelines(f'{line}\n' for line in log_lines)
+        return changed
+
+    mock_config_cls.return_value.write_configuration_to_file.side_effect = write_configuration_to_file
+    (tmp_path / 'm1.conf').touch()
+    mock_run = _mock_supervisor(mocker, tmp_path, pgrep=lambda conf_path: '4242\n')
+    mocker.patch.object(ts_module.time, 'sleep')
+    mocker.patch.object(TelegrafService, 'RELOAD_TIMEOUT', 0)
+    return mocker.patch.object(os, 'kill'), mock_run
+
+
+def test_start_telegraf_service_keeps_process_when_config_unchanged(mocker, tmp_path):
+    mock_kill, mock_run = _mock_running_telegraf(mocker, tmp_path, changed=False)
+    service = _make_service(tmp_path, machine_name='m1')
+    assert service.start_telegraf_service() == 'unchanged'
+    mock_kill.assert_not_called()
+    assert _entrypoint_runs(mock_run) == 0
+
+
+def test_start_telegraf_service_reloads_through_watch_config(mocker, tmp_path):
+    (tmp_path / 'm1.log').write_text('2026-10-18T10:00:00Z D! [agent] Successfully connected to outputs.mqtt\n')
+    mock_kill, mock_run = _mock_running_telegraf(mocker, tmp_path, changed=True, log_lines=[
+        '2026-10-18T10:05:00Z I! Config file "/etc/telegraf/telegraf.d/m1.conf" overwritten',
+        '2026-10-18T10:05:01Z I! Reloading Telegraf config',
+        '2026-10-18T10:05:01Z D! [agent] Successfully connected to outputs.mqtt',
+    ])
+    service = _make_service(tmp_path, machine_name='m1')
+    assert service.start_telegraf_service() == 'reloaded'
+    mock_kill.assert_not_called()
+    assert _entrypoint_runs(mock_run) == 0
+
+
+def test_start_telegraf_service_reloads_without_debug_logging(mocker, tmp_path):
+    mock_kill, mock_run = _mock_running_telegraf(mocker, tmp_path, changed=True, log_lines=[
+        '2026-10-18T10:05:01Z I! Reloading Telegraf config',
+        '2026-10-18T10:05:01Z I! Loaded outputs: file mqtt',
+        '2026-10-18T10:05:01Z I! [agent] Config: Interval:1s, Quiet:false, Hostname:"PLC Datalink RFC1006", Flush Interval:1s',
+    ])
+    service = _make_service(tmp_path, machine_name='m1')
+    assert service.start_telegraf_service() == 'reloaded'
+    mock_kill.assert_not_called()
+    assert _entrypoint_runs(mock_run) == 0
+
+
+def test_start_telegraf_service_falls_back_to_sighup(mocker, tmp_path):
+    mock_kill, mock_run = _mock_running_telegraf(mocker, tmp_path, changed=True)
+
+    def reload_on_sighup(pid, sig):
+        with open(tmp_path / 'm1.log', 'a') as log:
+            log.write('I! Reloading Telegraf config\nD! [agent] Successfully connected to outputs.mqtt\n')
+
+    mock_kill.side_effect = reload_on_sighup
+    service = _make_service(tmp_path, machine_name='m1')
+    assert service.start_telegraf_service() == 'reloaded'
+    mock_kill.assert_called_once_with(4242, signal.SIGHUP)
+    assert _entrypoint_runs(mock_run) == 0
+
+
+def test_start_telegraf_service_restarts_when_reload_fails(mocker, tmp_path):
+    mock_kill, mock_run = _mock_running_telegraf(mocker, tmp_path, changed=True, log_lines=[
+        'I! Reloading Telegraf config',
+        'E! [telegraf] Error running agent: error loading config file /etc/telegraf/telegraf.d/m1.conf',
+    ])
+    service = _make_service(tmp_path, machine_name='m1')
+    assert service.start_telegraf_service() == 'started'
+    mock_kill.assert_called_once_with(4242, signal.SIGTERM)
+    assert _entrypoint_runs(mock_run) == 1
+
+
+def test_start_telegraf_service_counts_silent_reload_of_running_process(mocker, tmp_path):
+    mock_kill, mock_run = _mock_running_telegraf(mocker, tmp_path, changed=True)
+    service = _make_service(tmp_path, machine_name='m1')
+    assert service.start_telegraf_service() == 'reloaded'
+    assert [c.args for c in mock_kill.call_args_list] == [(4242, signal.SIGHUP), (4242, 0)]
+    assert _entrypoint_runs(mock_run) == 0
+
+
+def test_start_telegraf_service_sends_sighup_at_once_to_quiet_agent(mocker, tmp_path):
+    (tmp_path / 'm1.conf').write_text('[agent]\n  quiet = true\n')
+    mock_await = mocker.spy(TelegrafService, '_await_reload')
+    mock_kill, mock_run = _mock_running_telegraf(mocker, tmp_path, changed=True)
+    service = _make_service(tmp_path, machine_name='m1')
+    assert service.start_telegraf_service() == 'reloaded'
+    assert mock_await.call_count == 1
+    assert mock_kill.call_args_list[0].args == (4242, signal.SIGHUP)
+    assert _entrypoint_runs(mock_run) == 0
+
+
+def test_start_telegraf_service_restarts_when_process_dies_on_reload(mocker, tmp_path):
+    mock_kill, mock_run = _mock_running_telegraf(mocker, tmp_path, changed=True)
+
+    def kill(pid, sig):
+        if sig == 0:
+            raise ProcessLookupError
+
+    mock_kill.side_effect = kill
+    service = _make_service(tmp_path, machine_name='m1')
+    assert service.start_telegraf_service() == 'started'
+    assert [c.args for c in mock_kill.call_args_list] == [(4242, signal.SIGHUP), (4242, 0), (4242, signal.SIGTERM)]
+    assert _entrypoint_runs(mock_run) == 1
+
+
+def test_start_telegraf_service_replaces_supervisor_program_on_restart(mocker, tmp_path):
+    mock_kill, mock_run = _mock_running_telegraf(mocker, tmp_path, changed=True, log_lines=[
+        'E! [telegraf] Error running agent: error loading config file /etc/telegraf/telegraf.d/m1.conf',
+    ])
+    supervisor_conf = tmp_path / 'supervisor' / 'm1.conf'
+    supervisor_conf.write_text('[program:m1]\n')
+    service = _make_service(tmp_path, machine_name='m1')
+    assert service.start_telegraf_service() == 'started'
+    # dynamic_startup_telegraf.sh skips configs that still have a program, and supervisor does not restart a clean exit
+    assert supervisor_conf.read_text() == ''
+    assert [c.args[0] for c in mock_run.call_args_list[-3:]] == [['supervisorctl', 'reread'], ['supervisorctl', 'update'], ENTRYPOINT]
+    assert _entrypoint_runs(mock_run) == 1
@@ -0,0 +1,42 @@
+import pytest
+
+from src.services.worker_pool import choose_worker, plan_rebalance, tag_reads_per_second, worker_names
+
+
+def test_worker_names_number_the_pool():
+    assert worker_names(3) == ['telegraf-worker-0', 'telegraf-worker-1', 'telegraf-worker-2']
+    assert worker_names(0) == []
+
+
+def test_tag_reads_per_second_weighs_tags_by_their_rate_class(sample_config_dict):
+    assert tag_reads_per_second(sample_config_dict) == 10
+    sample_config_dict['plcTagData'][0]['rateClass'] = 'fast'
+    sample_config_dict['plcTagData'][1]['rateClass'] = 'static'
+    assert tag_reads_per_second(sample_config_dict) == pytest.approx(8 + 10 + 1 / 60)
+
+
+def test_choose_worker_keeps_an_assigned_machine():
+    loads = {'w0': {'press': 50.0}, 'w1': {}}
+    assert choose_worker(loads, 'press') == 'w0'
+
+
+def test_choose_worker_takes_the_least_loaded_then_the_emptier_then_the_first():
+    assert choose_worker({'w0': {'press': 50.0}, 'w1': {'lathe': 10.0}}, 'mill') == 'w1'
+    assert choose_worker({'w0': {'a': 5.0, 'b': 5.0}, 'w1': {'c': 10.0}}, 'mill') == 'w1'
+    assert choose_worker({'w0': {}, 'w1': {}}, 'mill') == 'w0'
+
+
+def test_plan_rebalance_leaves_a_balanced_pool_alone():
+    assert plan_rebalance({'w0': {'a': 10.0}, 'w1': {'b': 9.0}}) is None
+    assert plan_rebalance({'w0': {'a': 10.0}}) is None
+
+
+def test_plan_rebalance_never_moves_a_machine_heavier_than_the_gap():
+    # Moving the only machine would just swap which worker is overloaded
+    assert plan_rebalance({'w0': {'a': 100.0}, 'w1': {}}) is None
+
+
+def test_plan_rebalance_moves_the_machine_closest_to_half_the_gap():
+    loads = {'w0': {'a': 40.0, 'b': 25.0, 'c': 5.0}, 'w1': {'d': 10.0}, 'w2': {'e': 30.0}}
+    # Gap between w0 (70) and w1 (10) is 60, b brings both to 45 and 35
+    assert plan_rebalance(loads) == ('b', 'w0', 'w1')
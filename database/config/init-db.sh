@@ -18,3 +18,41 @@ curl -X PUT "http://${CREDS}@localhost:5984/_replicator"
 sleep 1
 curl -X PUT "http://${CREDS}@localhost:5984/datalink"
 sleep 1
+
+# Install or update a design document in the datalink database. The current
+# _rev (if any) is spliced into the body so re-running the script on every
+# container start updates the views instead of failing with 409.
+put_design_doc() {
+  local name="$1"
+  local body="$2"
+  local url="http://${CREDS}@localhost:5984/datalink/_design/${name}"
+  local rev
+  rev=$(curl -s "${url}" | sed -n 's/.*"_rev":"\([^"]*\)".*/\1/p')
+  if [ -n "${rev}" ]; then
+    body=$(echo "${body}" | sed "1s/^{/{\"_rev\":\"${rev}\",/")
+  fi
+  curl -X PUT "${url}" -H 'Content-Type: application/json' -d "${body}"
+}
+
+echo 'Installing datalink design documents...'
+# Compact per-machine rows for the overview (served by GET /config/summary),
+# so listing machines does not transfer their plcTagData arrays. The by_*
+# views back the fleet lookups under GET /config/query/*: by PLC IP, by MQTT
+# broker ([mqttIp, mqttPort]) and by tag address (upper-cased, one row per tag).
+put_design_doc machines '{
+  "language": "javascript",
+  "views": {
+    "summary": {
+      "map": "function (doc) { if (doc.machineData && doc.mqttData) { emit(doc._id, { machineName: doc.machineData.machineName, plcIp: doc.machineData.plcIp, mqttTopic: doc.mqttData.mqttTopic, tagCount: (doc.plcTagData || []).length }); } }"
+    },
+    "by_plc_ip": {
+      "map": "function (doc) { if (doc.machineData && doc.mqttData) { emit(doc.machineData.plcIp, { machineName: doc.machineData.machineName, plcIp: doc.machineData.plcIp, mqttTopic: doc.mqttData.mqttTopic, tagCount: (doc.plcTagData || []).length }); } }"
+    },
+    "by_mqtt_broker": {
+      "map": "function (doc) { if (doc.machineData && doc.mqttData) { emit([doc.mqttData.mqttIp, doc.mqttData.mqttPort], { machineName: doc.machineData.machineName, plcIp: doc.machineData.plcIp, mqttTopic: doc.mqttData.mqttTopic, tagCount: (doc.plcTagData || []).length }); } }"
+    },
+    "by_tag_address": {
+      "map": "function (doc) { if (doc.machineData && doc.plcTagData) { doc.plcTagData.forEach(function (tag) { if (tag.tagAddress) { emit(tag.tagAddress.toUpperCase(), { machineName: doc.machineData.machineName, plcIp: doc.machineData.plcIp, tagName: tag.tagName, tagAddress: tag.tagAddress }); } }); } }"
+    }
+  }
+}'
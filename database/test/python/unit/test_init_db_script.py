@@ -38,3 +38,22 @@ def test_script_uses_env_credentials(script_text: str) -> None:
 def test_script_waits_for_couchdb(script_text: str) -> None:
     # Sanity check the script does not race the couchdb HTTP listener.
     assert "until curl" in script_text or "Waiting for CouchDB" in script_text
+
+
+def test_script_installs_machines_design_doc(script_text: str) -> None:
+    # /config/summary in the backend reads _design/machines/_view/summary.
+    assert "datalink/_design/${name}" in script_text
+    assert "put_design_doc machines" in script_text
+    assert '"summary"' in script_text
+
+
+@pytest.mark.parametrize("view", ["by_plc_ip", "by_mqtt_broker", "by_tag_address"])
+def test_script_installs_fleet_query_views(script_text: str, view: str) -> None:
+    # /config/query/* in the backend reads _design/machines/_view/<view>.
+    assert f'"{view}"' in script_text
+
+
+def test_design_doc_update_is_idempotent(script_text: str) -> None:
+    # Re-runs on every container start: the current _rev must be spliced in,
+    # otherwise the second PUT fails with 409 and views never get updated.
+    assert '"_rev"' in script_text